@@ -0,0 +1,301 @@
+"""
+Reproducible benchmarks of the alignment engines and the MDD pipeline.
+
+Inputs are generated from a fixed seed, each case is timed over several repeats and
+the results are written as JSON. A later run can be compared against a stored
+baseline to flag regressions:
+
+    python benchmarks/run_benchmarks.py --output baseline.json
+    python benchmarks/run_benchmarks.py --output current.json --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import string
+import sys
+import time
+from datetime import datetime, timezone
+
+from cacoepy.aligner import (
+    ENGINES_2D,
+    ENGINES_3D,
+    AlignARPAbet2,
+    align_prediction_to_annotation_and_target,
+)
+from cacoepy.core import ARPAbet_similarity_matrix
+from cacoepy.core.ARPAbet_similarity_matrix import arpabet_vocab
+from cacoepy.core.Needleman_Wunsch import NeedlemanWunschConfig
+from cacoepy.metric import mdd_corpus_metrics, mdd_phoneme_metrics
+
+SEED = 0
+ALPHABET = string.ascii_lowercase + string.ascii_uppercase
+
+
+def _engine_2d(engine):
+    if engine == "numpy":
+        from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch2DVectorized
+
+        return NeedlemanWunsch2DVectorized
+    if engine == "jit":
+        from cacoepy.core.Needleman_Wunsch_jit import JIT_AVAILABLE, NeedlemanWunsch2DJit
+
+        if JIT_AVAILABLE:
+            return NeedlemanWunsch2DJit
+    from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D
+
+    return NeedlemanWunsch2D
+
+
+def _engine_3d(engine):
+    if engine == "numpy":
+        from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch3DVectorized
+
+        return NeedlemanWunsch3DVectorized
+    from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch3D
+
+    return NeedlemanWunsch3D
+
+
+def _config(alphabet, similarity):
+    def similarity_function(a, b):
+        return 2 if a == b else -1
+
+    if similarity == "callable":
+        return NeedlemanWunschConfig(similarity=similarity_function, gap_penalty=-2)
+    table = {a: {b: similarity_function(a, b) for b in alphabet} for a in alphabet}
+    return NeedlemanWunschConfig(similarity=table, gap_penalty=-2)
+
+
+def _cold_arpabet_aligner(engine):
+    """
+    Constructs AlignARPAbet2 as the first aligner of a fresh process would: the
+    phoneme data, similarity table and compiled score table are all rebuilt.
+    """
+    ARPAbet_similarity_matrix._load_phoneme_data.cache_clear()
+    ARPAbet_similarity_matrix.arpabet_vocab.cache_clear()
+    ARPAbet_similarity_matrix.arpabet_similarity_table.cache_clear()
+    ARPAbet_similarity_matrix.arpabet_score_table.cache_clear()
+    return AlignARPAbet2(engine=engine)
+
+
+def _sequence(rng, alphabet, length):
+    return [rng.choice(alphabet) for _ in range(length)]
+
+
+def _mutate(rng, seq, alphabet, rate=0.2):
+    """Substitutes, deletes and inserts phonemes, like a noisy MDD prediction."""
+    mutated = []
+    for symbol in seq:
+        roll = rng.random()
+        if roll < rate / 3:
+            mutated.append(rng.choice(alphabet))
+        elif roll < 2 * rate / 3:
+            continue
+        elif roll < rate:
+            mutated.extend([symbol, rng.choice(alphabet)])
+        else:
+            mutated.append(symbol)
+    return mutated
+
+
+def cases(quick=False):
+    """
+    Yields (name, params, setup) for every benchmark case. setup() builds the inputs
+    and returns the zero-argument callable that is timed.
+    """
+    lengths_2d = (10, 50) if quick else (10, 50, 200)
+    lengths_3d = (5, 10) if quick else (5, 10, 20)
+    alphabet_sizes = (4, 40)
+
+    for engine in ENGINES_2D:
+        for length in lengths_2d:
+            for size in alphabet_sizes:
+                for similarity in ("callable", "dict"):
+                    def setup(engine=engine, length=length, size=size, similarity=similarity):
+                        rng = random.Random(SEED)
+                        alphabet = ALPHABET[:size]
+                        aligner = _engine_2d(engine)(_config(alphabet, similarity))
+                        seq1 = _sequence(rng, alphabet, length)
+                        seq2 = _mutate(rng, seq1, alphabet)
+                        return lambda: aligner(seq1, seq2)
+
+                    params = dict(engine=engine, length=length, alphabet=size, similarity=similarity)
+                    yield "NeedlemanWunsch2D", params, setup
+
+    for engine in ENGINES_3D:
+        for length in lengths_3d:
+            for similarity in ("callable", "dict"):
+                def setup(engine=engine, length=length, similarity=similarity):
+                    rng = random.Random(SEED)
+                    alphabet = ALPHABET[:4]
+                    aligner = _engine_3d(engine)(_config(alphabet, similarity))
+                    seq1 = _sequence(rng, alphabet, length)
+                    seq2 = _mutate(rng, seq1, alphabet)
+                    seq3 = _mutate(rng, seq1, alphabet)
+                    return lambda: aligner(seq1, seq2, seq3)
+
+                params = dict(engine=engine, length=length, alphabet=4, similarity=similarity)
+                yield "NeedlemanWunsch3D", params, setup
+
+    for engine in ENGINES_2D:
+        yield "AlignARPAbet2.__init__", dict(engine=engine, cache="warm"), (
+            lambda engine=engine: lambda: AlignARPAbet2(engine=engine)
+        )
+        yield "AlignARPAbet2.__init__", dict(engine=engine, cache="cold"), (
+            lambda engine=engine: lambda: _cold_arpabet_aligner(engine)
+        )
+
+    vocab = [phoneme for phoneme in arpabet_vocab() if phoneme != "sil"]
+    for length in (10, 40) if quick else (10, 40, 160):
+        def setup(length=length):
+            rng = random.Random(SEED)
+            target = _sequence(rng, vocab, length)
+            annotation = _mutate(rng, target, vocab, rate=0.1)
+            aligner = AlignARPAbet2()
+            annotation, target, _ = aligner(annotation, target)
+            prediction = _mutate(rng, [x for x in annotation if x != "-"], vocab)
+            return lambda: align_prediction_to_annotation_and_target(
+                prediction=prediction,
+                annotation_aligned_with_target=annotation,
+                target_aligned_with_annotation=target,
+            )
+
+        yield "align_prediction_to_annotation_and_target", dict(length=length), setup
+
+    for length in (10, 100, 1000):
+        def setup(length=length):
+            rng = random.Random(SEED)
+            triple = [_sequence(rng, vocab[:8], length) for _ in range(3)]
+            return lambda: mdd_phoneme_metrics(*triple)
+
+        yield "mdd_phoneme_metrics", dict(length=length), setup
+
+    def setup():
+        rng = random.Random(SEED)
+        triples = [
+            [_sequence(rng, vocab[:8], 30) for _ in range(3)] for _ in range(1000)
+        ]
+        return lambda: mdd_corpus_metrics(triples)
+
+    yield "mdd_corpus_metrics", dict(utterances=1000, length=30), setup
+
+
+def time_case(func, repeats=5, min_time=0.2):
+    """
+    Times func like timeit: the number of calls per repeat is doubled until a repeat
+    takes at least min_time / repeats seconds.
+
+    Returns:
+        dict: Seconds per call of the fastest and the median repeat, and the counts.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeats or number >= 1 << 20:
+            break
+        number *= 2
+    timings = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "repeats": repeats,
+        "number": number,
+    }
+
+
+def case_key(result):
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def run(quick=False, name_filter=None, repeats=5, min_time=0.2):
+    import numpy
+    from cacoepy.core.Needleman_Wunsch_jit import JIT_AVAILABLE
+
+    results = []
+    for name, params, setup in cases(quick):
+        if name_filter and name_filter not in name:
+            continue
+        timing = time_case(setup(), repeats=repeats, min_time=min_time)
+        result = {"name": name, "params": params, **timing}
+        print(f"{case_key(result):<90} {timing['median'] * 1e6:>12.1f} us", file=sys.stderr)
+        results.append(result)
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "jit": JIT_AVAILABLE,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "seed": SEED,
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Compares the median time of every case found in both runs.
+
+    Returns:
+        list: (key, baseline seconds, current seconds, ratio) for each case that is
+        more than `threshold` slower than the baseline.
+    """
+    baseline_times = {case_key(result): result["median"] for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        key = case_key(result)
+        if key not in baseline_times:
+            continue
+        ratio = result["median"] / baseline_times[key]
+        if ratio > 1 + threshold:
+            regressions.append((key, baseline_times[key], result["median"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--compare", help="A baseline JSON file from an earlier run.")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Flag cases whose median is this fraction slower than the baseline.",
+    )
+    parser.add_argument("--quick", action="store_true", help="Run a smaller grid.")
+    parser.add_argument("--filter", help="Only run cases whose name contains this.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    current = run(args.quick, args.filter, args.repeats, args.min_time)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(current, baseline, args.threshold)
+        for key, before, after, ratio in regressions:
+            print(
+                f"REGRESSION {key}: {before * 1e6:.1f} us -> {after * 1e6:.1f} us ({ratio:.2f}x)",
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
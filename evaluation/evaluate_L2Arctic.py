@@ -1,6 +1,7 @@
 import json
 from cacoepy.aligner import AlignARPAbet2, AlignBasic2
 from cacoepy.core.utils import pretty_sequences
+from cacoepy.pipeline import iter_annotations
 import copy
 from cacoepy.aligner import AlignBasic2
 
@@ -20,19 +21,10 @@ def toggle_sil_to_dash(seq):
             new_seq.append(e)
     return new_seq
 
-def remove_alignment(a):
-    a = [x for x in a if x != "-"]
-    # a = [x for x in a if x != "sil"]
-    return a
-
-
-def evaluate_sequences(expected, aligned):
-    aligner = AlignBasic2()
-    res = aligner(expected, aligned)
-    return aligner.score
-
 
 def align_editops(source_seq, dest_seq):
+    from Levenshtein import editops  # pip install python-Levenshtein
+
     vocab = set(source_seq + dest_seq)
     w2c = {c: i for i, c in enumerate(vocab)}
     source_enc = "".join([chr(w2c[c]) for c in source_seq])
@@ -49,34 +41,31 @@ def align_editops(source_seq, dest_seq):
     return aligned_src, aligned_dest, None
 
 
-def run_test(target, perceived, aligner):
-    unaligned_perceived = remove_alignment(perceived)
-    unaligned_target = remove_alignment(target)
-    aligned_target, aligned_perc, _ = aligner(unaligned_target, unaligned_perceived)
-    score = evaluate_sequences(perceived, aligned_perc)
-    score += evaluate_sequences(target, aligned_target)
-    score += score
-    return score
-
-
 if __name__ == "__main__":
-    from Levenshtein import editops  # pip install python-Levenshtein
+    import argparse
+    from cacoepy.evaluation import evaluate_sharded
 
-    annotations = load_json_to_dict("data/L2Arctic_annotations.json")
-    arpa_aligner = AlignARPAbet2()
-    basic_aligner = AlignBasic2()
-    arpabet_score = 0
-    basic_score = 0
-    levi_score = 0
-    for file in annotations.keys():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--shard-by", choices=("utterance", "speaker"), default="utterance")
+    parser.add_argument("--checkpoint", help="Directory to save finished shards to and resume from.")
+    args = parser.parse_args()
 
-        target = annotations[file]["target_phonemes"].replace("ax", "ah").split(" ")
-        perceived = (
-            annotations[file]["perceived_phonemes"].replace("ax", "ah").split(" ")
-        )
-        arpabet_score += run_test(target, perceived, arpa_aligner)
-        basic_score += run_test(target, perceived, basic_aligner)
-        levi_score += run_test(target, perceived, align_editops)
+    result = evaluate_sharded(
+        iter_annotations("data/L2Arctic_annotations.json"),
+        aligners={
+            "arpabet": AlignARPAbet2(),
+            "basic": AlignBasic2(),
+            "levenshtein": align_editops,
+        },
+        shard_by=args.shard_by,
+        workers=args.workers,
+        checkpoint=args.checkpoint,
+    )
+    # Doubled, as the original run_test did, so the scores match earlier runs.
+    arpabet_score = 2 * result.scores["arpabet"]
+    basic_score = 2 * result.scores["basic"]
+    levi_score = 2 * result.scores["levenshtein"]
 
     print(f"{arpabet_score=} {basic_score=}, {levi_score=}")
     print(f"{((arpabet_score - basic_score) /arpabet_score) * 100 =}")
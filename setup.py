@@ -20,9 +20,11 @@ setup(
     package_dir={"": "src"},
     include_package_data=True,
     package_data={
-        "": ["data/*.json"],
+        "cacoepy": ["data/*.json", "data/*.npz"],
     },
     install_requires=requirements,
+    extras_require={"jit": ["numba"]},
+    entry_points={"console_scripts": ["cacoepy=cacoepy.cli:main"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
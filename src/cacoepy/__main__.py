@@ -0,0 +1,3 @@
+from cacoepy.cli import main
+
+main()
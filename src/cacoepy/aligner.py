@@ -1,9 +1,23 @@
-import json
-from typing import List, Tuple
-from cacoepy.core.ARPAbet_similarity_matrix import arpabet_similarity_matrix
-from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D, NeedlemanWunschConfig
+import threading
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+from cacoepy.core.ARPAbet_similarity_matrix import (
+    arpabet_score_table,
+    arpabet_similarity_matrix,
+    arpabet_vocab,
+)
+from cacoepy.core.Needleman_Wunsch import (
+    NeedlemanWunsch2D,
+    NeedlemanWunsch3D,
+    NeedlemanWunschConfig,
+)
+from cacoepy.core.alignment import Alignment
+from cacoepy.core.cache import AlignmentCache
+from cacoepy.core.instrumentation import AlignmentListener
 from cacoepy.core.exceptions import ElementNotInVocabError
-from cacoepy.core.aligner_tools import align_sequence_pairs
+from cacoepy.core.aligner_tools import align_sequence_pairs, merge_alignments
+from cacoepy.core.phoneme_sequence import PhonemeSequence
+from cacoepy.core.batch import BatchResult, align_many
 
 
 def align_prediction_to_annotation_and_target(
@@ -27,8 +41,11 @@ def align_prediction_to_annotation_and_target(
     Returns:
     - Tuple[List[str], List[str], List[str]]: Aligned prediction, annotation, and target phonemes.
     """
-    bare_annotation = list(filter(lambda x: x != gap_char, annotation_aligned_with_target))
-    aligner = AlignARPAbet2(gap_penalty=gap_penalty)
+    if isinstance(annotation_aligned_with_target, PhonemeSequence):
+        bare_annotation = annotation_aligned_with_target.without_gaps()
+    else:
+        bare_annotation = [x for x in annotation_aligned_with_target if x != gap_char]
+    aligner = _shared_arpabet_aligner(gap_penalty)
     annotation_aligned_with_pred, pred_aligned_with_annotation, _ = aligner(
         bare_annotation, prediction
     )
@@ -41,31 +58,177 @@ def align_prediction_to_annotation_and_target(
     return aligned_prediction, aligned_annotation, aligned_target
 
 
+def align_predictions_to_annotation_and_target(
+    predictions: List[List[str]],
+    annotation_aligned_with_target: List[str],
+    target_aligned_with_annotation: List[str],
+    gap_char: str ="-",
+    gap_penalty: float =-5,
+    ) -> Tuple[List[List[str]], List[str], List[str]]:
+    """
+    Align the phoneme predictions of several MDD systems to annotated phonemes and their
+    aligned target phonemes at once. Each prediction is aligned to the annotation, then
+    all alignments are merged in one pass.
+
+    Parameters:
+    - predictions (List[List[str]]): Predicted phonemes of each MDD system.
+    - annotation_aligned_with_target (List[str]): Annotated phonemes aligned with target phonemes.
+    - target_aligned_with_annotation (List[str]): Target phonemes aligned with annotated phonemes.
+    - gap_char (str, optional): Character representing gaps in alignments. Defaults to "-".
+    - gap_penalty (float, optional): Penalty for introducing gaps in alignment. Defaults to -5.
+
+    Returns:
+    - Tuple[List[List[str]], List[str], List[str]]: Aligned predictions, annotation, and
+      target phonemes, all the same length.
+    """
+    if isinstance(annotation_aligned_with_target, PhonemeSequence):
+        bare_annotation = annotation_aligned_with_target.without_gaps()
+    else:
+        bare_annotation = [x for x in annotation_aligned_with_target if x != gap_char]
+    aligner = _shared_arpabet_aligner(gap_penalty)
+    alignments = [(annotation_aligned_with_target, target_aligned_with_annotation)]
+    for prediction in predictions:
+        annotation_aligned_with_pred, pred_aligned_with_annotation, _ = aligner(
+            bare_annotation, prediction
+        )
+        alignments.append((annotation_aligned_with_pred, pred_aligned_with_annotation))
+    aligned_annotation, aligned_target, *aligned_predictions = merge_alignments(
+        alignments, gap_char=gap_char
+    )
+    return aligned_predictions, aligned_annotation, aligned_target
+
+
+def _is_phonemes_in_vocab(seq: List[str], vocab: frozenset) -> bool:
+    if isinstance(seq, PhonemeSequence) and seq.codes_for(arpabet_score_table()) is not None:
+        # Already validated when encoded; only gaps could be outside the vocabulary.
+        if not seq.has_gaps():
+            return True
+        seq = seq.tolist()
+    for phone in seq:
+        if phone not in vocab:
+            msg = f'A sequence contains "{phone}" which is not an ARPAbet phoneme.'
+            raise ElementNotInVocabError(message=msg)
+    return True
+
+
+@lru_cache(maxsize=16)
+def _shared_arpabet_aligner(gap_penalty):
+    # Aligners keep no per-call state, so every thread shares one per gap penalty. Only
+    # the most recently used penalties are kept, as the server takes them from clients.
+    return AlignARPAbet2(gap_penalty=gap_penalty)
+
+
+class _LastScore(threading.local):
+    """
+    The score of the last alignment made by the current thread, behind the aligners' 
+    score property. Threads sharing an aligner each see their own.
+    """
+    score = None
+
+    def __reduce__(self):
+        # Copies sent to worker processes start empty.
+        return (_LastScore, ())
+
+
+ENGINES_2D = ("python", "numpy", "jit")
+ENGINES_3D = ("python", "numpy")
+
+
+def _needleman_wunsch2d(config, engine, mode, band=8, cache=None):
+    if engine == "python":
+        engine_class = NeedlemanWunsch2D
+    elif engine == "numpy":
+        from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch2DVectorized
+        engine_class = NeedlemanWunsch2DVectorized
+    elif engine == "jit":
+        from cacoepy.core.Needleman_Wunsch_jit import JIT_AVAILABLE, NeedlemanWunsch2DJit
+        # Without Numba the pure Python engine gives the same results.
+        engine_class = NeedlemanWunsch2DJit if JIT_AVAILABLE else NeedlemanWunsch2D
+    else:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES_2D}.")
+    return engine_class(config=config, mode=mode, band=band, cache=cache)
+
+
+def _basic_similarity(a, b):
+    return 1 if a == b else -1
+
+
 class AlignBasic2:
-    def __init__(self):
+    def __init__(
+            self, 
+            engine: str = "python", 
+            mode: str = "full", 
+            band: int = 8, 
+            cache: AlignmentCache = None
+        ):
         self.gap_penalty = -1
         self.match_score = 1
         self.mismatch_score = -1
-        self._score = None
-
-        def _similarity_function(a, b):
-            return 1 if a == b else -1
-
+        self._last = _LastScore()
         self._config = NeedlemanWunschConfig(
-            gap_penalty=self.gap_penalty, similarity=_similarity_function
+            gap_penalty=self.gap_penalty, similarity=_basic_similarity
+        )
+        self._needleman_wunsch2d = _needleman_wunsch2d(
+            self._config, engine, mode, band, cache
         )
-        self._needleman_wunsch2d = NeedlemanWunsch2D(config=self._config)
 
     def __call__(self, seq1:  List[str], seq2:  List[str]):
         aligned_seq1, aligned_seq2, score = self._needleman_wunsch2d(
             seq1=seq1, seq2=seq2
         )
-        self._score = score
+        self._last.score = score
         return aligned_seq1, aligned_seq2, score
 
+    def align(
+            self, 
+            seq1:  List[str], 
+            seq2:  List[str], 
+            keep_matrices: bool = False
+        ) -> Alignment:
+        """
+        Aligns two sequences, returning an Alignment of run-length encoded edit operations.
+        With keep_matrices, str(alignment) prints the score and trace matrices.
+        """
+        alignment = self._needleman_wunsch2d.align(
+            seq1=seq1, seq2=seq2, keep_matrices=keep_matrices
+        )
+        self._last.score = alignment.score
+        return alignment
+
+    def score_only(self, seq1:  List[str], seq2:  List[str]) -> float:
+        """
+        Returns the alignment score of two sequences without building the alignment.
+        """
+        return self._needleman_wunsch2d.score(seq1=seq1, seq2=seq2)
+
+    def align_many(
+            self, 
+            pairs: Iterable[Tuple[List[str], List[str]]], 
+            workers: int = 1, 
+            chunksize: int = None
+        ) -> List[BatchResult]:
+        """
+        Aligns many sequence pairs across a process pool. See cacoepy.core.batch.align_many.
+        """
+        return align_many(self, pairs, workers=workers, chunksize=chunksize)
+
+    def add_listener(self, listener: AlignmentListener) -> AlignmentListener:
+        """
+        Calls `listener` with an AlignmentEvent of phase timings and counters after every 
+        alignment, e.g. an AlignmentStats. Returns the listener.
+        """
+        return self._needleman_wunsch2d.add_listener(listener)
+
+    def remove_listener(self, listener: AlignmentListener) -> None:
+        self._needleman_wunsch2d.remove_listener(listener)
+
     @property
     def score(self):
-        return self._score
+        """The score of the last alignment made by the calling thread."""
+        return self._last.score
+
+    def __str__(self):
+        return str(self._needleman_wunsch2d)
 
 
 class AlignARPAbet2:
@@ -77,15 +240,37 @@ class AlignARPAbet2:
 
     Args:
         gap_penalty (float): The penalty score for introducing gaps in the alignment.
+        engine (str): The Needleman-Wunsch implementation to use: "python", "numpy" or 
+            "jit". All return identical alignments. "jit" compiles the fill with Numba 
+            when it is installed and otherwise falls back to "python".
+        mode (str): "full", "hirschberg" or "banded". Hirschberg mode returns the same 
+            alignment using memory linear in the sequence lengths, for long-form utterances. 
+            Banded mode only fills cells near the diagonal, widening the band until the 
+            result is proven identical to "full".
+        band (int): Initial band half-width for "banded" mode.
+        cache (AlignmentCache, optional): An LRU cache of alignments, which can be shared 
+            between aligners. Repeated (seq1, seq2) pairs are then aligned only once.
     """
-    def __init__(self, gap_penalty:float=-4):
+    def __init__(
+            self, 
+            gap_penalty:float=-4, 
+            engine: str = "python", 
+            mode: str = "full", 
+            band: int = 8,
+            cache: AlignmentCache = None,
+        ):
         self._similarity_matrix = arpabet_similarity_matrix()
         self._vocab = self._load_vocab()
+        self._vocab_set = frozenset(self._vocab)
         self._config = NeedlemanWunschConfig(
-            gap_penalty=gap_penalty, similarity=self._similarity_matrix
+            gap_penalty=gap_penalty, 
+            similarity=self._similarity_matrix, 
+            score_table=arpabet_score_table(),
+        )
+        self._needleman_wunsch2d = _needleman_wunsch2d(
+            self._config, engine, mode, band, cache
         )
-        self._needleman_wunsch2d = NeedlemanWunsch2D(config=self._config)
-        self._score = None
+        self._last = _LastScore()
 
     def __call__(self, seq1: List[str], seq2: List[str])->Tuple[List[str], List[str], float]:
         """
@@ -105,22 +290,96 @@ class AlignARPAbet2:
             aligned_seq1, aligned_seq2, score = self._needleman_wunsch2d(
                 seq1=seq1, seq2=seq2
             )
-            self._score = score
+            self._last.score = score
             return aligned_seq1, aligned_seq2, score
         return None, None, None
 
-    def _load_vocab(self) -> bool:
-        with open("data/ARPAbet_mapping.json", "r") as file:
-            data = json.load(file)
-        vocab = data["phoneme_attribute_map"].keys()
-        return list(vocab)
+    def align(
+            self, 
+            seq1: List[str], 
+            seq2: List[str], 
+            keep_matrices: bool = False
+        ) -> Alignment:
+        """
+        Aligns two sequences of ARPAbet phonemes like __call__, but returns an Alignment: 
+        run-length encoded match, substitute, insert and delete operations with indices 
+        into seq1 and seq2. The gapped sequences are only built if asked for, so counting 
+        errors over a corpus does not allocate them.
+
+        Args:
+            seq1 (str): The first sequence to align.
+            seq2 (str): The second sequence to align.
+            keep_matrices (bool): Keep the score and trace matrices of this call on the 
+                Alignment, for str(alignment). Only "full" mode builds them.
+
+        Returns:
+            Alignment: The alignment, which unpacks like the tuple from __call__.
+
+        Raises:
+            ElementNotInVocabError: If a phoneme is not in the ARPAbet vocabulary.
+        """
+        self._is_phonemes_in_vocab(seq1)
+        self._is_phonemes_in_vocab(seq2)
+        alignment = self._needleman_wunsch2d.align(
+            seq1=seq1, seq2=seq2, keep_matrices=keep_matrices
+        )
+        self._last.score = alignment.score
+        return alignment
+
+    def score_only(self, seq1: List[str], seq2: List[str]) -> float:
+        """
+        Computes the alignment score of two ARPAbet sequences without aligning them.
+
+        Uses memory proportional to len(seq2) and skips the traceback, which makes it 
+        the cheaper choice when only the score is needed, e.g. for ranking.
+
+        Args:
+            seq1 (str): The first sequence.
+            seq2 (str): The second sequence.
+
+        Returns:
+            float: The alignment score, identical to the score returned by __call__.
+        """
+        self._is_phonemes_in_vocab(seq1)
+        self._is_phonemes_in_vocab(seq2)
+        return self._needleman_wunsch2d.score(seq1=seq1, seq2=seq2)
+
+    def align_many(
+            self, 
+            pairs: Iterable[Tuple[List[str], List[str]]], 
+            workers: int = 1, 
+            chunksize: int = None
+        ) -> List[BatchResult]:
+        """
+        Aligns many pairs of ARPAbet sequences, spreading the work across a process pool.
+
+        Args:
+            pairs (Iterable[Tuple[List[str], List[str]]]): The (seq1, seq2) pairs to align.
+            workers (int): Number of worker processes. 1 or fewer aligns in this process.
+            chunksize (int, optional): Pairs sent to a worker at a time.
+
+        Returns:
+            List[BatchResult]: One result per pair in input order. BatchResult.result holds 
+            the (aligned_seq1, aligned_seq2, score) tuple, or BatchResult.error holds the 
+            exception raised for that pair, e.g. ElementNotInVocabError.
+        """
+        return align_many(self, pairs, workers=workers, chunksize=chunksize)
+
+    def add_listener(self, listener: AlignmentListener) -> AlignmentListener:
+        """
+        Calls `listener` with an AlignmentEvent of phase timings and counters after every 
+        alignment, e.g. an AlignmentStats. Returns the listener.
+        """
+        return self._needleman_wunsch2d.add_listener(listener)
+
+    def remove_listener(self, listener: AlignmentListener) -> None:
+        self._needleman_wunsch2d.remove_listener(listener)
+
+    def _load_vocab(self) -> List[str]:
+        return list(arpabet_vocab())
 
     def _is_phonemes_in_vocab(self, seq:  List[str]) -> bool:
-        for phone in seq:
-            if phone not in self._vocab:
-                msg = f'A sequence contains "{phone}" which is not an ARPAbet phoneme.'
-                raise ElementNotInVocabError(message=msg)
-        return True
+        return _is_phonemes_in_vocab(seq, self._vocab_set)
 
     @property
     def ARPABet_vocab(self):
@@ -132,12 +391,95 @@ class AlignARPAbet2:
 
     @property
     def score(self):
-        return self._score
+        """
+        The score of the last alignment made by the calling thread. Prefer the score 
+        returned with the alignment.
+        """
+        return self._last.score
 
     def __str__(self):
         return str(self._needleman_wunsch2d)
 
 
 class AlignARPAbet3:
-    def __init__(self, gap_penalty:float=-4):
-        pass
+    """
+    Jointly aligns three sequences of ARPAbet phonemes, e.g. target, annotation and 
+    prediction, using a three-way Needleman-Wunsch algorithm.
+
+    Every column of the alignment is scored by summing the ARPAbet similarity of each 
+    pair of phonemes in it and the gap penalty for each pair of a phoneme and a gap.
+
+    Args:
+        gap_penalty (float): The penalty score for introducing gaps in the alignment.
+        engine (str): "python" or "numpy". Both return identical alignments; "numpy" 
+            fills the score cube with vectorized operations.
+    """
+    def __init__(self, gap_penalty:float=-4, engine: str = "python"):
+        self._similarity_matrix = arpabet_similarity_matrix()
+        self._vocab = list(arpabet_vocab())
+        self._vocab_set = frozenset(self._vocab)
+        self._config = NeedlemanWunschConfig(
+            gap_penalty=gap_penalty, 
+            similarity=self._similarity_matrix, 
+            score_table=arpabet_score_table(),
+        )
+        if engine == "python":
+            self._needleman_wunsch3d = NeedlemanWunsch3D(config=self._config)
+        elif engine == "numpy":
+            from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch3DVectorized
+            self._needleman_wunsch3d = NeedlemanWunsch3DVectorized(config=self._config)
+        else:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES_3D}.")
+        self._last = _LastScore()
+
+    def __call__(
+            self, 
+            seq1: List[str], 
+            seq2: List[str], 
+            seq3: List[str]
+        ) -> Tuple[List[str], List[str], List[str], float]:
+        """
+        Aligns three sequences of ARPAbet phonemes.
+
+        Args:
+            seq1 (str): The first sequence to align.
+            seq2 (str): The second sequence to align.
+            seq3 (str): The third sequence to align.
+
+        Returns:
+            Tuple[List[str], List[str], List[str], float]: The three aligned sequences, 
+            all of the same length, and the alignment score.
+        """
+        for seq in (seq1, seq2, seq3):
+            _is_phonemes_in_vocab(seq, self._vocab_set)
+        aligned_seq1, aligned_seq2, aligned_seq3, score = self._needleman_wunsch3d(
+            seq1=seq1, seq2=seq2, seq3=seq3
+        )
+        self._last.score = score
+        return aligned_seq1, aligned_seq2, aligned_seq3, score
+
+    def add_listener(self, listener: AlignmentListener) -> AlignmentListener:
+        """
+        Calls `listener` with an AlignmentEvent of phase timings and counters after every 
+        alignment, e.g. an AlignmentStats. Returns the listener.
+        """
+        return self._needleman_wunsch3d.add_listener(listener)
+
+    def remove_listener(self, listener: AlignmentListener) -> None:
+        self._needleman_wunsch3d.remove_listener(listener)
+
+    @property
+    def ARPABet_vocab(self):
+        return self._vocab
+
+    @property
+    def similarity_matrix(self):
+        return self._similarity_matrix
+
+    @property
+    def score(self):
+        """The score of the last alignment made by the calling thread."""
+        return self._last.score
+
+    def __str__(self):
+        return str(self._needleman_wunsch3d)
@@ -0,0 +1,369 @@
+import argparse
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+from typing import Iterator, List, Optional, TextIO, Tuple
+from cacoepy.core.constants import DEFAULT_HOST, DEFAULT_PORT
+from cacoepy.core.exceptions import ITEM_ERRORS, InvalidItemError
+
+FORMATS = ("jsonl", "tsv", "json")
+_SCORE_KEYS = ("target_phonemes", "perceived_phonemes", "predicted_phonemes")
+_arpabet3_aligners = {}
+
+
+def _detect_format(path: str) -> str:
+    if path.endswith(".tsv"):
+        return "tsv"
+    if path.endswith(".json"):
+        return "json"
+    return "jsonl"
+
+
+def _open(path: str, mode: str):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if "r" in mode else sys.stdout)
+    return open(path, mode)
+
+
+def _numbered_lines(file: TextIO) -> Iterator[Tuple[int, str]]:
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            yield line_number, line
+
+
+def _phonemes(value) -> List[str]:
+    if isinstance(value, str):
+        return value.split()
+    if not isinstance(value, list):
+        raise InvalidItemError("Phonemes must be a list or a space separated string.")
+    return value
+
+
+def _json_line(line: str):
+    try:
+        return json.loads(line)
+    except ValueError as error:
+        raise InvalidItemError(f"Invalid JSON: {error}") from None
+
+
+def _score_record(record) -> dict:
+    if not isinstance(record, dict):
+        raise InvalidItemError("Each utterance must be a JSON object.")
+    missing = [key for key in _SCORE_KEYS if key not in record]
+    if missing:
+        raise InvalidItemError(f"Missing fields {missing}.")
+    return {key: _phonemes(record[key]) for key in _SCORE_KEYS}
+
+
+def _align_sequences(sequences: List, gap_penalty: float) -> Tuple[List[List[str]], float]:
+    from cacoepy.aligner import AlignARPAbet3, _shared_arpabet_aligner
+
+    if not isinstance(sequences, list):
+        raise InvalidItemError("Each item must be a list or an object of phoneme sequences.")
+    sequences = [_phonemes(sequence) for sequence in sequences]
+    if len(sequences) == 2:
+        aligner = _shared_arpabet_aligner(gap_penalty)
+    elif len(sequences) == 3:
+        aligner = _arpabet3_aligners.get(gap_penalty)
+        if aligner is None:
+            aligner = _arpabet3_aligners.setdefault(gap_penalty, AlignARPAbet3(gap_penalty))
+    else:
+        raise InvalidItemError(f"Expected 2 or 3 phoneme sequences, got {len(sequences)}.")
+    *aligned, score = aligner(*sequences)
+    return aligned, score
+
+
+def _align_lines(
+        input_format: str,
+        gap_penalty: float,
+        items: List[Tuple[int, str]],
+    ) -> List[Tuple[int, Optional[str], Optional[str]]]:
+    # Runs in the workers: parses, aligns and formats one chunk of input lines, and
+    # returns (line number, output line, error) for each.
+    results = []
+    for line_number, line in items:
+        try:
+            if input_format == "tsv":
+                record_id = None
+                sequences = line.rstrip("\r\n").split("\t")
+            else:
+                record = _json_line(line)
+                if isinstance(record, dict):
+                    record_id = record.get("id")
+                    sequences = [record[key] for key in ("seq1", "seq2", "seq3") if key in record]
+                else:
+                    record_id, sequences = None, record
+            aligned, score = _align_sequences(sequences, gap_penalty)
+        except ITEM_ERRORS as error:
+            results.append((line_number, None, f"{type(error).__name__}: {error}"))
+            continue
+        aligned = [" ".join(sequence) for sequence in aligned]
+        if input_format == "tsv":
+            output = "\t".join(aligned + [str(score)])
+        else:
+            output = {} if record_id is None else {"id": record_id}
+            output.update(zip(("seq1", "seq2", "seq3"), aligned))
+            output["score"] = score
+            output = json.dumps(output)
+        results.append((line_number, output, None))
+    return results
+
+
+@functools.lru_cache(maxsize=None)
+def _open_corpus(path: str):
+    from cacoepy.corpus import PhonemeCorpus
+
+    return PhonemeCorpus(path)
+
+
+def _score_items(
+        input_format: str,
+        gap_penalty: float,
+        items: List[Tuple[int, object]],
+        corpus: str = None,
+    ) -> List[Tuple[int, Optional[str], Optional[List[int]], Optional[str]]]:
+    # Runs in the workers: aligns and scores one chunk of utterances, and returns
+    # (line number, output line, metric counts, error) for each. Corpus items are
+    # positions, read by each worker from its own mapping of the corpus.
+    from cacoepy.pipeline import _result_record, align_utterances, encode_utterances
+    results = []
+    for line_number, item in items:
+        try:
+            if input_format == "corpus":
+                utterance_id, record = _open_corpus(corpus).record(item)
+            elif input_format == "json":
+                utterance_id, record = item
+                record = _score_record(record)
+            elif input_format == "tsv":
+                columns = item.rstrip("\r\n").split("\t")
+                if len(columns) not in (3, 4):
+                    raise InvalidItemError(
+                        f"Expected [id,] target, annotation and prediction columns, got {len(columns)}."
+                    )
+                utterance_id = columns[0] if len(columns) == 4 else str(line_number)
+                record = dict(zip(_SCORE_KEYS, columns[-3:]))
+            else:
+                line_record = _json_line(item)
+                record = _score_record(line_record)
+                utterance_id = str(line_record.get("id", line_number))
+            (utterance,) = encode_utterances([(utterance_id, record)])
+            (result,) = align_utterances([utterance], gap_penalty)
+        except ITEM_ERRORS as error:
+            results.append((line_number, None, None, f"{type(error).__name__}: {error}"))
+            continue
+        output = json.dumps(_result_record(result))
+        results.append((line_number, output, result.metric.counts.tolist(), None))
+    return results
+
+
+def _report_throughput(command: str, count: int, invalid: int, start: float) -> None:
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(
+        f"cacoepy {command}: {count} items in {elapsed:.2f} s ({rate:.1f} items/s), "
+        f"{invalid} invalid",
+        file=sys.stderr,
+    )
+
+
+def _invalid(args: argparse.Namespace, line_number: int, error: str, output: TextIO) -> None:
+    message = f"cacoepy {args.command}: {args.input} item {line_number}: {error}"
+    if not args.skip_invalid:
+        sys.exit(message)
+    if args.format == "tsv" and args.command == "align":
+        print(message, file=sys.stderr)
+    else:
+        output.write(json.dumps({"item": line_number, "error": error}) + "\n")
+
+
+def _align(args: argparse.Namespace) -> None:
+    from cacoepy.core.batch import imap_chunks
+
+    args.format = args.format or _detect_format(args.input)
+    if args.format == "json":
+        sys.exit("cacoepy align: the input must be JSONL or TSV.")
+    start = time.perf_counter()
+    count = invalid = 0
+    with _open(args.input, "r") as file, _open(args.output, "w") as output:
+        results = imap_chunks(
+            functools.partial(_align_lines, args.format, args.gap_penalty),
+            _numbered_lines(file),
+            workers=args.workers,
+            chunksize=args.chunk_size,
+        )
+        for line_number, line, error in results:
+            count += 1
+            if error is not None:
+                invalid += 1
+                _invalid(args, line_number, error, output)
+            else:
+                output.write(line + "\n")
+    _report_throughput("align", count, invalid, start)
+
+
+def _score(args: argparse.Namespace) -> None:
+    from cacoepy.core.batch import imap_chunks
+    from cacoepy.metric import MetricReport
+    from cacoepy.pipeline import iter_annotations
+
+    corpus = None
+    if os.path.isdir(args.input):
+        args.format = "corpus"
+        corpus = os.path.abspath(args.input)
+    args.format = args.format or _detect_format(args.input)
+    start = time.perf_counter()
+    count = invalid = 0
+    report = MetricReport()
+    with contextlib.ExitStack() as stack:
+        output = stack.enter_context(_open(args.output, "w"))
+        if corpus is not None:
+            items = ((index + 1, index) for index in range(len(_open_corpus(corpus))))
+        else:
+            file = stack.enter_context(_open(args.input, "r"))
+            if args.format == "json":
+                items = enumerate(iter_annotations(file, jsonl=False), start=1)
+            else:
+                items = _numbered_lines(file)
+        results = imap_chunks(
+            functools.partial(_score_items, args.format, args.gap_penalty, corpus=corpus),
+            items,
+            workers=args.workers,
+            chunksize=args.chunk_size,
+        )
+        for line_number, line, counts, error in results:
+            count += 1
+            if error is not None:
+                invalid += 1
+                _invalid(args, line_number, error, output)
+            else:
+                report.counts += counts
+                output.write(line + "\n")
+    print(report, file=sys.stderr)
+    _report_throughput("score", count, invalid, start)
+
+
+def _ingest(args: argparse.Namespace) -> None:
+    from cacoepy.l2arctic import ingest_textgrids
+
+    start = time.perf_counter()
+    result = ingest_textgrids(
+        args.paths, args.output, workers=args.workers, chunksize=args.chunk_size
+    )
+    for path, error in result.rejected:
+        print(f"cacoepy ingest: rejected {path}: {error}", file=sys.stderr)
+    _report_throughput("ingest", result.ingested, len(result.rejected), start)
+
+
+def _serve(args: argparse.Namespace) -> None:
+    from cacoepy.server import serve
+
+    serve(
+        host=args.host,
+        port=args.port,
+        unix_socket=args.unix_socket,
+        workers=args.workers,
+        max_batch=args.max_batch,
+        max_delay=args.max_delay / 1000,
+        max_pending=args.max_pending,
+    )
+
+
+def _add_stream_arguments(parser: argparse.ArgumentParser, gap_penalty: float) -> None:
+    parser.add_argument("input", help="Input file, or - for stdin.")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout).")
+    parser.add_argument(
+        "--format", choices=FORMATS,
+        help="Input format (default: from the file extension, else jsonl).",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes (default: 1, no pool).",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=256, help="Items sent to a worker at a time.",
+    )
+    parser.add_argument("--gap-penalty", type=float, default=gap_penalty)
+    parser.add_argument(
+        "--skip-invalid", action="store_true",
+        help="Write an error record for invalid items instead of stopping.",
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cacoepy", description="Phoneme alignment and MDD metrics."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    align = commands.add_parser(
+        "align",
+        help="Align pairs or triples of ARPAbet phoneme sequences.",
+        description=(
+            "Aligns pairs with AlignARPAbet2 and triples with AlignARPAbet3. JSONL lines "
+            "are objects with seq1, seq2, optional seq3 and id fields, or arrays of "
+            "sequences; TSV rows have 2 or 3 columns. Phonemes are space separated. "
+            "Output is in the input format, in input order, with the score last."
+        ),
+    )
+    _add_stream_arguments(align, gap_penalty=-4)
+    align.set_defaults(func=_align)
+
+    score = commands.add_parser(
+        "score",
+        help="Align predictions to annotations and compute MDD metrics.",
+        description=(
+            "Reads utterances with target_phonemes, perceived_phonemes (aligned with the "
+            "target) and predicted_phonemes, from JSONL, a JSON object like "
+            "L2Arctic_annotations.json, TSV rows of [id,] target, annotation and "
+            "prediction, or a corpus directory with a prediction stream. Writes each utterance's alignment and metrics as JSONL in input "
+            "order, and the corpus metrics to stderr."
+        ),
+    )
+    _add_stream_arguments(score, gap_penalty=-5)
+    score.set_defaults(func=_score)
+
+    ingest = commands.add_parser(
+        "ingest",
+        help="Encode L2-ARCTIC TextGrid annotations into a compact corpus.",
+        description=(
+            "Parses TextGrid files, or the TextGrids under directories such as the root of "
+            "L2-ARCTIC, and appends their target and perceived phonemes to a corpus "
+            "directory. Rerunning resumes an interrupted ingestion."
+        ),
+    )
+    ingest.add_argument("paths", nargs="+", help="TextGrid files or directories.")
+    ingest.add_argument("-o", "--output", required=True, help="The corpus directory.")
+    ingest.add_argument(
+        "--workers", type=int, default=1, help="Worker processes (default: 1, no pool).",
+    )
+    ingest.add_argument("--chunk-size", type=int, default=64, help="Files sent to a worker at a time.")
+    ingest.set_defaults(func=_ingest)
+
+    serve = commands.add_parser(
+        "serve", help="Run a local HTTP server for alignment and metrics requests."
+    )
+    serve.add_argument("--host", default=DEFAULT_HOST, help="TCP address to listen on.")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on.")
+    serve.add_argument("--unix-socket", help="Listen on this Unix socket path instead of TCP.")
+    serve.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes (default: CPU count, 0 to run in the server process).",
+    )
+    serve.add_argument("--max-batch", type=int, default=64, help="Most requests per batch.")
+    serve.add_argument(
+        "--max-delay", type=float, default=2.0,
+        help="Milliseconds a request may wait for its batch to fill.",
+    )
+    serve.add_argument(
+        "--max-pending", type=int, default=1024,
+        help="Most queued requests before new ones get 503.",
+    )
+    serve.set_defaults(func=_serve)
+    return parser
+
+
+def main(argv: List[str] = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.func(args)
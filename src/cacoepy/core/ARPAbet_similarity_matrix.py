@@ -1,67 +1,154 @@
-import numpy as np
 import json
+from functools import lru_cache
+from importlib import resources
+from typing import Dict, Tuple
 
+MAPPING_FILE = "ARPAbet_mapping.json"
+SIMILARITY_FILE = "ARPAbet_similarity.npz"
 
-def arpabet_similarity_matrix():
+
+def _data_file(name):
+    return resources.files("cacoepy").joinpath("data", name)
+
+
+@lru_cache(maxsize=None)
+def _load_phoneme_data():
+    with _data_file(MAPPING_FILE).open("r") as file:
+        return json.load(file)
+
+
+@lru_cache(maxsize=None)
+def arpabet_vocab() -> Tuple[str, ...]:
+    """
+    Returns the ARPAbet phonemes known to the similarity matrix, in matrix order.
+    """
+    return tuple(_load_phoneme_data()["phoneme_attribute_map"])
+
+
+def build_arpabet_similarity_table():
+    """
+    Computes the ARPAbet similarity scores from the phoneme attributes.
+
+    Each phoneme is represented as a binary vector of its attributes, and every pair
+    of phonemes is scored with the cosine similarity of their vectors, rescaled to
+    round((cosine - 0.5) * 20).
+
+    Returns:
+        Tuple[Tuple[str, ...], np.ndarray]: The phonemes and a 2D int array of scores.
+    """
+    import numpy as np
+
+    def create_phoneme_vectors(attributes, phoneme_attribute_map):
+        num_attributes = len(attributes)
+        phoneme_vectors = {
+            x: np.zeros(num_attributes, dtype=int)
+            for x in phoneme_attribute_map
+        }
+        for phone in phoneme_vectors:
+            for i, att in enumerate(attributes):
+                if att in phoneme_attribute_map[phone]:
+                    phoneme_vectors[phone][i] = 1
+        return phoneme_vectors
+
+    def phoneme_similarity_score(vec_a: np.array, vec_b: np.array):
+        norm_a = np.linalg.norm(vec_a)
+        norm_b = np.linalg.norm(vec_b)
+        if norm_a == 0 or norm_b == 0:
+            return 0.0
+        normaliser = 1 / (norm_a * norm_b)
+        score = normaliser * np.dot(vec_a, vec_b)
+        score = round((score - 0.5) * 20)
+ 
+        return score
+
+    data = _load_phoneme_data()
+    attribute_list = (
+            data["consonant_attributes"] + data["vowel_attributes"]
+        )
+    vectors = create_phoneme_vectors(attribute_list, data["phoneme_attribute_map"])
+    phonemes = tuple(vectors)
+    table = np.array(
+        [[phoneme_similarity_score(vectors[a], vectors[b]) for b in phonemes] for a in phonemes],
+        dtype=np.int64,
+    )
+    return phonemes, table
+
+
+def save_arpabet_similarity_table(path=None):
+    """
+    Writes the precomputed similarity table shipped with the package. Run it again 
+    whenever ARPAbet_mapping.json changes.
+    """
+    import numpy as np
+
+    phonemes, table = build_arpabet_similarity_table()
+    if path is None:
+        path = _data_file(SIMILARITY_FILE)
+    with open(path, "wb") as file:
+        np.savez(file, phonemes=np.array(phonemes), table=table)
+
+
+@lru_cache(maxsize=None)
+def arpabet_similarity_table():
+    """
+    Returns the ARPAbet similarity scores, loaded once per process.
+
+    The scores come from the precomputed table shipped in cacoepy/data, and are
+    rebuilt from the phoneme attributes if it is missing or out of date.
+
+    Returns:
+        Tuple[Tuple[str, ...], np.ndarray]: The phonemes and a read-only 2D array where 
+        table[i, j] is the similarity of phonemes[i] and phonemes[j].
+    """
+    import numpy as np
+
+    phonemes, table = None, None
+    artifact = _data_file(SIMILARITY_FILE)
+    if artifact.is_file():
+        with artifact.open("rb") as file, np.load(file) as data:
+            phonemes = tuple(data["phonemes"].tolist())
+            table = data["table"]
+    if phonemes != arpabet_vocab():
+        phonemes, table = build_arpabet_similarity_table()
+    table.setflags(write=False)
+    return phonemes, table
+
+
+@lru_cache(maxsize=None)
+def arpabet_score_table():
+    """
+    The ARPAbet similarity table compiled for NeedlemanWunschConfig, shared by every 
+    aligner in the process.
+    """
+    import numpy as np
+    from cacoepy.core.Needleman_Wunsch import ScoreTable
+
+    phonemes, table = arpabet_similarity_table()
+    # Symbols outside the vocabulary score 0, like missing keys of the dictionary.
+    padded = np.zeros((len(phonemes) + 1, len(phonemes) + 1), dtype=table.dtype)
+    padded[:-1, :-1] = table
+    padded.setflags(write=False)
+    return ScoreTable(list(phonemes), padded, unknown=len(phonemes))
+
+
+def arpabet_similarity_matrix() -> Dict[str, Dict[str, int]]:
     """
     Generates a similarity matrix for ARPAbet phonemes based on their attributes.
 
-    This function constructs a phoneme similarity matrix by loading phoneme data from a JSON file,
-    creating binary vectors for each phoneme based on their attributes, and then calculating similarity
-    scores between each pair of phonemes using the cosine similarity method.
+    The scores are loaded once per process (see arpabet_similarity_table), and each call
+    returns a new dictionary that is safe to modify.
 
     Returns:
         dict: A dictionary where keys are phoneme pairs and values are their similarity scores.
     """
-    def build_scoring_matrix():
-        def load_phoneme_data(file):
-            with open(file, "r") as file:
-                data = json.load(file)
-            return data
-
-        def create_phoneme_vectors(attributes, phoneme_attribute_map):
-            num_attributes = len(attributes)
-            phoneme_vectors = {
-                x: np.zeros(num_attributes, dtype=int)
-                for x in phoneme_attribute_map
-            }
-            for phone in phoneme_vectors:
-                for i, att in enumerate(attributes):
-                    if att in phoneme_attribute_map[phone]:
-                        phoneme_vectors[phone][i] = 1
-            return phoneme_vectors
-
-        def create_phoneme_similarity_matrix(phoneme_vectors):
-            similarity_matrix = {}
-            for pha, veca in phoneme_vectors.items():
-                similarity_matrix[pha] = {}
-                for phb, vecb in phoneme_vectors.items():
-                    similarity_matrix[pha][phb] = phoneme_similarity_score(veca, vecb)
-            return similarity_matrix
-
-        def phoneme_similarity_score(vec_a: np.array, vec_b: np.array):
-            norm_a = np.linalg.norm(vec_a)
-            norm_b = np.linalg.norm(vec_b)
-            if norm_a == 0 or norm_b == 0:
-                return 0.0
-            normaliser = 1 / (norm_a * norm_b)
-            score = normaliser * np.dot(vec_a, vec_b)
-            score = round((score - 0.5) * 20)
-     
-            return score
-
-        data = load_phoneme_data("data/ARPAbet_mapping.json")
-        attribute_list = (
-                data["consonant_attributes"] + data["vowel_attributes"]
-            )
-        phoneme_attribute_map = data["phoneme_attribute_map"]
-        vectors = create_phoneme_vectors(attribute_list, phoneme_attribute_map)
-        matrix = create_phoneme_similarity_matrix(vectors)
-        return matrix
-    return  build_scoring_matrix()
+    phonemes, table = arpabet_similarity_table()
+    return {
+        a: dict(zip(phonemes, row)) for a, row in zip(phonemes, table.tolist())
+    }
 
 
 if __name__ == "__main__":
+    import numpy as np
     import matplotlib.pyplot as plt
 
     data = arpabet_similarity_matrix()
@@ -1,14 +1,101 @@
-from typing import Callable, Dict, Union, List, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Union, List, Tuple
 import inspect
 from cacoepy.core.utils import pretty_matrices
 from cacoepy.core.exceptions import InvalidSimilarityError, TracebackIndexError
+from cacoepy.core.alignment import MOVE_LEFT, MOVE_UP, Alignment
+from cacoepy.core.cache import AlignmentCache
+from cacoepy.core.packed_trace import PackedTrace
+from cacoepy.core.instrumentation import (
+    AlignmentListener,
+    Instrumented,
+    count_similarity_calls,
+    matrix_bytes,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def score_dtype(values, gap_penalty):
+    """
+    Picks an exact ndarray dtype for the DP scores. Integer scores are kept as int64
+    and anything else falls back to float64.
+    """
+    import numpy as np
+
+    for value in list(values) + [gap_penalty]:
+        if not float(value).is_integer():
+            return np.float64
+    return np.int64
+
+
+def integer_scores(score_table: "ScoreTable", gap_penalty: float) -> bool:
+    """
+    Whether every score of an alignment with this table and gap penalty is a whole
+    number. Such scores are computed exactly as int64 and returned as int, others as
+    float, whatever engine aligns the sequences.
+    """
+    return score_table.table.dtype.kind == "i" and float(gap_penalty).is_integer()
+
+
+def _score_value(score, integer: bool):
+    return int(score) if integer else float(score)
+
+
+class ScoreTable:
+    """
+    A similarity lookup compiled to integer codes.
+
+    Args:
+        symbols (List[str]): The alphabet, where a symbol's code is its index.
+        table (np.ndarray): A dense 2D array where table[code_a, code_b] is the
+            similarity of symbol a followed by symbol b.
+        unknown (int, optional): Code given to symbols outside the alphabet. If None, 
+            encoding an unknown symbol raises a KeyError.
+    """
+    def __init__(self, symbols: List[str], table: "np.ndarray", unknown: int = None):
+        self.symbols = symbols
+        self.codes = {symbol: i for i, symbol in enumerate(symbols)}
+        self.table = table
+        self.unknown = unknown
+        self._rows = None
+
+    def encode(self, seq: Iterable[str]) -> "np.ndarray":
+        """
+        Encodes a sequence of symbols as an array of integer codes. A PhonemeSequence 
+        whose alphabet matches the table is used as is.
+        """
+        import numpy as np
+
+        if hasattr(seq, "codes_for"):
+            encoded = seq.codes_for(self)
+            if encoded is not None:
+                return encoded.astype(np.intp, copy=False)
+        codes = self.codes
+        if self.unknown is None:
+            items = (codes[symbol] for symbol in seq)
+        else:
+            items = (codes.get(symbol, self.unknown) for symbol in seq)
+        return np.fromiter(items, dtype=np.intp)
+
+    def rows(self) -> List[List[float]]:
+        """
+        The table as nested Python lists, the fastest form for scalar lookups. They are
+        built on the first call and shared by later ones, so they must not be changed.
+        """
+        if self._rows is None:
+            self._rows = self.table.tolist()
+        return self._rows
 
 
 class NeedlemanWunschConfig:
     def __init__(
             self, 
             similarity: Union[Callable[[str, str], float], Dict[str, Dict[str, float]]], 
-            gap_penalty:float
+            gap_penalty:float,
+            score_table: ScoreTable = None,
+            pure: bool = True,
+            max_symbols: int = 512,
         ) -> None:
         """
         Configuration class for the Needleman-Wunsch algorithm.
@@ -20,13 +107,32 @@ class NeedlemanWunschConfig:
             similarity (Union[Callable[[str, str], float], Dict[str, Dict[str, float]]]): 
                 A function or a 2D dictionary to compute similarity scores between characters.
             gap_penalty (float): The penalty score for introducing gaps in the alignment.
+            score_table (ScoreTable, optional): The already compiled form of a dictionary 
+                similarity, which skips compiling it again.
+            pure (bool): Whether a callable similarity always returns the same score for
+                the same pair of characters. Pass False for non-deterministic callables,
+                which are then tabulated afresh for every alignment and never served
+                from an AlignmentCache.
+            max_symbols (int): Most characters of a pure callable whose scores are kept
+                between alignments. Past it, the kept scores are dropped.
+
+        Dictionary similarities are compiled once into a dense ScoreTable. Callables
+        are tabulated over the symbols of each input by score_table, which keeps the
+        scores of pure callables so each pair is only evaluated once.
 
         Raises:
             InvalidSimilarityError: If the similarity parameter is neither a callable nor a 2D 
             dictionary. InvalidSimilarityError: If the similarity function does not have 
             exactly two arguments.
         """
+        if max_symbols < 1:
+            raise ValueError("max_symbols must be at least 1.")
         self.gap_penalty = gap_penalty
+        self.pure = pure
+        self.max_symbols = max_symbols
+        self._compiled = None
+        self._observed = None
+        self._fingerprint = None
         if callable(similarity):
             self._validate_callable(similarity)
             self.scoring_function = similarity
@@ -34,6 +140,9 @@ class NeedlemanWunschConfig:
         elif isinstance(similarity, dict):
             self.scoring_function = None
             self.scoring_matrix = similarity
+            if score_table is None:
+                score_table = self._compile_matrix(similarity)
+            self._compiled = score_table
         else:
             raise InvalidSimilarityError(
                 "Similarity must be either a callable or a 2D dictionary"
@@ -54,23 +163,187 @@ class NeedlemanWunschConfig:
         else:
             raise InvalidSimilarityError("No valid scoring method available.")
 
+    def fingerprint(self) -> Tuple:
+        """
+        A hashable value identifying the similarity source and gap penalty. Configs with
+        equal fingerprints produce identical alignments.
+        """
+        if self._fingerprint is None:
+            if self._compiled is not None:
+                import hashlib
 
-class NeedlemanWunsch2D:
+                table = self._compiled.table
+                digest = hashlib.blake2b(table.tobytes(), digest_size=16)
+                digest.update(str((table.dtype.str, table.shape)).encode())
+                source = (tuple(self._compiled.symbols), digest.hexdigest())
+            else:
+                source = self.scoring_function
+            self._fingerprint = (source, self.gap_penalty)
+        return self._fingerprint
+
+    def score_table(self, *sequences: Iterable[str]) -> ScoreTable:
+        """
+        Returns a ScoreTable covering every symbol in the given sequences.
+
+        Dictionary similarities return the table compiled at construction. Pure
+        callables return a table of every symbol observed so far, which is extended
+        when the sequences hold new symbols, so each pair of symbols is evaluated once
+        across calls. Impure callables are evaluated once per distinct pair of symbols
+        found in the sequences. A float table whose scores between the sequences'
+        symbols are whole numbers is narrowed to those symbols, see integer_scores.
+        """
+        if self._compiled is not None:
+            if self._compiled.table.dtype.kind == "i":
+                return self._compiled
+            symbols = dict.fromkeys(symbol for seq in sequences for symbol in seq)
+            return self._narrow(self._compiled, symbols)
+        if self.scoring_function is None:
+            raise InvalidSimilarityError("No valid scoring method available.")
+        symbols = dict.fromkeys(symbol for seq in sequences for symbol in seq)
+        if not self.pure:
+            return self._tabulate(list(symbols), self.scoring_function)
+        observed = self._observed
+        if observed is None or not symbols.keys() <= observed.codes.keys():
+            # Tables are never changed once built, so threads sharing the config keep
+            # using the old one meanwhile. If two threads extend it at once, the last
+            # table wins.
+            if observed is None or len(observed.codes.keys() | symbols.keys()) > self.max_symbols:
+                observed = self._tabulate(list(symbols), self.scoring_function)
+            else:
+                observed = self._extend(observed, [s for s in symbols if s not in observed.codes])
+            self._observed = observed
+        return self._narrow(observed, symbols)
+
+    def _narrow(self, table, symbols):
+        """
+        A float table holds scores of symbols beyond the given ones. For inputs whose
+        pairs all score integers, returns their integer sub-table, so the score type
+        depends neither on unrelated pairs nor on what was aligned before.
+        """
+        import numpy as np
+
+        if table.table.dtype.kind == "i" or not float(self.gap_penalty).is_integer():
+            return table
+        codes = [table.codes.get(symbol, table.unknown) for symbol in symbols]
+        sub_table = table.table[np.ix_(codes, codes)]
+        if not (np.isfinite(sub_table).all() and (sub_table == np.floor(sub_table)).all()):
+            return table
+        return ScoreTable(list(symbols), sub_table.astype(np.int64))
+
+    def _compile_matrix(self, matrix):
+        if not matrix:
+            raise InvalidSimilarityError("No valid scoring method available.")
+        symbols = list(dict.fromkeys(
+            [a for a in matrix] + [b for row in matrix.values() for b in row]
+        ))
+        # The extra code stands for symbols missing from the dictionary, which score 0.
+        table = self._tabulate(symbols + [None], self._apply_scoring)
+        return ScoreTable(symbols, table.table, unknown=len(symbols))
+
+    def _tabulate(self, symbols, func):
+        import numpy as np
+
+        values = [func(a, b) for a in symbols for b in symbols]
+        if func is self.scoring_function:
+            count_similarity_calls(len(values))
+        dtype = score_dtype(values, self.gap_penalty)
+        table = np.array(values, dtype=dtype).reshape(len(symbols), len(symbols))
+        return ScoreTable(symbols, table)
+
+    def _extend(self, observed, new):
+        """
+        Returns a copy of `observed` with rows and columns appended for the `new`
+        symbols. Only pairs involving a new symbol are evaluated, and existing symbols
+        keep their codes.
+        """
+        import numpy as np
+
+        func = self.scoring_function
+        symbols = observed.symbols + new
+        known = len(observed.symbols)
+        columns = [func(a, b) for a in observed.symbols for b in new]
+        rows = [func(a, b) for a in new for b in symbols]
+        count_similarity_calls(len(columns) + len(rows))
+        dtype = np.promote_types(
+            observed.table.dtype, score_dtype(columns + rows, self.gap_penalty)
+        )
+        table = np.empty((len(symbols), len(symbols)), dtype=dtype)
+        table[:known, :known] = observed.table
+        table[:known, known:] = np.array(columns, dtype=dtype).reshape(known, len(new))
+        table[known:, :] = np.array(rows, dtype=dtype).reshape(len(new), len(symbols))
+        return ScoreTable(symbols, table)
+
+
+# Rectangles of at most this many cells, or of one row, are filled and traced back
+# directly.
+_LEAF_CELLS = 1 << 16
+
+
+def _workspace(aligner):
+    """
+    A call-scoped copy of an aligner, sharing its configuration, cache and listeners.
+    Everything a call computes, such as the sequences, matrices and probe, is stored on
+    the copy and freed with it, so the aligner itself is never written to while
+    aligning and can be shared between threads.
+    """
+    work = object.__new__(type(aligner))
+    work.__dict__.update(aligner.__dict__)
+    return work
+
+
+class NeedlemanWunsch2D(Instrumented):
     """
     Performs sequence alignment using the Needleman-Wunsch algorithm with a given configuration.
 
+    Aligners keep no state between calls: each call works on its own workspace, so one 
+    instance can be shared between threads and used indefinitely. To inspect the score 
+    and trace matrices of a call, use align(seq1, seq2, keep_matrices=True).
+
     Args:
         config (NeedlemanWunschConfig): Configuration object containing the scoring function 
         or matrix and gap penalty.
+        mode (str): "full" fills the whole score and trace matrices. "hirschberg" returns 
+        the same alignment in linear space, for very long sequences. "banded" only fills 
+        cells near the diagonal.
+        band (int): Number of diagonals either side of the main diagonals filled in 
+        "banded" mode.
+        widen_band (bool): In "banded" mode, double the band until the result is proven 
+        to be the same as the full alignment. If False, the best alignment inside the 
+        band is returned.
+        cache (AlignmentCache, optional): Reuses alignments of sequence pairs seen before. 
+        On a hit the matrices shown by __str__ are not recomputed.
+        listeners (List[AlignmentListener], optional): Called with an AlignmentEvent of 
+        phase timings and counters after every call. See add_listener.
     """
-    def __init__(self, config: NeedlemanWunschConfig):
+    MODES = ("full", "hirschberg", "banded")
+
+    def __init__(
+            self, 
+            config: NeedlemanWunschConfig, 
+            mode: str = "full", 
+            band: int = 8, 
+            widen_band: bool = True,
+            cache: AlignmentCache = None,
+            listeners: List[AlignmentListener] = None,
+        ):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {self.MODES}.")
+        if band < 0:
+            raise ValueError("The band must not be negative.")
+        self.mode = mode
+        self.band = band
+        self.widen_band = widen_band
+        self.cache = cache
         self.LEFT = "←"
         self.UP = "↑"
         self.DIAG = "↖"
         self.DONE = "X"
         self.GAP = "-"
+        # The full trace matrix holds 2 bit codes, numbered like the MOVE_* codes.
+        self._arrows = (self.DONE, self.UP, self.LEFT, self.DIAG)
+        self._trace_codes = {arrow: code for code, arrow in enumerate(self._arrows)}
         self.config = config
-        self._path_idx = []
+        self.listeners = list(listeners or [])
 
     def __call__(
             self, 
@@ -88,42 +361,479 @@ class NeedlemanWunsch2D:
             Tuple[List[str], List[str], float]: A tuple containing the aligned 
             first sequence, aligned second sequence, and the alignment score.
         """
-        self.left_seq = [""] + seq1
-        self.top_seq = [""] + seq2
+        work = _workspace(self)
+        if self.listeners:
+            return work._observe(self.mode, work._call, seq1, seq2)
+        return work._call(seq1, seq2)
+
+    def _call(self, seq1, seq2):
+        if self.cache is not None and self.config.pure:
+            return self._cached_call(seq1, seq2)
+        return self._align(seq1, seq2)
+
+    def _cached_call(self, seq1, seq2):
+        key = (tuple(seq1), tuple(seq2), self.config.fingerprint())
+        if self.mode == "banded" and not self.widen_band:
+            key += (self.band,)
+        result = self.cache.get(key)
+        if self._probe is not None:
+            self._probe.cache_hit = result is not None
+        if result is None:
+            aligned_left_seq, aligned_top_seq, score = self._align(list(seq1), list(seq2))
+            result = (tuple(aligned_left_seq), tuple(aligned_top_seq), score)
+            self.cache.put(key, result)
+        return list(result[0]), list(result[1]), result[2]
+
+    def _align(self, seq1, seq2):
+        if self.mode == "hirschberg":
+            aligned_left_seq, aligned_top_seq, score = self._align_linear_space(seq1, seq2)
+        elif self.mode == "banded":
+            aligned_left_seq, aligned_top_seq, score = self._align_banded(seq1, seq2)
+        else:
+            self._fill_full(seq1, seq2)
+            aligned_left_seq, aligned_top_seq, score = self._traceback()
+            if self._probe is not None:
+                self._probe.mark("traceback")
+        return aligned_left_seq, aligned_top_seq, _score_value(score, self._integer)
+
+    def align(
+            self, 
+            seq1: List[str], 
+            seq2: List[str], 
+            keep_matrices: bool = False
+        ) -> Alignment:
+        """
+        Aligns two sequences like __call__, but returns an Alignment of run-length 
+        encoded edit operations. In "full" mode without a cache the gapped sequences 
+        are never built unless the Alignment is asked for them.
+
+        Args:
+            seq1 (str): The first sequence to align.
+            seq2 (str): The second sequence to align.
+            keep_matrices (bool): Keep the workspace of the call, with its score and 
+            trace matrices, as Alignment.workspace. str(alignment) then prints them.
+
+        Returns:
+            Alignment: The edit operations turning seq1 into seq2, and the score.
+        """
+        work = _workspace(self)
+        if self.listeners:
+            alignment = work._observe(self.mode, work._align_ops, seq1, seq2)
+        else:
+            alignment = work._align_ops(seq1, seq2)
+        if keep_matrices:
+            alignment.workspace = work
+        return alignment
+
+    def _align_ops(self, seq1, seq2):
+        if self.cache is not None or self.mode != "full":
+            aligned_left_seq, aligned_top_seq, score = self._call(seq1, seq2)
+            return Alignment.from_aligned(
+                aligned_left_seq, aligned_top_seq, score, seq1, seq2, gap=self.GAP
+            )
+        self._fill_full(seq1, seq2)
+        moves, score = self._trace_moves()
+        if self._probe is not None:
+            self._probe.mark("traceback")
+        score = _score_value(score, self._integer)
+        return Alignment.from_moves(moves, seq1, seq2, score, gap=self.GAP)
+
+    def _fill_full(self, seq1, seq2):
+        self.left_seq = [""] + list(seq1)
+        self.top_seq = [""] + list(seq2)
         self.N_col = len(self.top_seq)
         self.N_row = len(self.left_seq)
+        self._encode(seq1, seq2)
         self.score_matrix, self.trace_matrix = self._init_score_and_trace_matrix() 
+        probe = self._probe
+        if probe is not None:
+            probe.mark("init")
         self._fill_score_matrix()
-        aligned_left_seq, aligned_top_seq, score = self._traceback()
+        if probe is not None:
+            cells = (self.N_row - 1) * (self.N_col - 1)
+            nbytes = matrix_bytes(self.score_matrix, self.trace_matrix)
+            probe.mark("fill", cells=cells, lookups=cells, nbytes=nbytes)
+
+    def score(self, seq1: List[str], seq2: List[str]) -> float:
+        """
+        Computes the Needleman-Wunsch alignment score without aligning the sequences.
+
+        Only two rows of the score matrix are kept and no trace matrix is built, so
+        memory grows with len(seq2) instead of len(seq1) * len(seq2).
+
+        Args:
+            seq1 (str): The first sequence.
+            seq2 (str): The second sequence.
+
+        Returns:
+            float: The same score returned by aligning the sequences.
+        """
+        work = _workspace(self)
+        if self.listeners:
+            return work._observe("score", work._score, seq1, seq2)
+        return work._score(seq1, seq2)
+
+    def _score(self, seq1, seq2):
+        first_row, next_row = self._row_kernel(seq1, seq2)
+        probe = self._probe
+        if probe is not None:
+            probe.mark("init")
+            next_row = probe.count_rows(next_row)
+        row = first_row
+        for i in range(1, len(seq1) + 1):
+            row = next_row(row, i)
+        if probe is not None:
+            probe.mark("fill", nbytes=2 * matrix_bytes(first_row))
+        return _score_value(row[-1], self._integer)
+
+    def _first_row(self, length):
+        row = [0] * length
+        gap = 0
+        for j in range(length):
+            row[j] = gap
+            gap = gap + self.config.gap_penalty
+        return row
+
+    def _row_kernel(self, seq1, seq2):
+        """
+        Returns row 0 of the score matrix and a function computing row i from row i - 1.
+
+        next_row(prev_row, i, start=0, first=None) fills the columns start to
+        start + len(prev_row) - 1 of row i, given the same columns of row i - 1. `first` 
+        is the score of column `start`, which defaults to the gap penalty added to the 
+        first score of prev_row, as in column 0.
+        """
+        score_table = self._score_table(seq1, seq2)
+        similarity = score_table.rows()
+        left_codes = score_table.encode(seq1).tolist()
+        top_codes = score_table.encode(seq2).tolist()
+        gap = self.config.gap_penalty
+
+        def next_row(prev_row, i, start=0, first=None):
+            left_code = left_codes[i - 1]
+            row = [prev_row[0] + gap if first is None else first]
+            for j in range(1, len(prev_row)):
+                row.append(max(
+                    prev_row[j - 1] + similarity[top_codes[start + j - 1]][left_code],
+                    prev_row[j] + gap,
+                    row[j - 1] + gap,
+                ))
+            return row
+
+        return self._first_row(len(top_codes) + 1), next_row
+
+    def _align_linear_space(self, seq1, seq2):
+        """
+        Hirschberg's divide-and-conquer alignment, returning exactly what the full
+        matrix traceback would while only holding a few rows and columns of scores.
+
+        Each subproblem is a rectangle of the score matrix that the traceback enters at
+        its bottom right corner and leaves at its top left one, given the scores of its
+        top row and left column. One forward pass over the rectangle also carries, for
+        every cell below the middle row, the column where the traceback from that cell
+        first reaches the middle row, following the traceback's UP > LEFT > DIAG order.
+        The column reached from the corner splits the rectangle into two smaller ones
+        that only share a corner, so memory is O(n + m) and time O(nm). Small rectangles
+        are filled and traced back directly. Instrumentation reports the
+        interleaved fill and traceback as "fill".
+        """
+        self.left_seq = [""] + list(seq1)
+        self.top_seq = [""] + list(seq2)
+        self.N_col = len(self.top_seq)
+        self.N_row = len(self.left_seq)
+        first_row, next_row = self._row_kernel(seq1, seq2)
+        first_col = self._first_row(self.N_row)
+        probe = self._probe
+        if probe is not None:
+            probe.mark("init")
+            next_row = probe.count_rows(next_row)
+        gap = self.config.gap_penalty
+        last_row = self.N_row - 1
+        last_col = self.N_col - 1
+        aligned_left_seq = []
+        aligned_top_seq = []
+        score = [first_row[-1]]
+
+        def trace_left(j, end):
+            for col in range(j, end, -1):
+                aligned_left_seq.append(self.GAP)
+                aligned_top_seq.append(self.top_seq[col])
+
+        def solve(r0, r1, c0, c1, top_row, left_col):
+            # Follows the traceback from (r1, c1) to (r0, c0), given the scores of row r0
+            # and column c0 inside the rectangle.
+            if r1 - r0 <= 1 or (r1 - r0) * (c1 - c0 + 1) <= _LEAF_CELLS:
+                rows = [top_row]
+                for i in range(r0 + 1, r1 + 1):
+                    rows.append(next_row(rows[-1], i, c0, left_col[i - r0]))
+                if r1 == last_row and c1 == last_col:
+                    score[0] = rows[-1][-1]
+                i, j = r1, c1
+                while i > r0:
+                    row = rows[i - r0]
+                    cell_score = row[j - c0]
+                    if j > c0 and rows[i - r0 - 1][j - c0] + gap != cell_score:
+                        aligned_top_seq.append(self.top_seq[j])
+                        if row[j - c0 - 1] + gap == cell_score:
+                            aligned_left_seq.append(self.GAP)
+                            j -= 1
+                            continue
+                        j -= 1
+                    else:
+                        aligned_top_seq.append(self.GAP)
+                    aligned_left_seq.append(self.left_seq[i])
+                    i -= 1
+                trace_left(j, c0)
+                return
+
+            mid = (r0 + r1) // 2
+            row = top_row
+            for i in range(r0 + 1, mid + 1):
+                row = next_row(row, i, c0, left_col[i - r0])
+            mid_row = row
+            crossing = self._first_crossings(c0, c1)
+            for i in range(mid + 1, r1 + 1):
+                new_row = next_row(row, i, c0, left_col[i - r0])
+                crossing = self._next_crossings(row, new_row, crossing)
+                row = new_row
+            if r1 == last_row and c1 == last_col:
+                score[0] = row[-1]
+            mid_col = int(crossing[-1])
+            del row, new_row, crossing
+
+            # The lower rectangle's left column is column mid_col below the middle row.
+            row = mid_row[:mid_col - c0 + 1]
+            lower_col = [row[-1]]
+            for i in range(mid + 1, r1 + 1):
+                row = next_row(row, i, c0, left_col[i - r0])
+                lower_col.append(row[-1])
+            lower_row = mid_row[mid_col - c0:].copy()
+            del row, mid_row
+            solve(mid, r1, mid_col, c1, lower_row, lower_col)
+            del lower_row, lower_col
+            solve(r0, mid, c0, mid_col, top_row[:mid_col - c0 + 1], left_col[:mid - r0 + 1])
+
+        solve(0, last_row, 0, last_col, first_row, first_col)
+        aligned_top_seq.reverse()
+        aligned_left_seq.reverse()
+        if probe is not None:
+            # About five rows, two columns and one small rectangle are held at once.
+            leaf = min(_LEAF_CELLS, self.N_row * self.N_col) * 8
+            nbytes = 5 * matrix_bytes(first_row) + 2 * matrix_bytes(first_col) + leaf
+            probe.mark("fill", nbytes=nbytes)
+        return aligned_left_seq, aligned_top_seq, score[0]
+
+    def _first_crossings(self, c0, c1):
+        return list(range(c0, c1 + 1))
+
+    def _next_crossings(self, prev_row, row, prev_crossing):
+        """
+        Where the traceback from each cell of `row` first reaches the middle row, given
+        the same for the row above. The first column of a rectangle can only move up.
+        """
+        gap = self.config.gap_penalty
+        crossing = [prev_crossing[0]]
+        for j in range(1, len(row)):
+            if prev_row[j] + gap == row[j]:
+                crossing.append(prev_crossing[j])
+            elif row[j - 1] + gap == row[j]:
+                crossing.append(crossing[j - 1])
+            else:
+                crossing.append(prev_crossing[j - 1])
+        return crossing
+
+    def _align_banded(self, seq1, seq2):
+        """
+        Fills only the cells within `band` diagonals of the corridor between the main
+        diagonal and the diagonal ending in the last cell.
+
+        An alignment leaving the band must step out of it from an edge cell, so its score
+        is at most the banded score of that edge cell, plus a gap, plus the best score
+        any path could still collect from the cell outside. When the banded optimum beats
+        that cap for every edge cell, all optimal alignments lie inside the band, the band
+        reproduces the full matrix values and directions along the traceback, and the
+        result is identical. Otherwise the band is doubled, up to the whole matrix.
+        """
+        self.left_seq = [""] + list(seq1)
+        self.top_seq = [""] + list(seq2)
+        self.N_col = len(self.top_seq)
+        self.N_row = len(self.left_seq)
+        self._encode(seq1, seq2)
+        n = self.N_row - 1
+        m = self.N_col - 1
+        band = self.band
+        probe = self._probe
+        if probe is not None:
+            probe.mark("init")
+        cells = 0
+        while True:
+            lo = min(0, m - n) - band
+            hi = max(0, m - n) + band
+            score, trace, codes, edges = self._fill_band(lo, hi)
+            if probe is not None:
+                cells += self._band_cells(lo, hi)
+            if not self.widen_band or (lo <= -n and hi >= m):
+                break
+            if score > self._band_bound(lo, hi, *edges):
+                break
+            band = max(1, band * 2)
+        self.band_used = band
+        if probe is not None:
+            # List engines keep a score row for every trace row, ndarray ones do not.
+            nbytes = matrix_bytes(trace) * (2 if isinstance(trace, list) else 1)
+            probe.mark("fill", cells=cells, lookups=cells, nbytes=nbytes)
+        aligned_left_seq, aligned_top_seq = self._traceback_band(trace, lo, *codes)
+        if probe is not None:
+            probe.mark("traceback")
         return aligned_left_seq, aligned_top_seq, score
 
+    def _band_cells(self, lo, hi):
+        """Number of cells with i, j >= 1 and lo <= j - i <= hi."""
+        m = self.N_col - 1
+        return sum(
+            max(0, min(m, i + hi) - max(1, i + lo) + 1) for i in range(1, self.N_row)
+        )
+
+    def _band_bound(self, lo, hi, upper_edge, lower_edge):
+        """
+        Upper bound on the score of any alignment that leaves the band. upper_edge[i] and
+        lower_edge[i] are the banded scores of cells (i, i + hi) and (i, i + lo).
+        """
+        n = self.N_row - 1
+        m = self.N_col - 1
+        gap = self.config.gap_penalty
+        similarity = self._similarity
+        best_match = max(
+            similarity[top][left] 
+            for top in set(self._top_codes[1:]) 
+            for left in set(self._left_codes[1:])
+        )
+        if 2 * gap >= best_match:
+            return float("inf")
+
+        def remaining(i, j):
+            # Best case from (i, j) to (n, m): the fewest gaps and best_match elsewhere.
+            return abs((m - j) - (n - i)) * gap + min(n - i, m - j) * best_match
+
+        bound = float("-inf")
+        for i in range(n + 1):
+            j = i + hi
+            if 0 <= j < m:
+                bound = max(bound, upper_edge[i] + gap + remaining(i, j + 1))
+            j = i + lo
+            if 0 <= j <= m and i < n:
+                bound = max(bound, lower_edge[i] + gap + remaining(i + 1, j))
+        return bound + 1e-9 * max(1.0, abs(bound))
+
+    def _fill_band(self, lo, hi):
+        """
+        Fills the cells with lo <= j - i <= hi. Row i of the returned trace holds the
+        directions of columns i + lo to i + hi.
+        """
+        n = self.N_row - 1
+        m = self.N_col - 1
+        width = hi - lo + 1
+        gap = self.config.gap_penalty
+        similarity = self._similarity
+        left_codes = self._left_codes
+        top_codes = self._top_codes
+        out_of_band = float("-inf")
+        first_row = self._first_row(m + 1)
+        first_col = self._first_row(n + 1)
+        scores = []
+        trace = []
+        for i in range(n + 1):
+            score_row = [out_of_band] * width
+            trace_row = [None] * width
+            for t in range(max(0, -i - lo), min(width, m - i - lo + 1)):
+                j = i + lo + t
+                if i == 0:
+                    score_row[t] = first_row[j]
+                    trace_row[t] = self.LEFT if j else self.DONE
+                    continue
+                if j == 0:
+                    score_row[t] = first_col[i]
+                    trace_row[t] = self.UP
+                    continue
+                prev_row = scores[i - 1]
+                score = {
+                    self.DIAG: prev_row[t] + similarity[top_codes[j]][left_codes[i]],
+                    self.UP: prev_row[t + 1] + gap if t + 1 < width else out_of_band,
+                    self.LEFT: score_row[t - 1] + gap if t > 0 else out_of_band,
+                }
+                score_row[t], trace_row[t] = self._choose_path(score)
+            scores.append(score_row)
+            trace.append(trace_row)
+        edges = [row[-1] for row in scores], [row[0] for row in scores]
+        return scores[n][m - n - lo], trace, (self.UP, self.LEFT, self.DIAG), edges
+
+    def _traceback_band(self, trace, lo, up, left, diag):
+        aligned_top_seq = []
+        aligned_left_seq = []
+        left_idx = self.N_row - 1
+        top_idx = self.N_col - 1
+        while left_idx > 0 or top_idx > 0:
+            cell = trace[left_idx][top_idx - left_idx - lo]
+            if cell == diag:
+                aligned_top_seq.append(self.top_seq[top_idx])
+                aligned_left_seq.append(self.left_seq[left_idx])
+                left_idx -= 1
+                top_idx -= 1
+            elif cell == left:
+                aligned_top_seq.append(self.top_seq[top_idx])
+                aligned_left_seq.append(self.GAP)
+                top_idx -= 1
+            elif cell == up:
+                aligned_top_seq.append(self.GAP)
+                aligned_left_seq.append(self.left_seq[left_idx])
+                left_idx -= 1
+            else:
+                raise TracebackIndexError(f"{left_idx=}, {top_idx=}")
+
+        aligned_top_seq.reverse()
+        aligned_left_seq.reverse()
+        return aligned_left_seq, aligned_top_seq
+
+    def _score_table(self, *sequences):
+        """The config's ScoreTable for the sequences, noting the score type of the call."""
+        score_table = self.config.score_table(*sequences)
+        self._integer = integer_scores(score_table, self.config.gap_penalty)
+        return score_table
+
+    def _encode(self, seq1, seq2):
+        score_table = self._score_table(seq1, seq2)
+        self._similarity = score_table.rows()
+        self._left_codes = [0] + score_table.encode(seq1).tolist()
+        self._top_codes = [0] + score_table.encode(seq2).tolist()
+
     def _init_score_and_trace_matrix(self):
         score_matrix = [[0] * self.N_col for _ in range(self.N_row)]
-        trace_matrix = [[0] * self.N_col for _ in range(self.N_row)]
+        trace_matrix = PackedTrace((self.N_row, self.N_col), bits=2)
         gap = 0
         for i in range(self.N_row):
             score_matrix[i][0] = gap
-            trace_matrix[i][0] = self.UP
+            trace_matrix[i, 0] = MOVE_UP
             gap = gap + self.config.gap_penalty
         gap = 0
         for j in range(self.N_col):
             score_matrix[0][j] = gap
-            trace_matrix[0][j] = self.LEFT
             gap = gap + self.config.gap_penalty
-        trace_matrix[0][0] = self.DONE
+        trace_matrix.set_row((0,), [0] + [MOVE_LEFT] * (self.N_col - 1))
         return score_matrix, trace_matrix
 
     def _fill_score_matrix(self):
+        codes = self._trace_codes
+        trace = self.trace_matrix
         for i in range(1, self.N_row):
+            trace_row = [MOVE_UP] * self.N_col
             for j in range(1, self.N_col):
                 score, direction = self._score_cell(i, j)
                 self.score_matrix[i][j] = score
-                self.trace_matrix[i][j] = direction
+                trace_row[j] = codes[direction]
+            trace.set_row((i,), trace_row)
 
     def _score_cell(self, i, j):
-        left_char = self.left_seq[i]
-        top_char = self.top_seq[j]
-        s_ij = self.similarity_score(top_char, left_char)
+        s_ij = self._similarity[self._top_codes[j]][self._left_codes[i]]
         score = {
             self.DIAG: self.score_matrix[i - 1][j - 1] + s_ij,
             self.UP: self.score_matrix[i - 1][j] + self.config.gap_penalty,
@@ -147,10 +857,13 @@ class NeedlemanWunsch2D:
         left_idx = self.N_row - 1
         top_idx = self.N_col - 1
         score = self.score_matrix[left_idx][top_idx]
+        arrows = self._arrows
+        trace = self.trace_matrix
+        path = self._path_idx = []
         cell = None
         while cell != self.DONE:
-            self._path_idx.append((left_idx, top_idx))
-            cell = self.trace_matrix[left_idx][top_idx]
+            path.append((left_idx, top_idx))
+            cell = arrows[trace[left_idx, top_idx]]
             if cell == self.DIAG:
                 aligned_top_seq.append(self.top_seq[top_idx])
                 aligned_left_seq.append(self.left_seq[left_idx])
@@ -173,17 +886,60 @@ class NeedlemanWunsch2D:
 
         return aligned_left_seq, aligned_top_seq, score
 
+    def _trace_moves(self):
+        """The traceback as MOVE_* codes in forward order, and the score."""
+        path = []
+        left_idx = self.N_row - 1
+        top_idx = self.N_col - 1
+        trace = self.trace_matrix
+        while left_idx > 0 or top_idx > 0:
+            move = trace[left_idx, top_idx]
+            if not move:
+                raise TracebackIndexError(f"{left_idx=}, {top_idx=}")
+            path.append(move)
+            if move != MOVE_LEFT:
+                left_idx -= 1
+            if move != MOVE_UP:
+                top_idx -= 1
+            if left_idx < 0 or top_idx < 0:
+                raise TracebackIndexError(f"{left_idx=}, {top_idx=}")
+        path.reverse()
+        return path, self.score_matrix[self.N_row - 1][self.N_col - 1]
+
     def similarity_score(self, char_a, char_b):
         return self.config._apply_scoring(char_a, char_b)
 
     def __str__(self):
+        if "score_matrix" not in self.__dict__:
+            return (
+                f"{type(self).__name__}(mode={self.mode!r}, "
+                f"gap_penalty={self.config.gap_penalty!r})"
+            )
         m1 = pretty_matrices(self.score_matrix, self.top_seq, self.left_seq)
-        m2 = pretty_matrices(self.trace_matrix, self.top_seq, self.left_seq)
+        m2 = pretty_matrices(self.trace_matrix.decode(self._arrows), self.top_seq, self.left_seq)
         return m1 + "\n"*3 + m2
 
 
-class NeedlemanWunsch3D:
-    def __init__(self, config: NeedlemanWunschConfig):
+class NeedlemanWunsch3D(Instrumented):
+    """
+    Aligns three sequences jointly using the Needleman-Wunsch algorithm with 
+    sum-of-pairs scoring.
+
+    Every column of the alignment scores the similarity of each pair of phonemes in it,
+    plus the gap penalty for each pair of a phoneme and a gap. Ties are broken in the
+    order UP, LEFT, BACK, DIAG, BACK_UP, BACK_LEFT, BACK_DIAG.
+
+    Args:
+        config (NeedlemanWunschConfig): Configuration object containing the scoring function 
+        or matrix and gap penalty.
+        listeners (List[AlignmentListener], optional): Called with an AlignmentEvent of 
+        phase timings and counters after every call. See add_listener.
+    """
+    def __init__(
+            self, 
+            config: NeedlemanWunschConfig, 
+            listeners: List[AlignmentListener] = None,
+        ):
         self.UP = "U"
         self.LEFT = "L"
         self.BACK = "B"
@@ -193,72 +949,126 @@ class NeedlemanWunsch3D:
         self.BACK_DIAG = "BD"
         self.DONE = "X"
         self.GAP = "-"
+        # The trace matrix holds 3 bit codes: 0 for the origin, then the moves in 
+        # tie-breaking order.
+        self._arrows = (
+            self.DONE, self.UP, self.LEFT, self.BACK, self.DIAG, 
+            self.BACK_UP, self.BACK_LEFT, self.BACK_DIAG,
+        )
+        self._trace_codes = {arrow: code for code, arrow in enumerate(self._arrows)}
         self.config = config
+        self.listeners = list(listeners or [])
+
+    def __call__(
+            self, 
+            seq1: List[str], 
+            seq2: List[str], 
+            seq3: List[str]
+        ) -> Tuple[List[str], List[str], List[str], float]:
+        """
+        Aligns three sequences.
+
+        Args:
+            seq1 (str): The first sequence to align.
+            seq2 (str): The second sequence to align.
+            seq3 (str): The third sequence to align.
+
+        Returns:
+            Tuple[List[str], List[str], List[str], float]: The three aligned sequences 
+            and the alignment score.
+        """
+        work = _workspace(self)
+        if self.listeners:
+            return work._observe("full", work._call, seq1, seq2, seq3)
+        return work._call(seq1, seq2, seq3)
+
+    def _call(self, seq1, seq2, seq3):
+        *aligned, score = self._align(seq1, seq2, seq3)
+        return (*aligned, _score_value(score, self._integer))
+
+    def _score_table(self, *sequences):
+        """The config's ScoreTable for the sequences, noting the score type of the call."""
+        score_table = self.config.score_table(*sequences)
+        self._integer = integer_scores(score_table, self.config.gap_penalty)
+        return score_table
 
-    def __call__(self, seq1, seq2, seq3):
-        self.top_seq = [""] + seq1
-        self.left_seq = [""] + seq2
-        self.back_seq = [""] + seq3
+    def _align(self, seq1, seq2, seq3):
+        self.top_seq = [""] + list(seq1)
+        self.left_seq = [""] + list(seq2)
+        self.back_seq = [""] + list(seq3)
         self.N_row = len(self.top_seq)
         self.N_col = len(self.left_seq)
         self.N_wid = len(self.back_seq)
+        score_table = self._score_table(seq1, seq2, seq3)
+        self._similarity = score_table.rows()
+        self._top_codes = [0] + score_table.encode(seq1).tolist()
+        self._left_codes = [0] + score_table.encode(seq2).tolist()
+        self._back_codes = [0] + score_table.encode(seq3).tolist()
         self.score_matrix, self.trace_matrix = self._init_score_and_trace_matrix()
+        probe = self._probe
+        if probe is not None:
+            probe.mark("init")
         self._fill_score_matrix()
-        return self._traceback()
+        if probe is not None:
+            n, m, w = self.N_row - 1, self.N_col - 1, self.N_wid - 1
+            # DIAG, BACK_UP and BACK_LEFT read one similarity, BACK_DIAG reads three.
+            lookups = n * m * (w + 1) + n * w * (m + 1) + m * w * (n + 1) + 3 * n * m * w
+            nbytes = matrix_bytes(self.score_matrix, self.trace_matrix)
+            cells = self.N_row * self.N_col * self.N_wid - 1
+            probe.mark("fill", cells=cells, lookups=lookups, nbytes=nbytes)
+        result = self._traceback()
+        if probe is not None:
+            probe.mark("traceback")
+        return result
 
     def _init_score_and_trace_matrix(self):
         score_matrix = [
             [[0] * self.N_wid for _ in range(self.N_col)] for _ in range(self.N_row)
         ]
-        trace_matrix = [
-            [[""] * self.N_wid for _ in range(self.N_col)] for _ in range(self.N_row)
-        ]
-        gap = 0
-        for i in range(self.N_row):
-            for j in range(self.N_col):
-                score_matrix[i][j][0] = gap
-                trace_matrix[i][j][0] = self.BACK
-                gap -= self.config.gap_penalty
-        gap = 0
-        for j in range(self.N_col):
-            for k in range(self.N_wid):
-                score_matrix[0][j][k] = gap
-                trace_matrix[0][j][k] = self.LEFT
-                gap -= self.config.gap_penalty
-        gap = 0
-        for i in range(self.N_row):
-            for k in range(self.N_wid):
-                score_matrix[i][0][k] = gap
-                trace_matrix[i][0][k] = self.UP
-                gap -= self.config.gap_penalty
-        trace_matrix[0][0][0] = self.DONE
+        trace_matrix = PackedTrace((self.N_row, self.N_col, self.N_wid), bits=3)
         return score_matrix, trace_matrix
 
     def _fill_score_matrix(self):
-        for i in range(1, self.N_row):
-            for j in range(1, self.N_col):
-                for k in range(1, self.N_wid):
-                    score, direction = self._score_cell(i, j, k)
-                    self.score_matrix[i][j][k] = score
-                    self.trace_matrix[i][j][k] = direction
+        # Cells on the faces of the cube simply have fewer moves available.
+        codes = self._trace_codes
+        trace = self.trace_matrix
+        for i in range(self.N_row):
+            for j in range(self.N_col):
+                trace_row = [0] * self.N_wid
+                for k in range(self.N_wid):
+                    if i or j or k:
+                        score, direction = self._score_cell(i, j, k)
+                        self.score_matrix[i][j][k] = score
+                        trace_row[k] = codes[direction]
+                trace.set_row((i, j), trace_row)
 
     def _score_cell(self, i, j, k):
-        gap = self.config.gap_penalty
-        row_char = self.top_seq[i]
-        col_char = self.left_seq[j]
-        back_char = self.back_seq[k]
-        s_ij = self.similarity(row_char, col_char)
-        s_ik = self.similarity(row_char, back_char)
-        s_jk = self.similarity(col_char, back_char)
-        score = {
-            self.UP: self.score_matrix[i - 1][j][k] - 2 * gap,
-            self.LEFT: self.score_matrix[i][j - 1][k] - 2 * gap,
-            self.BACK: self.score_matrix[i][j][k - 1] - 2 * gap,
-            self.DIAG: self.score_matrix[i - 1][j - 1][k] + s_ij - gap,
-            self.BACK_UP: self.score_matrix[i - 1][j][k - 1] + s_ik - gap,
-            self.BACK_LEFT: self.score_matrix[i][j - 1][k - 1] + s_jk - gap,
-            self.BACK_DIAG: self.score_matrix[i - 1][j - 1][k - 1] + s_ij + s_ik + s_jk,
-        }
+        gap = 2 * self.config.gap_penalty
+        H = self.score_matrix
+        similarity = self._similarity
+        row_code = self._top_codes[i]
+        col_code = self._left_codes[j]
+        back_code = self._back_codes[k]
+        score = {}
+        if i:
+            score[self.UP] = H[i - 1][j][k] + gap
+        if j:
+            score[self.LEFT] = H[i][j - 1][k] + gap
+        if k:
+            score[self.BACK] = H[i][j][k - 1] + gap
+        if i and j:
+            score[self.DIAG] = H[i - 1][j - 1][k] + similarity[row_code][col_code] + gap
+        if i and k:
+            score[self.BACK_UP] = H[i - 1][j][k - 1] + similarity[row_code][back_code] + gap
+        if j and k:
+            score[self.BACK_LEFT] = H[i][j - 1][k - 1] + similarity[col_code][back_code] + gap
+        if i and j and k:
+            score[self.BACK_DIAG] = (
+                H[i - 1][j - 1][k - 1]
+                + similarity[row_code][col_code]
+                + similarity[row_code][back_code]
+                + similarity[col_code][back_code]
+            )
         direction = max(score, key=score.get)
         max_score = score[direction]
         return max_score, direction
@@ -271,67 +1081,45 @@ class NeedlemanWunsch3D:
         i = self.N_row - 1
         j = self.N_col - 1
         k = self.N_wid - 1
+        score = self.score_matrix[i][j][k]
+        steps = {
+            self.UP: (1, 0, 0),
+            self.LEFT: (0, 1, 0),
+            self.BACK: (0, 0, 1),
+            self.DIAG: (1, 1, 0),
+            self.BACK_UP: (1, 0, 1),
+            self.BACK_LEFT: (0, 1, 1),
+            self.BACK_DIAG: (1, 1, 1),
+        }
 
+        trace = self.trace_matrix
         while i > 0 or j > 0 or k > 0:
-            try:
-                cell = self.trace_matrix[i][j][k]
-            except IndexError:
-                print(f"IndexError at i={i}, j={j}, k={k}")
-                print("")
-                break
-
-            if cell == self.DIAG:
-                aligned_top_seq.append(self.top_seq[i])
-                aligned_left_seq.append(self.left_seq[j])
-                aligned_back_seq.append(self.GAP)
-                i -= 1
-                j -= 1
-            elif cell == self.BACK_UP:
-                aligned_top_seq.append(self.top_seq[i])
-                aligned_left_seq.append(self.GAP)
-                aligned_back_seq.append(self.back_seq[k])
-                i -= 1
-                k -= 1
-            elif cell == self.BACK_LEFT:
-                aligned_top_seq.append(self.GAP)
-                aligned_left_seq.append(self.left_seq[j])
-                aligned_back_seq.append(self.back_seq[k])
-                j -= 1
-                k -= 1
-            elif cell == self.BACK:
-                aligned_top_seq.append(self.GAP)
-                aligned_left_seq.append(self.GAP)
-                aligned_back_seq.append(self.back_seq[k])
-                k -= 1
-            elif cell == self.LEFT:
-                aligned_top_seq.append(self.GAP)
-                aligned_left_seq.append(self.left_seq[j])
-                aligned_back_seq.append(self.GAP)
-                j -= 1
-            elif cell == self.UP:
-                aligned_top_seq.append(self.top_seq[i])
-                aligned_left_seq.append(self.GAP)
-                aligned_back_seq.append(self.GAP)
-                i -= 1
-            elif cell == self.BACK_DIAG:
-                aligned_top_seq.append(self.top_seq[i])
-                aligned_left_seq.append(self.left_seq[j])
-                aligned_back_seq.append(self.back_seq[k])
-                i -= 1
-                j -= 1
-                k -= 1
-            else:
-                print(f"Breaking loop: i={i}, j={j}, k={k}, cell={cell}")
-                break
+            cell = self._arrows[trace[i, j, k]]
+            if cell not in steps:
+                raise TracebackIndexError(f"{i=}, {j=}, {k=}, {cell=}")
+            di, dj, dk = steps[cell]
+            aligned_top_seq.append(self.top_seq[i] if di else self.GAP)
+            aligned_left_seq.append(self.left_seq[j] if dj else self.GAP)
+            aligned_back_seq.append(self.back_seq[k] if dk else self.GAP)
+            i -= di
+            j -= dj
+            k -= dk
 
         aligned_top_seq.reverse()
         aligned_left_seq.reverse()
         aligned_back_seq.reverse()
 
-        return aligned_top_seq, aligned_left_seq, aligned_back_seq
+        return aligned_top_seq, aligned_left_seq, aligned_back_seq, score
 
     def similarity(self, char_a, char_b):
-        return self.config.apply_scoring(char_a, char_b)
+        return self.config._apply_scoring(char_a, char_b)
 
     def __str__(self):
-        return "TODO"
+        if "trace_matrix" not in self.__dict__:
+            return f"{type(self).__name__}(gap_penalty={self.config.gap_penalty!r})"
+        planes = []
+        for i, plane in enumerate(self.trace_matrix.decode(self._arrows)):
+            planes.append(f"{self.top_seq[i] or '.'}:\n" + pretty_matrices(
+                plane, self.back_seq, self.left_seq
+            ))
+        return "\n\n".join(planes)
@@ -0,0 +1,133 @@
+import numpy as np
+from cacoepy.core.Needleman_Wunsch_vectorized import (
+    DIAG,
+    DONE,
+    LEFT,
+    UP,
+    NeedlemanWunsch2DVectorized,
+)
+from cacoepy.core.exceptions import TracebackIndexError
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+JIT_AVAILABLE = numba is not None
+
+
+def _fill_kernel(similarity, gap, scores, trace, row_bytes):
+    # The scalar recurrence of NeedlemanWunsch2D over ndarrays, in the subset of Python
+    # Numba compiles. Row 0 and column 0 must already hold the gap boundary. `trace` is
+    # the byte array of a 2 bit PackedTrace whose inner cells are still 0.
+    n_row, n_col = scores.shape
+    for i in range(1, n_row):
+        for j in range(1, n_col):
+            diag = scores[i - 1, j - 1] + similarity[i, j]
+            up = scores[i - 1, j] + gap
+            left = scores[i, j - 1] + gap
+            best = max(diag, up, left)
+            scores[i, j] = best
+            if up == best:
+                code = UP
+            elif left == best:
+                code = LEFT
+            else:
+                code = DIAG
+            trace[i * row_bytes + (j >> 2)] |= code << ((j & 3) << 1)
+
+
+def _traceback_kernel(trace, row_bytes, n_row, n_col):
+    # Returns the moves from the last cell back to the origin, or an empty array if the
+    # trace leaves the matrix.
+    i = n_row - 1
+    j = n_col - 1
+    moves = np.empty(i + j, dtype=np.uint8)
+    count = 0
+    while True:
+        cell = (trace[i * row_bytes + (j >> 2)] >> ((j & 3) << 1)) & 3
+        if cell == DONE:
+            break
+        if cell == DIAG:
+            i -= 1
+            j -= 1
+        elif cell == LEFT:
+            j -= 1
+        elif cell == UP:
+            i -= 1
+        if i < 0 or j < 0 or count == moves.shape[0]:
+            return moves[:0]
+        moves[count] = cell
+        count += 1
+    return moves[:count]
+
+
+if JIT_AVAILABLE:
+    # cache=True keeps the compiled machine code in __pycache__, so new processes load
+    # it instead of compiling again.
+    fill_kernel = numba.njit(cache=True, nogil=True)(_fill_kernel)
+    traceback_kernel = numba.njit(cache=True, nogil=True)(_traceback_kernel)
+else:
+    fill_kernel = _fill_kernel
+    traceback_kernel = _traceback_kernel
+
+
+class NeedlemanWunsch2DJit(NeedlemanWunsch2DVectorized):
+    """
+    Needleman-Wunsch engine whose fill and traceback loops are compiled with Numba.
+
+    The kernels run the same scalar recurrence as NeedlemanWunsch2D, cell by cell, so
+    scores, tie-breaking (UP > LEFT > DIAG) and alignments are identical, without the
+    per-diagonal NumPy overhead that dominates for short sequences. Compiled kernels
+    are cached on disk. Without Numba the kernels still run, uncompiled; prefer
+    cacoepy.aligner's engine="jit", which falls back to NeedlemanWunsch2D instead.
+    The "hirschberg" and "banded" modes use the NeedlemanWunsch2DVectorized code.
+
+    Args:
+        config (NeedlemanWunschConfig): Configuration object containing the scoring function
+        or matrix and gap penalty.
+    """
+    def _fill_score_matrix(self, similarity):
+        gap = self.score_matrix.dtype.type(self.config.gap_penalty)
+        trace = self.trace_matrix
+        fill_kernel(similarity, gap, self.score_matrix, trace.array(), trace.row_bytes)
+
+    def _trace_moves(self):
+        trace = self.trace_matrix
+        moves = traceback_kernel(trace.array(), trace.row_bytes, self.N_row, self.N_col)
+        if len(moves) == 0 and (self.N_row > 1 or self.N_col > 1):
+            raise TracebackIndexError(f"left_idx={self.N_row - 1}, top_idx={self.N_col - 1}")
+        return moves[::-1], self.score_matrix[-1, -1].item()
+
+    def _traceback(self):
+        left_idx = self.N_row - 1
+        top_idx = self.N_col - 1
+        score = self.score_matrix[left_idx, top_idx].item()
+        trace = self.trace_matrix
+        moves = traceback_kernel(trace.array(), trace.row_bytes, self.N_row, self.N_col)
+        if len(moves) == 0 and (left_idx or top_idx):
+            raise TracebackIndexError(f"{left_idx=}, {top_idx=}")
+
+        aligned_top_seq = []
+        aligned_left_seq = []
+        path = self._path_idx = []
+        for move in moves.tolist():
+            path.append((left_idx, top_idx))
+            if move == DIAG:
+                aligned_top_seq.append(self.top_seq[top_idx])
+                aligned_left_seq.append(self.left_seq[left_idx])
+                left_idx -= 1
+                top_idx -= 1
+            elif move == LEFT:
+                aligned_top_seq.append(self.top_seq[top_idx])
+                aligned_left_seq.append(self.GAP)
+                top_idx -= 1
+            else:
+                aligned_top_seq.append(self.GAP)
+                aligned_left_seq.append(self.left_seq[left_idx])
+                left_idx -= 1
+        path.append((0, 0))
+
+        aligned_top_seq.reverse()
+        aligned_left_seq.reverse()
+        return aligned_left_seq, aligned_top_seq, score
@@ -0,0 +1,457 @@
+from typing import List
+import numpy as np
+from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D, NeedlemanWunsch3D
+from cacoepy.core.instrumentation import matrix_bytes
+from cacoepy.core.packed_trace import PackedTrace
+from cacoepy.core.utils import pretty_matrices
+from cacoepy.core.exceptions import TracebackIndexError
+
+# Direction codes, stored in 2 bits per cell of the full trace matrix and as uint8 in 
+# the band.
+DONE = 0
+UP = 1
+LEFT = 2
+DIAG = 3
+
+# PACKED_DIRECTIONS[4 * field + 2 * is_up + is_left] is the direction of a cell shifted
+# into its 2 bit field of a byte, breaking ties UP > LEFT > DIAG.
+PACKED_DIRECTIONS = np.array(
+    [direction << (2 * field) for field in range(4) for direction in (DIAG, LEFT, UP, UP)],
+    dtype=np.uint8,
+)
+
+
+def gap_boundary(length, gap_penalty, dtype):
+    """
+    Cumulative gap scores 0, g, 2g, ... summed sequentially so that float penalties
+    round exactly like the pure Python implementation.
+    """
+    boundary = np.full(length, gap_penalty, dtype=dtype)
+    if length:
+        boundary[0] = 0
+    return np.cumsum(boundary, dtype=dtype)
+
+
+class NeedlemanWunsch2DVectorized(NeedlemanWunsch2D):
+    """
+    NumPy engine for the Needleman-Wunsch algorithm.
+
+    Scores are held in an ndarray and directions as 2 bit codes in a PackedTrace. The
+    matrix is filled one anti-diagonal at a time, since every cell on an anti-diagonal
+    only depends on the two previous ones. Tie-breaking (UP > LEFT > DIAG) and the
+    returned alignments are identical to NeedlemanWunsch2D.
+
+    Args:
+        config (NeedlemanWunschConfig): Configuration object containing the scoring function
+        or matrix and gap penalty.
+    """
+    def _fill_full(self, seq1, seq2):
+        self.left_seq = [""] + list(seq1)
+        self.top_seq = [""] + list(seq2)
+        self.N_col = len(self.top_seq)
+        self.N_row = len(self.left_seq)
+        similarity = self._similarity_matrix(seq1, seq2)
+        self.score_matrix, self.trace_matrix = self._init_score_and_trace_matrix(
+            similarity.dtype if self._integer else np.float64
+        )
+        probe = self._probe
+        if probe is not None:
+            probe.mark("init")
+        self._fill_score_matrix(similarity)
+        if probe is not None:
+            cells = (self.N_row - 1) * (self.N_col - 1)
+            nbytes = matrix_bytes(self.score_matrix, self.trace_matrix, similarity)
+            probe.mark("fill", cells=cells, lookups=cells, nbytes=nbytes)
+
+    def score(self, seq1: List[str], seq2: List[str]) -> float:
+        """
+        Computes the Needleman-Wunsch alignment score without aligning the sequences.
+
+        Keeps a single rolling row and no trace matrix. With integer scores each row is
+        computed in one pass of NumPy operations; float scores use the exact row-by-row
+        recurrence of NeedlemanWunsch2D.score so results are bit-identical.
+
+        Args:
+            seq1 (str): The first sequence.
+            seq2 (str): The second sequence.
+
+        Returns:
+            float: The same score returned by aligning the sequences.
+        """
+        return super().score(seq1, seq2)
+
+    def _row_kernel(self, seq1, seq2):
+        score_table = self._score_table(seq1, seq2)
+        if not self._integer:
+            return super()._row_kernel(seq1, seq2)
+        gap = int(self.config.gap_penalty)
+        left_codes = score_table.encode(seq1)
+        top_codes = score_table.encode(seq2)
+        similarity = score_table.table.T[:, top_codes]
+        offsets = np.arange(len(top_codes) + 1, dtype=np.int64) * gap
+
+        def next_row(prev_row, i, start=0, first=None):
+            length = len(prev_row)
+            return self._next_row_vectorized(
+                prev_row,
+                similarity[left_codes[i - 1], start:start + length - 1],
+                offsets[:length],
+                gap,
+                first,
+            )
+
+        return offsets.copy(), next_row
+
+    def _fill_band(self, lo, hi):
+        """
+        Fills the band one row at a time. Rows are computed like in score(), with cells
+        outside the band held at a large negative sentinel. Float scores fall back to
+        the scalar fill so results stay bit-identical.
+        """
+        score_table = self._score_table(self.left_seq[1:], self.top_seq[1:])
+        if not self._integer:
+            return super()._fill_band(lo, hi)
+        n = self.N_row - 1
+        m = self.N_col - 1
+        width = hi - lo + 1
+        gap = int(self.config.gap_penalty)
+        out_of_band = np.iinfo(np.int64).min // 4
+        table_t = score_table.table.T
+        left_codes = np.asarray(self._left_codes)
+        top_codes = np.asarray(self._top_codes)
+        offsets = np.arange(width, dtype=np.int64) * gap
+        first_col = gap_boundary(n + 1, gap, np.int64)
+
+        trace = np.zeros((n + 1, width), dtype=np.uint8)
+        cols = lo + np.arange(width)
+        valid = (cols >= 0) & (cols <= m)
+        row = np.where(valid, np.clip(cols, 0, m) * gap, out_of_band)
+        trace[0] = np.where(cols == 0, DONE, LEFT)
+        upper_edge = [row[-1].item()]
+        lower_edge = [row[0].item()]
+        for i in range(1, n + 1):
+            cols += 1
+            valid = (cols >= 0) & (cols <= m)
+            similarity = table_t[left_codes[i], top_codes[np.clip(cols, 0, m)]]
+            diag = row + similarity
+            up = np.empty_like(row)
+            up[:-1] = row[1:] + gap
+            up[-1] = out_of_band
+            candidates = np.maximum(diag, up)
+            candidates[~valid | (cols == 0)] = out_of_band
+            if lo + i <= 0:
+                candidates[-lo - i] = first_col[i]
+            new_row = np.maximum.accumulate(candidates - offsets) + offsets
+            new_row[~valid] = out_of_band
+            left = np.empty_like(new_row)
+            left[0] = out_of_band
+            left[1:] = new_row[:-1] + gap
+            trace[i] = np.where(
+                (up == new_row) | (cols == 0), UP, np.where(left == new_row, LEFT, DIAG)
+            )
+            row = new_row
+            upper_edge.append(row[-1].item())
+            lower_edge.append(row[0].item())
+        edges = upper_edge, lower_edge
+        return row[m - n - lo].item(), trace, (UP, LEFT, DIAG), edges
+
+    def _next_crossings(self, prev_row, row, prev_crossing):
+        if not isinstance(row, np.ndarray):
+            return super()._next_crossings(prev_row, row, prev_crossing)
+        gap = int(self.config.gap_penalty)
+        prev_crossing = np.asarray(prev_crossing)
+        up = prev_row + gap == row
+        up[0] = True
+        left = np.zeros(len(row), dtype=bool)
+        left[1:] = (row[:-1] + gap == row[1:]) & ~up[1:]
+        diag = np.empty_like(prev_crossing)
+        diag[0] = prev_crossing[0]
+        diag[1:] = prev_crossing[:-1]
+        crossing = np.where(up, prev_crossing, diag)
+        # A chain of LEFT moves takes the crossing of the cell it starts from.
+        source = np.where(left, 0, np.arange(len(row)))
+        np.maximum.accumulate(source, out=source)
+        return crossing[source]
+
+    @staticmethod
+    def _next_row_vectorized(prev_row, similarity_row, offsets, gap, first=None):
+        # Without the LEFT move a cell is max(DIAG, UP). Chains of LEFT moves are then
+        # a running maximum of (candidate - j * gap), which is exact for integers.
+        candidates = np.empty_like(prev_row)
+        candidates[0] = prev_row[0] + gap if first is None else first
+        np.maximum(prev_row[:-1] + similarity_row, prev_row[1:] + gap, out=candidates[1:])
+        return np.maximum.accumulate(candidates - offsets) + offsets
+
+    def _similarity_matrix(self, seq1, seq2):
+        """
+        Similarity of every (left, top) cell, padded with a zero row and column so it
+        shares the layout of the score matrix. It is gathered from the config's
+        compiled ScoreTable, where a cell scores similarity(top, left).
+        """
+        score_table = self._score_table(seq1, seq2)
+        table = score_table.table
+        left_codes = score_table.encode(seq1)
+        top_codes = score_table.encode(seq2)
+        similarity = np.zeros((self.N_row, self.N_col), dtype=table.dtype)
+        similarity[1:, 1:] = table.T[np.ix_(left_codes, top_codes)]
+        return similarity
+
+    def _init_score_and_trace_matrix(self, dtype=np.int64):
+        score_matrix = np.zeros((self.N_row, self.N_col), dtype=dtype)
+        trace_matrix = PackedTrace((self.N_row, self.N_col), bits=2)
+        score_matrix[:, 0] = gap_boundary(self.N_row, self.config.gap_penalty, dtype)
+        score_matrix[0, :] = gap_boundary(self.N_col, self.config.gap_penalty, dtype)
+        # Column 0 is the lowest field of the first byte of each row.
+        row_bytes = trace_matrix.row_bytes
+        trace_matrix.array()[row_bytes:-1:row_bytes] = UP
+        trace_matrix.set_row((0,), [DONE] + [LEFT] * (self.N_col - 1))
+        return score_matrix, trace_matrix
+
+    def _fill_score_matrix(self, similarity):
+        # Cells on an anti-diagonal are N_col - 1 apart in the flattened matrix, so
+        # each diagonal and its UP, LEFT and DIAG neighbours are strided views.
+        gap = self.config.gap_penalty
+        width = self.N_col
+        step = width - 1
+        scores = self.score_matrix.reshape(-1)
+        similarity = similarity.reshape(-1)
+        # The cells of a diagonal are in different rows of the packed trace, so each
+        # has its own byte. Their byte offsets and shifts are views of these arrays.
+        trace = self.trace_matrix.array()
+        row_bytes = np.arange(self.N_row) * self.trace_matrix.row_bytes
+        cols = np.arange(self.N_col)[::-1]
+        col_bytes = cols >> 2
+        col_fields = ((cols & 3) << 2).astype(np.uint8)
+        for d in range(2, self.N_row + self.N_col - 1):
+            first = max(1, d - step)
+            last = min(self.N_row - 1, d - 1)
+            if first > last:
+                continue
+            start = first * width + d - first
+            stop = start + (last - first) * step + 1
+            cells = slice(start, stop, step)
+            up = scores[start - width: stop - width: step] + gap
+            left = scores[start - 1: stop - 1: step] + gap
+            diag = scores[start - width - 1: stop - width - 1: step] + similarity[cells]
+            best = np.maximum(np.maximum(diag, up), left)
+            scores[cells] = best
+            # Column d - i, reversed so it runs along i.
+            col = slice(step - d + first, step - d + last + 1)
+            byte = row_bytes[first:last + 1] + col_bytes[col]
+            is_up = (up == best).view(np.uint8)
+            field = col_fields[col] + is_up + is_up + (left == best).view(np.uint8)
+            trace[byte] |= PACKED_DIRECTIONS.take(field)
+
+    def _traceback(self):
+        aligned_top_seq = []
+        aligned_left_seq = []
+        left_idx = self.N_row - 1
+        top_idx = self.N_col - 1
+        score = self.score_matrix[left_idx, top_idx].item()
+        trace = self.trace_matrix
+        path = self._path_idx = []
+        cell = None
+        while cell != DONE:
+            path.append((left_idx, top_idx))
+            cell = trace[left_idx, top_idx]
+            if cell == DIAG:
+                aligned_top_seq.append(self.top_seq[top_idx])
+                aligned_left_seq.append(self.left_seq[left_idx])
+                left_idx -= 1
+                top_idx -= 1
+            elif cell == LEFT:
+                aligned_top_seq.append(self.top_seq[top_idx])
+                aligned_left_seq.append(self.GAP)
+                top_idx -= 1
+            elif cell == UP:
+                aligned_top_seq.append(self.GAP)
+                aligned_left_seq.append(self.left_seq[left_idx])
+                left_idx -= 1
+
+            if left_idx < 0 or top_idx < 0:
+                raise TracebackIndexError(f"{left_idx=}, {top_idx=}")
+
+        aligned_top_seq.reverse()
+        aligned_left_seq.reverse()
+
+        return aligned_left_seq, aligned_top_seq, score
+
+    def _trace_moves(self):
+        path = []
+        left_idx = self.N_row - 1
+        top_idx = self.N_col - 1
+        trace = self.trace_matrix
+        while left_idx > 0 or top_idx > 0:
+            move = trace[left_idx, top_idx]
+            if move == DONE:
+                raise TracebackIndexError(f"{left_idx=}, {top_idx=}")
+            path.append(move)
+            if move != LEFT:
+                left_idx -= 1
+            if move != UP:
+                top_idx -= 1
+            if left_idx < 0 or top_idx < 0:
+                raise TracebackIndexError(f"{left_idx=}, {top_idx=}")
+        path.reverse()
+        return path, self.score_matrix[-1, -1].item()
+
+    def __str__(self):
+        if "score_matrix" not in self.__dict__:
+            return super().__str__()
+        arrows = {DONE: self.DONE, UP: self.UP, LEFT: self.LEFT, DIAG: self.DIAG}
+        trace = self.trace_matrix.decode(arrows)
+        m1 = pretty_matrices(self.score_matrix.tolist(), self.top_seq, self.left_seq)
+        m2 = pretty_matrices(trace, self.top_seq, self.left_seq)
+        return m1 + "\n"*3 + m2
+
+
+# Direction codes of the 3D trace matrix, listed in tie-breaking order.
+MOVES_3D = (
+    (1, 0, 0),  # UP
+    (0, 1, 0),  # LEFT
+    (0, 0, 1),  # BACK
+    (1, 1, 0),  # DIAG
+    (1, 0, 1),  # BACK_UP
+    (0, 1, 1),  # BACK_LEFT
+    (1, 1, 1),  # BACK_DIAG
+)
+
+
+def _wavefront(d, shape):
+    """
+    The (i, j, k) indices of the cells with i + j + k = d in a cube of `shape`, in
+    row-major order. Only the wavefront's own cells are generated.
+    """
+    rows, cols, wid = shape
+    i = np.arange(max(0, d - (cols - 1) - (wid - 1)), min(rows - 1, d) + 1)
+    # For each i, j runs from lo to hi, and k = d - i - j stays inside the cube.
+    lo = np.maximum(0, d - i - (wid - 1))
+    hi = np.minimum(cols - 1, d - i)
+    counts = hi - lo + 1
+    starts = np.cumsum(counts) - counts
+    ci = np.repeat(i, counts)
+    cj = np.arange(counts.sum()) - np.repeat(starts - lo, counts)
+    return ci, cj, d - ci - cj
+
+
+class NeedlemanWunsch3DVectorized(NeedlemanWunsch3D):
+    """
+    NumPy engine for the three-way Needleman-Wunsch alignment.
+
+    Scores are held in an ndarray and directions as 3 bit codes (1-7 in the order of
+    MOVES_3D, 0 for the origin). The cube is filled one wavefront i + j + k = d at a
+    time, since each cell only depends on the three previous wavefronts. Alignments
+    and tie-breaking are identical to NeedlemanWunsch3D.
+
+    Args:
+        config (NeedlemanWunschConfig): Configuration object containing the scoring function 
+        or matrix and gap penalty.
+    """
+    def _align(self, seq1, seq2, seq3):
+        self.top_seq = [""] + list(seq1)
+        self.left_seq = [""] + list(seq2)
+        self.back_seq = [""] + list(seq3)
+        self.N_row = len(self.top_seq)
+        self.N_col = len(self.left_seq)
+        self.N_wid = len(self.back_seq)
+        score_table = self._score_table(seq1, seq2, seq3)
+        table = score_table.table
+        codes = [score_table.encode(seq) for seq in (seq1, seq2, seq3)]
+        # Pairwise similarities padded with a zero row and column, indexed like the cube.
+        pairs = {}
+        for a, b in ((0, 1), (0, 2), (1, 2)):
+            padded = np.zeros((len(codes[a]) + 1, len(codes[b]) + 1), dtype=table.dtype)
+            padded[1:, 1:] = table[np.ix_(codes[a], codes[b])]
+            pairs[a, b] = padded
+        probe = self._probe
+        if probe is not None:
+            probe.mark("init")
+        dtype = table.dtype if self._integer else np.float64
+        self.score_matrix, self.trace_matrix = self._fill_score_matrix(pairs, dtype)
+        if probe is not None:
+            lookups = sum(len(codes[a]) * len(codes[b]) for a, b in pairs)
+            nbytes = matrix_bytes(self.score_matrix, self.trace_matrix, *pairs.values())
+            cells = self.N_row * self.N_col * self.N_wid - 1
+            probe.mark("fill", cells=cells, lookups=lookups, nbytes=nbytes)
+        result = self._traceback()
+        if probe is not None:
+            probe.mark("traceback")
+        return result
+
+    def _fill_score_matrix(self, pairs, dtype):
+        shape = (self.N_row, self.N_col, self.N_wid)
+        gap = 2 * self.config.gap_penalty
+        if np.dtype(dtype).kind == "i":
+            gap = int(gap)
+            unreachable = np.iinfo(np.int64).min // 4
+        else:
+            unreachable = -np.inf
+        scores = np.zeros(shape, dtype=dtype)
+        trace = PackedTrace(shape, bits=3)
+        flat_scores = scores.reshape(-1)
+        strides = (self.N_col * self.N_wid, self.N_wid, 1)
+
+        candidates = np.empty((len(MOVES_3D), 0), dtype=dtype)
+        for d in range(1, sum(shape) - 2):
+            ci, cj, ck = _wavefront(d, shape)
+            cells = ci * strides[0] + cj * strides[1] + ck
+            if candidates.shape[1] != len(cells):
+                candidates = np.empty((len(MOVES_3D), len(cells)), dtype=dtype)
+            s_ij = pairs[0, 1][ci, cj]
+            s_ik = pairs[0, 2][ci, ck]
+            s_jk = pairs[1, 2][cj, ck]
+            for move, (di, dj, dk) in enumerate(MOVES_3D):
+                offset = di * strides[0] + dj * strides[1] + dk * strides[2]
+                valid = (ci >= di) & (cj >= dj) & (ck >= dk)
+                prev = flat_scores[np.where(valid, cells - offset, 0)]
+                if (di, dj, dk) == (1, 1, 1):
+                    value = prev + s_ij + s_ik + s_jk
+                elif di + dj + dk == 2:
+                    similarity = s_ij if not dk else (s_ik if di else s_jk)
+                    value = prev + similarity + gap
+                else:
+                    value = prev + gap
+                candidates[move] = np.where(valid, value, unreachable)
+            best = candidates.argmax(axis=0)
+            flat_scores[cells] = candidates[best, np.arange(len(cells))]
+            trace.set_cells((ci, cj, ck), best + 1)
+        return scores, trace
+
+    def _traceback(self):
+        aligned_top_seq = []
+        aligned_left_seq = []
+        aligned_back_seq = []
+        i = self.N_row - 1
+        j = self.N_col - 1
+        k = self.N_wid - 1
+        score = self.score_matrix[i, j, k].item()
+        trace = self.trace_matrix
+        while i > 0 or j > 0 or k > 0:
+            code = trace[i, j, k]
+            if not 1 <= code <= len(MOVES_3D):
+                raise TracebackIndexError(f"{i=}, {j=}, {k=}, {code=}")
+            di, dj, dk = MOVES_3D[code - 1]
+            aligned_top_seq.append(self.top_seq[i] if di else self.GAP)
+            aligned_left_seq.append(self.left_seq[j] if dj else self.GAP)
+            aligned_back_seq.append(self.back_seq[k] if dk else self.GAP)
+            i -= di
+            j -= dj
+            k -= dk
+
+        aligned_top_seq.reverse()
+        aligned_left_seq.reverse()
+        aligned_back_seq.reverse()
+        return aligned_top_seq, aligned_left_seq, aligned_back_seq, score
+
+    def __str__(self):
+        if "trace_matrix" not in self.__dict__:
+            return super().__str__()
+        arrows = [self.DONE, self.UP, self.LEFT, self.BACK, self.DIAG,
+                  self.BACK_UP, self.BACK_LEFT, self.BACK_DIAG]
+        planes = []
+        for i, rows in enumerate(self.trace_matrix.decode(arrows)):
+            planes.append(
+                f"{self.top_seq[i] or '.'}:\n"
+                + pretty_matrices(rows, self.back_seq, self.left_seq)
+            )
+        return "\n\n".join(planes)
@@ -1,5 +1,81 @@
 from cacoepy.core.exceptions import AlignSequencePairError
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
+
+
+def _as_list(seq: Sequence[str]) -> Sequence[str]:
+    return seq if isinstance(seq, (list, tuple)) else list(seq)
+
+
+def merge_alignments(
+        alignments: Sequence[Tuple[Sequence[str], Sequence[str]]],
+        gap_char: str = "-",
+        ) -> List[List[str]]:
+    """
+    Merge K pairwise alignments against the same reference into one alignment.
+
+    Each alignment is a (reference, partner) pair, where every reference is the same
+    sequence with different padding. Columns where some references have a gap are
+    emitted first, with the other alignments padded by gaps, so gap columns at the same
+    reference position are shared. The merge walks every alignment once with index
+    pointers, taking time linear in the merged length times K.
+
+    Parameters:
+        alignments (Sequence[Tuple[Sequence[str], Sequence[str]]]): The (reference,
+            partner) pairs, each aligned with each other.
+        gap_char (str): Character used to represent gaps in the alignments, default is '-'.
+    Returns:
+        List[List[str]]: The merged reference followed by the merged partner of each
+        alignment, all the same length.
+    """
+    refs, partners = [], []
+    for ref, partner in alignments:
+        if len(ref) != len(partner):
+            raise AlignSequencePairError(
+                "The ref_x and partner_x sequences must be the same length."
+            )
+        refs.append(_as_list(ref))
+        partners.append(_as_list(partner))
+
+    indices = range(len(refs))
+    lengths = [len(ref) for ref in refs]
+    positions = [0] * len(refs)
+    merged_ref = []
+    merged_partners = [[] for _ in indices]
+    while True:
+        # Alignments whose reference has a gap here advance alone.
+        advancing = [
+            i for i in indices
+            if positions[i] < lengths[i] and refs[i][positions[i]] == gap_char
+        ]
+        if advancing:
+            symbol = gap_char
+        else:
+            remaining = sum(positions[i] < lengths[i] for i in indices)
+            if remaining == 0:
+                break
+            symbol = refs[0][positions[0]] if positions[0] < lengths[0] else None
+            if remaining != len(refs) or any(
+                refs[i][positions[i]] != symbol for i in indices
+            ):
+                raise AlignSequencePairError(
+                    "The reference sequences must be equal when padding is removed."
+                )
+            advancing = indices
+
+        merged_ref.append(symbol)
+        if len(advancing) == len(refs):
+            for i in indices:
+                merged_partners[i].append(partners[i][positions[i]])
+                positions[i] += 1
+        else:
+            for i in indices:
+                merged_partners[i].append(gap_char)
+            for i in advancing:
+                merged_partners[i][-1] = partners[i][positions[i]]
+                positions[i] += 1
+
+    return [merged_ref] + merged_partners
+
 
 def align_sequence_pairs(
         ref_a: List[str], 
@@ -23,41 +99,7 @@ def align_sequence_pairs(
         aligned_partner_a: The globally aligned parter of a.
         aligned_partner_b:  The globally aligned parter of b.
     """
-    pair_a = list(zip(ref_a, partner_a))
-    pair_b = list(zip(ref_b, partner_b))
-    result_a, result_b = [], []
-    if len(ref_a) != len(partner_a) or len(ref_b) != len(partner_b):
-        raise AlignSequencePairError(
-            "The ref_x and partner_x sequences must be the same length."
-        )
-    elif [x for x in ref_a if x != gap_char] != [x for x in ref_b if x != gap_char]:
-        raise AlignSequencePairError(
-            "The reference sequences ref_a and ref_b must be equal when padding is removed."
-        )
-
-    while pair_a or pair_b:
-        if pair_a and pair_b:
-            if pair_b[0][0] == pair_a[0][0]:
-                result_a.append(pair_a.pop(0))
-                result_b.append(pair_b.pop(0))
-            elif pair_b[0][0] == gap_char:
-                result_a.append((gap_char, gap_char))
-                result_b.append(pair_b.pop(0))
-            else:
-                result_b.append((gap_char, gap_char))
-                result_a.append(pair_a.pop(0))
-        elif pair_a and not pair_b:
-            result_b.append((gap_char, gap_char))
-            result_a.append(pair_a.pop(0))
-        else:
-            result_a.append((gap_char, gap_char))
-            result_b.append(pair_b.pop(0))
-
-    aligned_ref_a, aligned_partner_a = zip(*result_a)
-    aligned_ref_b, aligned_partner_b = zip(*result_b)
-
-    if aligned_ref_a != aligned_ref_b:
-        raise AlignSequencePairError(
-            "Something went wrong. The reference sequences do not match after alignment."
-        )
-    return list(aligned_ref_a), list(aligned_partner_a), list(aligned_partner_b)
+    aligned_ref, aligned_partner_a, aligned_partner_b = merge_alignments(
+        [(ref_a, partner_a), (ref_b, partner_b)], gap_char=gap_char
+    )
+    return aligned_ref, aligned_partner_a, aligned_partner_b
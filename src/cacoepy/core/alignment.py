@@ -0,0 +1,232 @@
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Edit operations turning seq1 into seq2. INSERT columns only hold a symbol of seq2
+# and DELETE columns only hold a symbol of seq1.
+MATCH = 0
+SUBSTITUTE = 1
+INSERT = 2
+DELETE = 3
+OPS = ("match", "substitute", "insert", "delete")
+CIGAR = "=XID"
+
+# Traceback moves, numbered like the direction codes of the ndarray engines.
+MOVE_UP = 1
+MOVE_LEFT = 2
+MOVE_DIAG = 3
+
+
+def _symbols_equal(seq1, seq2, index1, index2) -> "np.ndarray":
+    import numpy as np
+
+    codes1 = getattr(seq1, "codes", None)
+    codes2 = getattr(seq2, "codes", None)
+    if codes1 is not None and getattr(seq1, "alphabet", None) is getattr(seq2, "alphabet", 0):
+        return codes1[index1] == codes2[index2]
+    symbols1 = np.empty(len(seq1), dtype=object)
+    symbols1[:] = list(seq1)
+    symbols2 = np.empty(len(seq2), dtype=object)
+    symbols2[:] = list(seq2)
+    return symbols1[index1] == symbols2[index2]
+
+
+class Alignment:
+    """
+    A pairwise alignment stored as run-length encoded edit operations.
+
+    Each run is an operation (MATCH, SUBSTITUTE, INSERT or DELETE), its length, and the
+    positions in seq1 and seq2 where it starts. The gapped sequences are only built
+    when asked for, so code that only needs the operations, e.g. to count errors,
+    never allocates them. An Alignment unpacks like the (aligned_seq1, aligned_seq2,
+    score) tuple the aligners return.
+
+    Args:
+        ops (np.ndarray): Operation of each run.
+        lengths (np.ndarray): Number of columns in each run.
+        index1 (np.ndarray): Position in seq1 where each run starts.
+        index2 (np.ndarray): Position in seq2 where each run starts.
+        score (float): The alignment score.
+        seq1 (Sequence[str]): The first, unaligned sequence.
+        seq2 (Sequence[str]): The second, unaligned sequence.
+        gap (str): The symbol used for gaps when the gapped sequences are built.
+
+    Attributes:
+        workspace (optional): The aligner workspace of the call, holding its score and 
+            trace matrices, when aligned with keep_matrices=True. Otherwise None.
+    """
+    __slots__ = (
+        "ops", "lengths", "index1", "index2", "score", "seq1", "seq2", "gap", "workspace",
+    )
+
+    def __init__(
+            self,
+            ops: "np.ndarray",
+            lengths: "np.ndarray",
+            index1: "np.ndarray",
+            index2: "np.ndarray",
+            score: float,
+            seq1: Sequence[str],
+            seq2: Sequence[str],
+            gap: str = "-",
+        ):
+        self.ops = ops
+        self.lengths = lengths
+        self.index1 = index1
+        self.index2 = index2
+        self.score = score
+        self.seq1 = seq1
+        self.seq2 = seq2
+        self.gap = gap
+        self.workspace = None
+
+    @classmethod
+    def from_moves(
+            cls,
+            moves: Sequence[int],
+            seq1: Sequence[str],
+            seq2: Sequence[str],
+            score: float,
+            gap: str = "-",
+        ) -> "Alignment":
+        """
+        Builds an alignment from traceback moves in forward order: MOVE_UP consumes a
+        symbol of seq1, MOVE_LEFT one of seq2 and MOVE_DIAG one of each.
+        """
+        import numpy as np
+
+        moves = np.asarray(moves, dtype=np.uint8)
+        if len(moves) == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return cls(empty.astype(np.uint8), empty, empty, empty, score, seq1, seq2, gap)
+        step1 = moves != MOVE_LEFT
+        step2 = moves != MOVE_UP
+        position1 = np.cumsum(step1) - step1
+        position2 = np.cumsum(step2) - step2
+        if position1[-1] + step1[-1] != len(seq1) or position2[-1] + step2[-1] != len(seq2):
+            raise ValueError("The moves do not consume both sequences.")
+
+        column_ops = np.where(step1, DELETE, INSERT).astype(np.uint8)
+        diag = np.flatnonzero(moves == MOVE_DIAG)
+        equal = _symbols_equal(seq1, seq2, position1[diag], position2[diag])
+        column_ops[diag] = np.where(equal, MATCH, SUBSTITUTE)
+
+        starts = np.flatnonzero(np.diff(column_ops.astype(np.int8), prepend=-1))
+        lengths = np.diff(np.append(starts, len(column_ops)))
+        return cls(
+            column_ops[starts], lengths, position1[starts], position2[starts],
+            score, seq1, seq2, gap,
+        )
+
+    @classmethod
+    def from_aligned(
+            cls,
+            aligned_seq1: Sequence[str],
+            aligned_seq2: Sequence[str],
+            score: float,
+            seq1: Sequence[str] = None,
+            seq2: Sequence[str] = None,
+            gap: str = "-",
+        ) -> "Alignment":
+        """
+        Builds an alignment from gapped sequences. seq1 and seq2 default to the gapped
+        sequences without their gaps.
+
+        Raises:
+            ValueError: If a column has a gap in both sequences.
+        """
+        if len(aligned_seq1) != len(aligned_seq2):
+            raise ValueError("The aligned sequences must be the same length.")
+        moves = []
+        for symbol1, symbol2 in zip(aligned_seq1, aligned_seq2):
+            if symbol1 == gap:
+                if symbol2 == gap:
+                    raise ValueError("A column has a gap in both sequences.")
+                moves.append(MOVE_LEFT)
+            elif symbol2 == gap:
+                moves.append(MOVE_UP)
+            else:
+                moves.append(MOVE_DIAG)
+        if seq1 is None:
+            seq1 = [symbol for symbol in aligned_seq1 if symbol != gap]
+        if seq2 is None:
+            seq2 = [symbol for symbol in aligned_seq2 if symbol != gap]
+        return cls.from_moves(moves, seq1, seq2, score, gap=gap)
+
+    def column_ops(self) -> "np.ndarray":
+        """The operation of every column."""
+        import numpy as np
+
+        return np.repeat(self.ops, self.lengths)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of columns of each operation, keyed by the names in OPS."""
+        import numpy as np
+
+        totals = np.bincount(self.ops, weights=self.lengths, minlength=len(OPS))
+        return dict(zip(OPS, totals.astype(np.int64).tolist()))
+
+    def cigar(self) -> str:
+        """The runs as a CIGAR string, e.g. "3=1X2I" (= match, X substitute, I, D)."""
+        return "".join(
+            f"{length}{CIGAR[op]}"
+            for op, length in zip(self.ops.tolist(), self.lengths.tolist())
+        )
+
+    def aligned(self) -> Tuple[List[str], List[str]]:
+        """Builds the gapped sequences."""
+        import numpy as np
+
+        column_ops = self.column_ops()
+        aligned = []
+        for seq, skipped in ((self.seq1, INSERT), (self.seq2, DELETE)):
+            column = np.full(len(column_ops), self.gap, dtype=object)
+            symbols = np.empty(len(seq), dtype=object)
+            symbols[:] = list(seq)
+            column[column_ops != skipped] = symbols
+            aligned.append(column.tolist())
+        return aligned[0], aligned[1]
+
+    @property
+    def aligned_seq1(self) -> List[str]:
+        return self.aligned()[0]
+
+    @property
+    def aligned_seq2(self) -> List[str]:
+        return self.aligned()[1]
+
+    def as_tuple(self) -> Tuple[List[str], List[str], float]:
+        aligned_seq1, aligned_seq2 = self.aligned()
+        return aligned_seq1, aligned_seq2, self.score
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __len__(self):
+        return int(self.lengths.sum())
+
+    def __eq__(self, other):
+        if isinstance(other, Alignment):
+            return (
+                self.score == other.score
+                and self.cigar() == other.cigar()
+                and list(self.seq1) == list(other.seq1)
+                and list(self.seq2) == list(other.seq2)
+            )
+        if isinstance(other, tuple):
+            return self.as_tuple() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Alignment({self.cigar()!r}, score={self.score!r})"
+
+    def __str__(self):
+        if self.workspace is not None:
+            return str(self.workspace)
+        columns = list(zip(*self.aligned()))
+        widths = [max(len(str(symbol)) for symbol in column) for column in columns]
+        return "\n".join(
+            "  ".join(str(column[row]).ljust(width) for column, width in zip(columns, widths))
+            for row in range(2)
+        )
@@ -0,0 +1,138 @@
+from collections import deque
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple
+
+_worker_aligner = None
+
+
+class BatchResult:
+    """
+    The outcome of one item in a batch alignment.
+
+    Args:
+        index (int): Position of the item in the input.
+        result (tuple, optional): What the aligner returned for the item.
+        error (Exception, optional): The exception raised while aligning the item.
+    """
+    __slots__ = ("index", "result", "error")
+
+    def __init__(self, index: int, result: Tuple = None, error: Exception = None):
+        self.index = index
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return f"BatchResult(index={self.index}, result={self.result!r})"
+        return f"BatchResult(index={self.index}, error={self.error!r})"
+
+    def __eq__(self, other):
+        if isinstance(other, BatchResult):
+            return (
+                self.index == other.index
+                and self.result == other.result
+                and repr(self.error) == repr(other.error)
+            )
+        return False
+
+
+def _align_one(aligner, index, pair):
+    try:
+        return BatchResult(index, result=aligner(*pair))
+    except Exception as error:
+        return BatchResult(index, error=error)
+
+
+def _init_worker(aligner):
+    global _worker_aligner
+    _worker_aligner = aligner
+
+
+def _align_in_worker(item):
+    index, pair = item
+    return _align_one(_worker_aligner, index, pair)
+
+
+def align_many(
+        aligner: Callable,
+        pairs: Iterable[Sequence[List[str]]],
+        workers: int = 1,
+        chunksize: int = None,
+    ) -> List[BatchResult]:
+    """
+    Aligns many sequence pairs, optionally across a pool of worker processes.
+
+    The aligner is sent to each worker once, so every process owns a private copy
+    and no alignment state is shared between items.
+
+    Args:
+        aligner (Callable): A picklable aligner such as AlignARPAbet2.
+        pairs (Iterable[Sequence[List[str]]]): The sequences to align, one tuple per item.
+        workers (int): Number of worker processes. 1 or fewer aligns in this process.
+        chunksize (int, optional): Items sent to a worker at a time. Defaults to an even
+            split of about four chunks per worker.
+
+    Returns:
+        List[BatchResult]: One result per pair in input order. Items that raised carry
+        the exception in BatchResult.error instead of aborting the batch.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    items = list(enumerate(pairs))
+    if workers is None or workers <= 1 or len(items) <= 1:
+        return [_align_one(aligner, index, pair) for index, pair in items]
+
+    if chunksize is None:
+        chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(aligner,)
+    ) as executor:
+        return list(executor.map(_align_in_worker, items, chunksize=chunksize))
+
+
+def imap_chunks(
+        func: Callable[[List], List],
+        items: Iterable,
+        workers: int = 1,
+        chunksize: int = 256,
+        prefetch: int = 2,
+    ) -> Iterator:
+    """
+    Streams func over chunks of items across a pool of worker processes, yielding the
+    results of each chunk in input order.
+
+    Unlike Executor.map, items are read lazily: at most `prefetch` chunks per worker are
+    in flight, so memory stays bounded for inputs of any length.
+
+    Args:
+        func (Callable[[List], List]): A picklable function from a list of items to a
+            list of results, such as a functools.partial of a module level function.
+        items (Iterable): The items, read as they are needed.
+        workers (int): Number of worker processes. 1 or fewer runs in this process.
+        chunksize (int): Items sent to a worker at a time.
+        prefetch (int): Chunks queued per worker ahead of the one being yielded.
+
+    Returns:
+        Iterator: The results of every chunk, in input order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    items = iter(items)
+    chunks = iter(lambda: list(islice(items, chunksize)), [])
+    if workers is None or workers <= 1:
+        for chunk in chunks:
+            yield from func(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= workers * prefetch:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
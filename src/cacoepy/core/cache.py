@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Hashable
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "evictions", "size", "maxsize"])
+
+_MISSING = object()
+
+
+class AlignmentCache:
+    """
+    A bounded least-recently-used cache of alignment results.
+
+    One cache may be shared by several aligners, and across threads, since keys
+    include a fingerprint of the aligner configuration. Copies sent to other processes
+    start empty.
+
+    Args:
+        maxsize (int): Maximum number of alignments kept before evicting the least
+            recently used one.
+    """
+    def __init__(self, maxsize: int = 100_000):
+        if maxsize < 1:
+            raise ValueError("The cache maxsize must be at least 1.")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                self._hits, self._misses, self._evictions, len(self._entries), self.maxsize
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        return {"maxsize": self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state["maxsize"])
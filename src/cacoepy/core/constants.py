@@ -0,0 +1,3 @@
+# Where the alignment server listens unless told otherwise.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
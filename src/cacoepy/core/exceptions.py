@@ -28,4 +28,23 @@ class AlignSequencePairError(Exception):
 class PhonemeSequenceError(Exception):
     """Base exception for errors related to phoneme sequences."""
     def __init__(self, message):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+
+class InvalidItemError(Exception):
+    """Exception raised for a malformed item of a batch input, such as a record missing a field."""
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class ServerBusyError(Exception):
+    """Exception raised when the alignment server's request queue is full."""
+    def __init__(self, message):
+        super().__init__(message)
+
+
+# Errors caused by a bad input item rather than by the code processing it. Batch
+# interfaces such as the server and the command line report them per item.
+ITEM_ERRORS = (
+    ElementNotInVocabError, PhonemeSequenceError, AlignSequencePairError, InvalidItemError,
+)
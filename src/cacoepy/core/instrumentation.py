@@ -0,0 +1,228 @@
+import sys
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+PHASES = ("init", "fill", "traceback")
+
+
+class AlignmentEvent(NamedTuple):
+    """
+    What one alignment call did, passed to every listener of the aligner.
+
+    Attributes:
+        engine (str): Class name of the aligner.
+        mode (str): The alignment mode, or "score" for score-only calls.
+        lengths (Tuple[int, ...]): Lengths of the input sequences.
+        seconds (float): Wall time of the whole call.
+        timings (Dict[str, float]): Seconds spent in each phase: "init" (encoding and
+            matrix set up), "fill" and "traceback". Empty on a cache hit.
+        cells (int): Dynamic programming cells computed, including any band retries.
+        matrix_bytes (int): Peak bytes of the score, trace and similarity matrices held
+            at once. For list based engines only the list containers are counted.
+        similarity_calls (int): Calls to a callable similarity while tabulating it. Pure
+            callables are only called for symbols the config has not seen before.
+        similarity_lookups (int): Values read from the similarity table during the fill.
+        cache_hit (bool, optional): Whether the alignment came from the cache, or None
+            without a cache.
+    """
+    engine: str
+    mode: str
+    lengths: Tuple[int, ...]
+    seconds: float
+    timings: Dict[str, float]
+    cells: int
+    matrix_bytes: int
+    similarity_calls: int
+    similarity_lookups: int
+    cache_hit: Optional[bool]
+
+    @property
+    def cells_per_second(self) -> float:
+        fill = self.timings.get("fill", 0.0)
+        return self.cells / fill if fill > 0 else 0.0
+
+
+AlignmentListener = Callable[[AlignmentEvent], None]
+
+_similarity_calls = threading.local()
+
+
+def count_similarity_calls(calls: int) -> None:
+    """
+    Records calls made to a callable similarity by this thread, so a Probe can report
+    the calls made during its alignment.
+    """
+    _similarity_calls.total = getattr(_similarity_calls, "total", 0) + calls
+
+
+def matrix_bytes(*matrices) -> int:
+    """
+    Bytes held by ndarrays, or by the containers of nested lists. Boxed numbers inside
+    lists are not counted.
+    """
+    total = 0
+    for matrix in matrices:
+        if hasattr(matrix, "nbytes"):
+            total += matrix.nbytes
+        elif isinstance(matrix, list):
+            total += sys.getsizeof(matrix)
+            if matrix and isinstance(matrix[0], list):
+                total += matrix_bytes(*matrix)
+    return total
+
+
+class Probe:
+    """
+    Records the phases of a single alignment call. Aligners only create one when they
+    have listeners, and check for None before recording.
+    """
+    __slots__ = (
+        "start", "last", "timings", "cells", "matrix_bytes",
+        "similarity_lookups", "cache_hit", "similarity_calls",
+    )
+
+    def __init__(self):
+        self.similarity_calls = getattr(_similarity_calls, "total", 0)
+        self.start = self.last = time.perf_counter()
+        self.timings = {}
+        self.cells = 0
+        self.matrix_bytes = 0
+        self.similarity_lookups = 0
+        self.cache_hit = None
+
+    def mark(self, phase: str, cells: int = 0, lookups: int = 0, nbytes: int = 0) -> None:
+        """Ends `phase` now, adding to its time if it ran before."""
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self.last
+        self.last = now
+        self.cells += cells
+        self.similarity_lookups += lookups
+        self.matrix_bytes = max(self.matrix_bytes, nbytes)
+
+    def count_rows(self, next_row: Callable) -> Callable:
+        """Wraps a row kernel so every row it computes is counted."""
+        def counted(prev_row, i, *args):
+            self.cells += len(prev_row) - 1
+            self.similarity_lookups += len(prev_row) - 1
+            return next_row(prev_row, i, *args)
+
+        return counted
+
+    def event(self, engine, mode, sequences) -> AlignmentEvent:
+        similarity_calls = getattr(_similarity_calls, "total", 0) - self.similarity_calls
+        return AlignmentEvent(
+            engine=engine,
+            mode=mode,
+            lengths=tuple(len(seq) for seq in sequences),
+            seconds=time.perf_counter() - self.start,
+            timings=self.timings,
+            cells=self.cells,
+            matrix_bytes=self.matrix_bytes,
+            similarity_calls=similarity_calls,
+            similarity_lookups=self.similarity_lookups,
+            cache_hit=self.cache_hit,
+        )
+
+
+class Instrumented:
+    """
+    Listener support shared by the Needleman-Wunsch engines. With no listeners an
+    alignment only pays for a few `is not None` checks outside the fill loops.
+    """
+    _probe = None
+
+    def add_listener(self, listener: AlignmentListener) -> AlignmentListener:
+        """Calls `listener` with an AlignmentEvent after every alignment. Returns it."""
+        self.listeners = self.listeners + [listener]
+        return listener
+
+    def remove_listener(self, listener: AlignmentListener) -> None:
+        self.listeners = [item for item in self.listeners if item != listener]
+
+    def _observe(self, mode, func, *sequences):
+        self._probe = Probe()
+        try:
+            result = func(*sequences)
+            event = self._probe.event(type(self).__name__, mode, sequences)
+        finally:
+            self._probe = None
+        for listener in self.listeners:
+            listener(event)
+        return result
+
+
+class AlignmentStats:
+    """
+    A listener aggregating AlignmentEvents, cheap enough to leave attached in batch jobs.
+    Safe to share between aligners and threads.
+
+    Example:
+        stats = aligner.add_listener(AlignmentStats())
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.cells = 0
+            self.seconds = 0.0
+            self.timings = dict.fromkeys(PHASES, 0.0)
+            self.peak_matrix_bytes = 0
+            self.similarity_calls = 0
+            self.similarity_lookups = 0
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.slowest = None
+
+    def __call__(self, event: AlignmentEvent) -> None:
+        with self._lock:
+            self.calls += 1
+            self.cells += event.cells
+            self.seconds += event.seconds
+            for phase, seconds in event.timings.items():
+                self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+            self.peak_matrix_bytes = max(self.peak_matrix_bytes, event.matrix_bytes)
+            self.similarity_calls += event.similarity_calls
+            self.similarity_lookups += event.similarity_lookups
+            if event.cache_hit is True:
+                self.cache_hits += 1
+            elif event.cache_hit is False:
+                self.cache_misses += 1
+            if self.slowest is None or event.seconds > self.slowest.seconds:
+                self.slowest = event
+
+    @property
+    def cells_per_second(self) -> float:
+        fill = self.timings.get("fill", 0.0)
+        return self.cells / fill if fill > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "cells": self.cells,
+                "seconds": self.seconds,
+                "timings": dict(self.timings),
+                "cells_per_second": self.cells_per_second,
+                "peak_matrix_bytes": self.peak_matrix_bytes,
+                "similarity_calls": self.similarity_calls,
+                "similarity_lookups": self.similarity_lookups,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+            }
+
+    def __getstate__(self):
+        # Copies sent to worker processes start empty.
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def __repr__(self):
+        return (
+            f"AlignmentStats(calls={self.calls}, cells={self.cells}, "
+            f"seconds={self.seconds:.6f}, cells_per_second={self.cells_per_second:.0f})"
+        )
@@ -0,0 +1,124 @@
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class PackedTrace:
+    """
+    A trace matrix of small direction codes packed into fixed width bit fields: 2 bits
+    per cell are enough for a pairwise alignment and 3 for a three-way one, instead of
+    a pointer to a Python string per cell.
+
+    Cells are stored in row-major order in a bytearray, all 0 to begin with. Rows along
+    the last axis start on a byte boundary, so a whole row can be packed at once and
+    cells in different rows never share a byte. A field may straddle two bytes of its
+    row. The NumPy engines write and read the same bytes through array().
+
+    Args:
+        shape (Tuple[int, ...]): The shape of the matrix.
+        bits (int): Bits per cell, from 1 to 8.
+    """
+    __slots__ = ("shape", "bits", "mask", "row_bytes", "row_strides", "data", "_array")
+
+    def __init__(self, shape: Tuple[int, ...], bits: int):
+        if not 1 <= bits <= 8:
+            raise ValueError("A packed trace holds 1 to 8 bits per cell.")
+        self.shape = tuple(shape)
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        # Padding rows to a multiple of 8 cells makes them a whole number of bytes.
+        self.row_bytes = (self.shape[-1] + 7) // 8 * bits
+        strides = []
+        rows = 1
+        for length in reversed(self.shape[:-1]):
+            strides.append(rows)
+            rows *= length
+        self.row_strides = tuple(reversed(strides))
+        self.data = bytearray(rows * self.row_bytes + 1)
+        self._array = None
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data)
+
+    def _locate(self, index):
+        row = 0
+        for i, stride in zip(index, self.row_strides):
+            row += i * stride
+        bit = index[-1] * self.bits
+        return row * self.row_bytes + (bit >> 3), bit & 7
+
+    def __getitem__(self, index: Tuple[int, ...]) -> int:
+        byte, shift = self._locate(index)
+        data = self.data
+        return ((data[byte] | data[byte + 1] << 8) >> shift) & self.mask
+
+    def __setitem__(self, index: Tuple[int, ...], code: int):
+        byte, shift = self._locate(index)
+        data = self.data
+        value = data[byte] | data[byte + 1] << 8
+        value = value & ~(self.mask << shift) | code << shift
+        data[byte] = value & 0xFF
+        data[byte + 1] = value >> 8
+
+    def set_row(self, index: Tuple[int, ...], codes: Sequence[int]) -> None:
+        """Writes a whole row along the last axis, e.g. set_row((i,), codes) in 2D."""
+        value = 0
+        bits = self.bits
+        for code in reversed(codes):
+            value = value << bits | code
+        byte, _ = self._locate(tuple(index) + (0,))
+        self.data[byte:byte + self.row_bytes] = value.to_bytes(self.row_bytes, "little")
+
+    def array(self) -> "np.ndarray":
+        """The packed bytes as a writable uint8 ndarray, sharing memory with `data`."""
+        if self._array is None:
+            import numpy as np
+
+            self._array = np.frombuffer(self.data, dtype=np.uint8)
+        return self._array
+
+    def set_cells(self, index: Tuple["np.ndarray", ...], codes: "np.ndarray") -> None:
+        """
+        Writes codes to the cells at index, a tuple of index arrays. The cells must still
+        hold 0 and lie in different rows, as on a Needleman-Wunsch anti-diagonal.
+        """
+        import numpy as np
+
+        row = 0
+        for i, stride in zip(index, self.row_strides):
+            row = row + np.asarray(i, dtype=np.int64) * stride
+        bit = np.asarray(index[-1], dtype=np.int64) * self.bits
+        byte = row * self.row_bytes + (bit >> 3)
+        values = np.asarray(codes, dtype=np.uint16) << (bit & 7).astype(np.uint16)
+        data = self.array()
+        data[byte] |= (values & 0xFF).astype(np.uint8)
+        if 8 % self.bits:
+            data[byte + 1] |= (values >> 8).astype(np.uint8)
+
+    def unpack(self) -> "np.ndarray":
+        """The codes as a uint8 ndarray of `shape`."""
+        import numpy as np
+
+        data = self.array()[:-1].astype(np.uint16).reshape(-1, self.row_bytes)
+        data = np.concatenate([data, np.zeros((len(data), 1), dtype=np.uint16)], axis=1)
+        bit = np.arange(self.shape[-1], dtype=np.int64) * self.bits
+        byte = bit >> 3
+        values = (data[:, byte] | data[:, byte + 1] << 8) >> (bit & 7).astype(np.uint16)
+        return (values & self.mask).astype(np.uint8).reshape(self.shape)
+
+    def tolist(self) -> List:
+        return self.unpack().tolist()
+
+    def decode(self, symbols: Sequence[str]) -> List:
+        """The matrix as nested lists with each code replaced by symbols[code]."""
+        def convert(item):
+            if isinstance(item, list):
+                return [convert(value) for value in item]
+            return symbols[item]
+
+        return convert(self.tolist())
+
+    def __repr__(self):
+        return f"PackedTrace(shape={self.shape}, bits={self.bits}, nbytes={self.nbytes})"
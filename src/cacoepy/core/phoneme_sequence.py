@@ -0,0 +1,195 @@
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, List, Sequence
+from cacoepy.core.exceptions import ElementNotInVocabError
+
+if TYPE_CHECKING:
+    import numpy as np
+
+GAP = "-"
+
+# Spellings found in annotations that map onto a phoneme of the vocabulary.
+PHONEME_ALIASES = {"ax": "ah"}
+
+_stress_digits = re.compile(r"\d+")
+
+
+def normalise_phoneme(phoneme: str) -> str:
+    """
+    Lowercases a phoneme, strips stress digits (e.g. "AH0" -> "ah") and maps known
+    aliases such as "ax" -> "ah".
+    """
+    phoneme = _stress_digits.sub("", phoneme.strip().lower())
+    return PHONEME_ALIASES.get(phoneme, phoneme)
+
+
+class PhonemeAlphabet:
+    """
+    Maps phonemes to small integer codes. A phoneme's code is its index in `symbols`,
+    and the gap symbol takes the code after the last phoneme.
+
+    Args:
+        symbols (Sequence[str]): The phonemes of the alphabet.
+        gap (str): The symbol used for gaps in aligned sequences.
+    """
+    __slots__ = ("symbols", "gap", "gap_code", "codes", "dtype")
+
+    def __init__(self, symbols: Sequence[str], gap: str = GAP):
+        import numpy as np
+
+        self.symbols = tuple(symbols) + (gap,)
+        self.gap = gap
+        self.gap_code = len(self.symbols) - 1
+        self.codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+        self.dtype = np.uint8 if len(self.symbols) <= 256 else np.uint16
+
+    def encode(self, phonemes: Iterable[str], normalise: bool = True) -> "np.ndarray":
+        """
+        Encodes phonemes as an array of codes. Normalisation and vocabulary checks run
+        once per distinct phoneme rather than once per position.
+
+        Raises:
+            ElementNotInVocabError: If a phoneme is not in the alphabet.
+        """
+        import numpy as np
+
+        phonemes = phonemes if isinstance(phonemes, list) else list(phonemes)
+        if not phonemes:
+            return np.zeros(0, dtype=self.dtype)
+        distinct, inverse = np.unique(np.asarray(phonemes, dtype=str), return_inverse=True)
+        lookup = np.empty(len(distinct), dtype=self.dtype)
+        for i, phoneme in enumerate(distinct.tolist()):
+            symbol = phoneme
+            if normalise and phoneme != self.gap:
+                symbol = normalise_phoneme(phoneme)
+            if symbol not in self.codes:
+                msg = f'A sequence contains "{phoneme}" which is not in the phoneme alphabet.'
+                raise ElementNotInVocabError(message=msg)
+            lookup[i] = self.codes[symbol]
+        return lookup[inverse.reshape(-1)]
+
+    def decode(self, codes: "np.ndarray") -> List[str]:
+        symbols = self.symbols
+        return [symbols[code] for code in codes.tolist()]
+
+    def __repr__(self):
+        return f"PhonemeAlphabet({len(self.symbols) - 1} phonemes, gap={self.gap!r})"
+
+
+@lru_cache(maxsize=None)
+def arpabet_alphabet() -> PhonemeAlphabet:
+    """
+    The ARPAbet alphabet. Its codes match the ARPAbet similarity table, so sequences
+    encoded with it are used by the aligners without re-encoding.
+    """
+    from cacoepy.core.ARPAbet_similarity_matrix import arpabet_vocab
+
+    return PhonemeAlphabet(arpabet_vocab())
+
+
+class PhonemeSequence:
+    """
+    A compact, immutable sequence of phonemes stored as an array of small integer codes.
+
+    Encoding, normalisation and vocabulary validation happen once, when the sequence is
+    created. The sequence still behaves like a list of phoneme strings (len, iteration,
+    indexing, comparison with lists), and the aligners and metrics read its codes
+    directly.
+
+    Args:
+        codes (np.ndarray): The phoneme codes. The array is used as is, without copying.
+        alphabet (PhonemeAlphabet, optional): The alphabet of the codes. Defaults to ARPAbet.
+    """
+    __slots__ = ("codes", "alphabet")
+
+    def __init__(self, codes: "np.ndarray", alphabet: PhonemeAlphabet = None):
+        self.alphabet = alphabet if alphabet is not None else arpabet_alphabet()
+        self.codes = codes
+
+    @classmethod
+    def from_phonemes(
+            cls,
+            phonemes: Iterable[str],
+            alphabet: PhonemeAlphabet = None,
+            normalise: bool = True
+        ) -> "PhonemeSequence":
+        """
+        Encodes a list of phonemes.
+
+        Args:
+            phonemes (Iterable[str]): The phonemes, which may include gaps.
+            alphabet (PhonemeAlphabet, optional): Defaults to ARPAbet.
+            normalise (bool): Lowercase, strip stress digits and map aliases first.
+
+        Raises:
+            ElementNotInVocabError: If a phoneme is not in the alphabet.
+        """
+        alphabet = alphabet if alphabet is not None else arpabet_alphabet()
+        codes = alphabet.encode(phonemes, normalise=normalise)
+        codes.setflags(write=False)
+        return cls(codes, alphabet)
+
+    @classmethod
+    def from_string(
+            cls,
+            text: str,
+            alphabet: PhonemeAlphabet = None,
+            normalise: bool = True
+        ) -> "PhonemeSequence":
+        """Encodes whitespace separated phonemes, e.g. "th er m aa m ah t er"."""
+        return cls.from_phonemes(text.split(), alphabet=alphabet, normalise=normalise)
+
+    @property
+    def gap_mask(self) -> "np.ndarray":
+        return self.codes == self.alphabet.gap_code
+
+    def has_gaps(self) -> bool:
+        return bool(self.gap_mask.any())
+
+    def without_gaps(self) -> "PhonemeSequence":
+        if not self.has_gaps():
+            return self
+        return PhonemeSequence(self.codes[~self.gap_mask], self.alphabet)
+
+    def codes_for(self, score_table) -> "np.ndarray":
+        """
+        Returns the codes if they index `score_table` the same way as this alphabet, or 
+        None. Lets ScoreTable.encode skip re-encoding the sequence.
+        """
+        if tuple(score_table.symbols) != self.alphabet.symbols[:-1]:
+            return None
+        if score_table.unknown != self.alphabet.gap_code and self.has_gaps():
+            return None
+        return self.codes
+
+    def tolist(self) -> List[str]:
+        return self.alphabet.decode(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PhonemeSequence(self.codes[index], self.alphabet)
+        return self.alphabet.symbols[self.codes[index]]
+
+    def __eq__(self, other):
+        if isinstance(other, PhonemeSequence):
+            if other.alphabet is self.alphabet:
+                return bool((self.codes.shape == other.codes.shape) and (self.codes == other.codes).all())
+            return self.tolist() == other.tolist()
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.alphabet.symbols, self.codes.tobytes()))
+
+    def __repr__(self):
+        return f"PhonemeSequence({' '.join(self.tolist())!r})"
+
+    def __str__(self):
+        return " ".join(self.tolist())
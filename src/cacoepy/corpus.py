@@ -0,0 +1,390 @@
+import json
+import os
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Sequence, Tuple, Union
+from cacoepy.core.phoneme_sequence import PhonemeAlphabet, PhonemeSequence, arpabet_alphabet
+
+if TYPE_CHECKING:
+    import numpy as np
+
+FORMAT_VERSION = 2
+META_FILE = "meta.json"
+INDEX_FILE = "index.jsonl"
+INDEX_OFFSETS_FILE = "index.offsets"
+DEFAULT_STREAMS = ("target", "annotation")
+# Offsets are little endian int64 on every platform.
+OFFSET_DTYPE = "<i8"
+_OFFSET_BYTES = 8
+# The record fields of each stream, as used by pipeline.encode_utterances.
+_RECORD_KEYS = {
+    "target": "target_phonemes",
+    "annotation": "perceived_phonemes",
+    "prediction": "predicted_phonemes",
+}
+
+
+def _codes_path(path: str, stream: str) -> str:
+    return os.path.join(path, f"{stream}.codes")
+
+
+def _offsets_path(path: str, stream: str) -> str:
+    return os.path.join(path, f"{stream}.offsets")
+
+
+def iter_index(path: str) -> Iterator[dict]:
+    """The index lines of a corpus: each utterance's id and metadata, in corpus order."""
+    with open(os.path.join(path, INDEX_FILE), "r") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+class CorpusWriter:
+    """
+    Appends encoded utterances to a corpus directory.
+
+    A corpus holds one or more streams of phoneme sequences, e.g. the target and the
+    annotation of every utterance. Each stream is two flat binary files: `<stream>.codes`,
+    the phoneme codes of all utterances concatenated, and `<stream>.offsets`, int64 offsets
+    into it, starting at 0 and followed by the end of each utterance. `index.jsonl` holds
+    one line per utterance with its id and any metadata, `index.offsets` the byte offsets
+    of its lines in the same layout, and `meta.json` the alphabet. Nothing is held in
+    memory between utterances, and no file is ever rewritten.
+
+    Reopening a corpus truncates its files to the utterances that were completely written,
+    so ingestion that was interrupted can continue where it stopped.
+
+    Args:
+        path (str): The corpus directory. Created if needed, appended to if it exists.
+        streams (Sequence[str]): The streams of a new corpus.
+        alphabet (PhonemeAlphabet, optional): The alphabet of a new corpus. Defaults to
+            ARPAbet.
+
+    Raises:
+        ValueError: If an existing corpus has other streams or another alphabet.
+    """
+    def __init__(
+            self,
+            path: str,
+            streams: Sequence[str] = DEFAULT_STREAMS,
+            alphabet: PhonemeAlphabet = None,
+        ):
+        import numpy as np
+
+        self.path = path
+        self.alphabet = alphabet if alphabet is not None else arpabet_alphabet()
+        self.streams = tuple(streams)
+        meta = {
+            "format": FORMAT_VERSION,
+            "symbols": list(self.alphabet.symbols[:-1]),
+            "gap": self.alphabet.gap,
+            "dtype": np.dtype(self.alphabet.dtype).str,
+            "streams": list(self.streams),
+        }
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as file:
+                existing = json.load(file)
+            if existing != meta:
+                raise ValueError(
+                    f"{path} holds a corpus with another format, streams or alphabet."
+                )
+            self.length = self._recover()
+        else:
+            with open(meta_path, "w") as file:
+                json.dump(meta, file)
+            for stream in self.streams:
+                with open(_offsets_path(path, stream), "wb") as file:
+                    file.write(bytes(_OFFSET_BYTES))
+                open(_codes_path(path, stream), "wb").close()
+            open(os.path.join(path, INDEX_FILE), "wb").close()
+            with open(os.path.join(path, INDEX_OFFSETS_FILE), "wb") as file:
+                file.write(bytes(_OFFSET_BYTES))
+            self.length = 0
+
+        self._dtype = self.alphabet.dtype
+        self._ends = {}
+        self._codes = {}
+        self._offsets = {}
+        for stream in self.streams:
+            size = os.path.getsize(_codes_path(path, stream))
+            self._ends[stream] = size // np.dtype(self._dtype).itemsize
+            self._codes[stream] = open(_codes_path(path, stream), "ab")
+            self._offsets[stream] = open(_offsets_path(path, stream), "ab")
+        self._index_end = os.path.getsize(os.path.join(path, INDEX_FILE))
+        self._index = open(os.path.join(path, INDEX_FILE), "ab")
+        self._index_offsets = open(os.path.join(path, INDEX_OFFSETS_FILE), "ab")
+
+    def _recover(self) -> int:
+        # Files are buffered separately, so after a crash any of them may be ahead of the
+        # others. Keeps the utterances that are complete in every file.
+        import numpy as np
+
+        index_path = os.path.join(self.path, INDEX_FILE)
+        index_offsets_path = os.path.join(self.path, INDEX_OFFSETS_FILE)
+        with open(index_path, "rb") as file:
+            lines = file.read().split(b"\n")[:-1]
+        index_offsets = np.fromfile(index_offsets_path, dtype=OFFSET_DTYPE)
+        itemsize = np.dtype(self.alphabet.dtype).itemsize
+        offsets = {
+            stream: np.fromfile(_offsets_path(self.path, stream), dtype=OFFSET_DTYPE)
+            for stream in self.streams
+        }
+        sizes = {
+            stream: os.path.getsize(_codes_path(self.path, stream)) // itemsize
+            for stream in self.streams
+        }
+        length = min(
+            [len(lines), len(index_offsets) - 1]
+            + [len(offsets[stream]) - 1 for stream in self.streams]
+        )
+        while length > 0 and any(offsets[s][length] > sizes[s] for s in self.streams):
+            length -= 1
+
+        with open(index_path, "r+b") as file:
+            file.truncate(sum(len(line) + 1 for line in lines[:length]))
+        with open(index_offsets_path, "r+b") as file:
+            file.truncate((length + 1) * _OFFSET_BYTES)
+        for stream in self.streams:
+            with open(_offsets_path(self.path, stream), "r+b") as file:
+                file.truncate((length + 1) * _OFFSET_BYTES)
+            with open(_codes_path(self.path, stream), "r+b") as file:
+                file.truncate(int(offsets[stream][length]) * itemsize)
+        return length
+
+    def append(
+            self,
+            utterance_id: str,
+            metadata: dict = None,
+            **sequences: Union[PhonemeSequence, "np.ndarray", Sequence[str]],
+        ) -> int:
+        """
+        Appends one utterance and returns its position in the corpus.
+
+        Args:
+            utterance_id (str): The utterance's id.
+            metadata (dict, optional): JSON serialisable fields stored in its index line,
+                e.g. {"speaker": "ABA"}.
+            **sequences: One sequence per stream: a PhonemeSequence of the corpus
+                alphabet, an array of its codes, or a list of phonemes. Streams left out
+                get an empty sequence.
+
+        Raises:
+            ValueError: If a stream is not one of the corpus' streams.
+            ElementNotInVocabError: If a phoneme is not in the alphabet.
+        """
+        import numpy as np
+
+        unknown = set(sequences) - set(self.streams)
+        if unknown:
+            raise ValueError(f"Unknown streams {sorted(unknown)}, expected {self.streams}.")
+        encoded = {}
+        for stream in self.streams:
+            codes = sequences.get(stream, ())
+            if isinstance(codes, PhonemeSequence) and codes.alphabet is self.alphabet:
+                codes = codes.codes
+            elif not isinstance(codes, np.ndarray):
+                codes = self.alphabet.encode(list(codes))
+            encoded[stream] = np.ascontiguousarray(codes, dtype=self._dtype)
+
+        for stream, codes in encoded.items():
+            self._codes[stream].write(codes.tobytes())
+            self._ends[stream] += len(codes)
+            end = self._ends[stream].to_bytes(_OFFSET_BYTES, "little", signed=True)
+            self._offsets[stream].write(end)
+        record = {"id": utterance_id}
+        if metadata:
+            record.update(metadata)
+        line = (json.dumps(record) + "\n").encode()
+        self._index.write(line)
+        self._index_end += len(line)
+        self._index_offsets.write(self._index_end.to_bytes(_OFFSET_BYTES, "little", signed=True))
+        self.length += 1
+        return self.length - 1
+
+    def _files(self):
+        return (*self._codes.values(), *self._offsets.values(), self._index, self._index_offsets)
+
+    def flush(self) -> None:
+        for file in self._files():
+            file.flush()
+
+    def close(self) -> None:
+        for file in self._files():
+            file.close()
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self):
+        return f"CorpusWriter({self.path!r}, streams={self.streams}, length={self.length})"
+
+
+class CorpusUtterance(NamedTuple):
+    """
+    One utterance of a PhonemeCorpus. Its sequences are views of the corpus files;
+    streams the corpus does not have are None.
+    """
+    id: str
+    target: PhonemeSequence
+    annotation: PhonemeSequence
+    prediction: PhonemeSequence
+    metadata: dict
+
+
+class PhonemeCorpus:
+    """
+    Reads a corpus written by CorpusWriter through numpy.memmap, without parsing or
+    copying it.
+
+    Each utterance's sequences are PhonemeSequences over zero-copy, read-only views of
+    the mapped code files, so they can be passed to the aligners and the MDD metrics as
+    they are. Pages are loaded on first use and shared through the operating system's
+    page cache, so worker processes reading the same corpus share one copy of it. The
+    index is mapped too, and an utterance's line is only decoded when it is read. A
+    PhonemeCorpus pickles as its path, and each worker maps the files again.
+
+    Args:
+        path (str): The corpus directory.
+    """
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r") as file:
+            meta = json.load(file)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has corpus format {meta.get('format')}, expected {FORMAT_VERSION}."
+            )
+        self.streams = tuple(meta["streams"])
+        arpabet = arpabet_alphabet()
+        if meta["symbols"] == list(arpabet.symbols[:-1]) and meta["gap"] == arpabet.gap:
+            self.alphabet = arpabet
+        else:
+            self.alphabet = PhonemeAlphabet(meta["symbols"], gap=meta["gap"])
+
+        self._codes = {}
+        self._offsets = {}
+        for stream in self.streams:
+            self._codes[stream] = _map(_codes_path(path, stream), np.dtype(meta["dtype"]))
+            self._offsets[stream] = _map(_offsets_path(path, stream), np.dtype(OFFSET_DTYPE))
+        self._index = _map(os.path.join(path, INDEX_FILE), np.dtype(np.uint8))
+        self._index_offsets = _map(os.path.join(path, INDEX_OFFSETS_FILE), np.dtype(OFFSET_DTYPE))
+        self.length = min(
+            [len(self._index_offsets) - 1]
+            + [len(offsets) - 1 for offsets in self._offsets.values()]
+        )
+        self._positions = None
+
+    def stream(self, name: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        The codes of every utterance in a stream, concatenated, and the offsets where each
+        starts followed by the total length. Both are read-only views of the files.
+        """
+        return self._codes[name], self._offsets[name][:self.length + 1]
+
+    def sequence(self, index: int, stream: str) -> PhonemeSequence:
+        """The sequence of one utterance in a stream, as a view of the mapped file."""
+        if stream not in self._codes:
+            return None
+        offsets = self._offsets[stream]
+        return PhonemeSequence(
+            self._codes[stream][offsets[index]:offsets[index + 1]], self.alphabet
+        )
+
+    def index_record(self, index: int) -> dict:
+        """The id and metadata of one utterance, decoded from its line of index.jsonl."""
+        start, end = self._index_offsets[index:index + 2]
+        return json.loads(self._index[start:end].tobytes())
+
+    def position(self, utterance_id: str) -> int:
+        """
+        The position of an utterance in the corpus by its id. The first call reads the
+        ids of every utterance.
+        """
+        if self._positions is None:
+            ids = (record["id"] for record in islice(iter_index(self.path), self.length))
+            self._positions = {utterance_id: i for i, utterance_id in enumerate(ids)}
+        return self._positions[utterance_id]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index: Union[int, str]) -> CorpusUtterance:
+        if isinstance(index, str):
+            index = self.position(index)
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError(f"Utterance {index} is out of range for a corpus of {self.length}.")
+        record = self.index_record(index)
+        return CorpusUtterance(
+            record["id"],
+            self.sequence(index, "target"),
+            self.sequence(index, "annotation"),
+            self.sequence(index, "prediction"),
+            {key: value for key, value in record.items() if key != "id"},
+        )
+
+    def __iter__(self) -> Iterator[CorpusUtterance]:
+        for index in range(self.length):
+            yield self[index]
+
+    def record(self, index: Union[int, str]) -> Tuple[str, dict]:
+        """
+        An utterance as an (utterance id, record) pair in the shape iter_annotations
+        yields, for evaluate_stream and evaluate_sharded. Phonemes are PhonemeSequences.
+        """
+        utterance = self[index]
+        record = dict(utterance.metadata)
+        for stream, key in _RECORD_KEYS.items():
+            sequence = getattr(utterance, stream)
+            if sequence is not None:
+                record[key] = sequence
+        return utterance.id, record
+
+    def records(self) -> Iterator[Tuple[str, dict]]:
+        """Every utterance as an (utterance id, record) pair, see record."""
+        for index in range(self.length):
+            yield self.record(index)
+
+    def __reduce__(self):
+        return (PhonemeCorpus, (self.path,))
+
+    def __repr__(self):
+        return f"PhonemeCorpus({self.path!r}, streams={self.streams}, length={self.length})"
+
+
+def _map(path: str, dtype: "np.dtype") -> "np.ndarray":
+    import numpy as np
+
+    # numpy cannot map an empty file. The plain ndarray view drops the memmap subclass,
+    # which slices more slowly, and keeps the mapping alive through its base.
+    if os.path.getsize(path) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r").view(np.ndarray)
+
+
+def write_corpus(
+        path: str,
+        utterances: Iterable,
+        streams: Sequence[str] = ("target", "annotation", "prediction"),
+    ) -> int:
+    """
+    Writes Utterances, such as those of pipeline.encode_utterances, to a new or existing
+    corpus, and returns the number written.
+    """
+    count = 0
+    with CorpusWriter(path, streams=streams) as writer:
+        for utterance in utterances:
+            sequences = {stream: getattr(utterance, stream) for stream in streams}
+            writer.append(utterance.id, **sequences)
+            count += 1
+    return count
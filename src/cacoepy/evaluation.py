@@ -0,0 +1,335 @@
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
+from cacoepy.aligner import AlignBasic2
+from cacoepy.core.exceptions import (
+    AlignSequencePairError,
+    ElementNotInVocabError,
+    PhonemeSequenceError,
+)
+from cacoepy.core.phoneme_sequence import PhonemeSequence
+from cacoepy.metric import MetricReport
+from cacoepy.pipeline import Utterance, _as_phonemes, align_utterances
+
+SHARD_BY = ("utterance", "speaker")
+_INVALID = (ElementNotInVocabError, PhonemeSequenceError, AlignSequencePairError)
+_worker_aligners = None
+
+
+class ShardResult(NamedTuple):
+    """
+    The evaluation of one shard: MDD metrics of the predictions, if the records have
+    any, and the summed alignment_agreement of each aligner.
+    """
+    key: str
+    utterances: int
+    skipped: int
+    metric: MetricReport
+    scores: Dict[str, float]
+
+    def to_json(self) -> dict:
+        return {
+            "key": self.key,
+            "utterances": self.utterances,
+            "skipped": self.skipped,
+            "counts": self.metric.counts.tolist(),
+            "scores": self.scores,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "ShardResult":
+        return cls(
+            data["key"],
+            data["utterances"],
+            data["skipped"],
+            MetricReport(data["counts"]),
+            data["scores"],
+        )
+
+
+class EvaluationResult(NamedTuple):
+    """The shard results of an evaluation, reduced in shard key order."""
+    utterances: int
+    skipped: int
+    metric: MetricReport
+    scores: Dict[str, float]
+    shards: List[ShardResult]
+
+
+def speaker_of(utterance_id: str, record: dict) -> str:
+    """
+    The speaker of an utterance: the record's "speaker" field, else the first directory
+    of its id, as in "ABA/arctic_a0001.TextGrid", else "".
+    """
+    if "speaker" in record:
+        return str(record["speaker"])
+    head, _, tail = utterance_id.partition("/")
+    return head if tail else ""
+
+
+def shard_records(
+        records: Iterable[Tuple[str, dict]],
+        shard_by: Union[str, Callable[[str, dict], str]] = "utterance",
+        shard_size: int = 64,
+    ) -> Dict[str, List[Tuple[str, dict]]]:
+    """
+    Splits (utterance id, record) pairs into shards, keeping input order within each.
+
+    Args:
+        records (Iterable[Tuple[str, dict]]): Such as iter_annotations(path).
+        shard_by (Union[str, Callable]): "utterance" for consecutive runs of `shard_size`
+            utterances, "speaker" for one shard per speaker_of, or a function from
+            (utterance id, record) to a shard key.
+        shard_size (int): Utterances per shard when sharding by utterance.
+
+    Returns:
+        Dict[str, List[Tuple[str, dict]]]: The records of each shard, by shard key.
+    """
+    if shard_by == "utterance":
+        key_of = None
+    elif shard_by == "speaker":
+        key_of = speaker_of
+    elif callable(shard_by):
+        key_of = shard_by
+    else:
+        raise ValueError(f"Unknown shard_by {shard_by!r}, expected one of {SHARD_BY} or a function.")
+
+    shards = {}
+    for index, (utterance_id, record) in enumerate(records):
+        key = f"{index // shard_size:06d}" if key_of is None else str(key_of(utterance_id, record))
+        shards.setdefault(key, []).append((utterance_id, record))
+    return shards
+
+
+@lru_cache(maxsize=None)
+def _basic_aligner() -> AlignBasic2:
+    return AlignBasic2()
+
+
+def alignment_agreement(
+        target: PhonemeSequence,
+        annotation: PhonemeSequence,
+        aligner: Callable,
+    ) -> float:
+    """
+    How closely an aligner reproduces the annotated alignment of an utterance. The target
+    and annotation are realigned from their phonemes without gaps, and each realigned
+    sequence is scored against its annotated one with AlignBasic2.score_only. Higher is
+    closer.
+
+    Args:
+        target (PhonemeSequence): Target phonemes aligned with the annotation.
+        annotation (PhonemeSequence): Annotated phonemes aligned with the target.
+        aligner (Callable): Called with two lists of phonemes, returning the two aligned
+            lists and a score, like AlignARPAbet2.
+    """
+    aligned_target, aligned_annotation, _ = aligner(
+        target.without_gaps().tolist(), annotation.without_gaps().tolist()
+    )
+    basic = _basic_aligner()
+    return float(
+        basic.score_only(annotation.tolist(), aligned_annotation)
+        + basic.score_only(target.tolist(), aligned_target)
+    )
+
+
+def evaluate_shard(
+        key: str,
+        records: List[Tuple[str, dict]],
+        aligners: Dict[str, Callable],
+        predict: Callable[[str, dict], Union[str, List[str]]] = None,
+        gap_penalty: float = -5,
+        target_key: str = "target_phonemes",
+        annotation_key: str = "perceived_phonemes",
+        prediction_key: str = "predicted_phonemes",
+    ) -> ShardResult:
+    """
+    Evaluates one shard in input order. Utterances missing their target or annotation,
+    with phonemes outside the vocabulary or with unaligned annotations are counted as
+    skipped. See evaluate_sharded.
+    """
+    metric = MetricReport()
+    scores = dict.fromkeys(aligners, 0.0)
+    utterances = skipped = 0
+    for utterance_id, record in records:
+        if target_key not in record or annotation_key not in record:
+            skipped += 1
+            continue
+        try:
+            target = _as_phonemes(record[target_key])
+            annotation = _as_phonemes(record[annotation_key])
+            agreement = {
+                name: alignment_agreement(target, annotation, aligner)
+                for name, aligner in aligners.items()
+            }
+            result = None
+            if predict is not None or prediction_key in record:
+                prediction = (
+                    predict(utterance_id, record) if predict is not None else record[prediction_key]
+                )
+                utterance = Utterance(utterance_id, target, annotation, _as_phonemes(prediction))
+                (result,) = align_utterances([utterance], gap_penalty)
+        except _INVALID:
+            skipped += 1
+            continue
+        utterances += 1
+        for name, score in agreement.items():
+            scores[name] += score
+        if result is not None:
+            metric.merge(result.metric)
+    return ShardResult(key, utterances, skipped, metric, scores)
+
+
+def reduce_shards(shards: Iterable[ShardResult]) -> EvaluationResult:
+    """
+    Sums shard results in shard key order, so the totals do not depend on the order the
+    shards finished in.
+    """
+    shards = sorted(shards, key=lambda shard: shard.key)
+    metric = MetricReport()
+    scores = {}
+    utterances = skipped = 0
+    for shard in shards:
+        utterances += shard.utterances
+        skipped += shard.skipped
+        metric.merge(shard.metric)
+        for name, score in shard.scores.items():
+            scores[name] = scores.get(name, 0.0) + score
+    return EvaluationResult(utterances, skipped, metric, scores, shards)
+
+
+def _digest(value: bytes) -> str:
+    return hashlib.sha256(value).hexdigest()
+
+
+def _describe(value) -> str:
+    # Identifies an aligner or predict function across runs. Unlike a pickle it does not
+    # depend on the order of sets, which changes with Python's hash seed.
+    name = getattr(value, "__qualname__", type(value).__qualname__)
+    config = getattr(value, "_config", None)
+    if config is None:
+        return name
+    source, gap_penalty = config.fingerprint()
+    if callable(source):
+        source = getattr(source, "__qualname__", repr(source))
+    engine = getattr(value, "_needleman_wunsch2d", None)
+    return repr((name, source, gap_penalty, getattr(engine, "mode", None), getattr(engine, "band", None)))
+
+
+def _checkpoint_path(checkpoint: str, key: str) -> str:
+    name = re.sub(r"[^\w.-]", "_", key)
+    return os.path.join(checkpoint, f"shard-{name}.json")
+
+
+def _load_checkpoint(checkpoint: str, key: str, run: str, records: str) -> ShardResult:
+    try:
+        with open(_checkpoint_path(checkpoint, key), "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if data.get("run") != run or data.get("records") != records or data["result"]["key"] != key:
+        return None
+    return ShardResult.from_json(data["result"])
+
+
+def _save_checkpoint(checkpoint: str, result: ShardResult, run: str, records: str) -> None:
+    path = _checkpoint_path(checkpoint, result.key)
+    # Written to a temporary file and renamed, so an interrupted write never leaves a
+    # partial checkpoint behind.
+    with open(path + ".tmp", "w") as file:
+        json.dump({"run": run, "records": records, "result": result.to_json()}, file)
+    os.replace(path + ".tmp", path)
+
+
+def _init_worker(aligners):
+    global _worker_aligners
+    _worker_aligners = aligners
+
+
+def _evaluate_shard_in_worker(key, records, options):
+    return evaluate_shard(key, records, _worker_aligners, **options)
+
+
+def evaluate_sharded(
+        records: Iterable[Tuple[str, dict]],
+        aligners: Dict[str, Callable],
+        shard_by: Union[str, Callable[[str, dict], str]] = "utterance",
+        shard_size: int = 64,
+        workers: int = 1,
+        checkpoint: str = None,
+        predict: Callable[[str, dict], Union[str, List[str]]] = None,
+        gap_penalty: float = -5,
+        **keys: str,
+    ) -> EvaluationResult:
+    """
+    Evaluates aligner configurations over an annotated corpus, such as L2-ARCTIC, split
+    into shards that run on a pool of worker processes.
+
+    Each shard reports the summed alignment_agreement of every aligner and, when the
+    records have predictions, their MDD metrics as in evaluate_stream. Shards are reduced
+    in key order, so the result is identical for any number of workers and any order of
+    completion. With `checkpoint`, every finished shard is saved to that directory and a
+    rerun with the same aligners and records only evaluates the shards that are missing.
+
+    Args:
+        records (Iterable[Tuple[str, dict]]): (utterance id, record) pairs, such as
+            iter_annotations("data/L2Arctic_annotations.json").
+        aligners (Dict[str, Callable]): Picklable aligners by name, e.g.
+            {"arpabet": AlignARPAbet2(), "basic": AlignBasic2()}.
+        shard_by (Union[str, Callable]): "utterance", "speaker" or a function, see
+            shard_records.
+        shard_size (int): Utterances per shard when sharding by utterance.
+        workers (int): Number of worker processes. 1 or fewer evaluates in this process.
+        checkpoint (str, optional): Directory to save finished shards to and resume from.
+        predict (Callable, optional): Called with (utterance id, record) to get the MDD
+            system's predicted phonemes. Must be picklable to run in workers. Defaults to
+            the record's prediction_key, if it has one.
+        gap_penalty (float): Penalty for gaps when aligning predictions.
+        **keys (str): target_key, annotation_key or prediction_key of the records.
+
+    Returns:
+        EvaluationResult: The totals and the result of every shard, in key order.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    shards = shard_records(records, shard_by, shard_size)
+    options = dict(predict=predict, gap_penalty=gap_penalty, **keys)
+    results = {}
+    digests = {}
+    if checkpoint is not None:
+        os.makedirs(checkpoint, exist_ok=True)
+        run = _digest(repr((
+            sorted((name, _describe(aligner)) for name, aligner in aligners.items()),
+            _describe(predict),
+            gap_penalty,
+            sorted(keys.items()),
+        )).encode())
+        for key, shard in shards.items():
+            digests[key] = _digest(json.dumps(shard, sort_keys=True, default=str).encode())
+            result = _load_checkpoint(checkpoint, key, run, digests[key])
+            if result is not None:
+                results[key] = result
+
+    def finish(result):
+        results[result.key] = result
+        if checkpoint is not None:
+            _save_checkpoint(checkpoint, result, run, digests[result.key])
+
+    pending = [key for key in shards if key not in results]
+    if workers is None or workers <= 1 or len(pending) <= 1:
+        for key in pending:
+            finish(evaluate_shard(key, shards[key], aligners, **options))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(aligners,)
+        ) as executor:
+            futures = [
+                executor.submit(_evaluate_shard_in_worker, key, shards[key], options)
+                for key in pending
+            ]
+            for future in as_completed(futures):
+                finish(future.result())
+    return reduce_shards(results.values())
@@ -0,0 +1,224 @@
+import glob
+import os
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from cacoepy.core.phoneme_sequence import GAP, arpabet_alphabet, normalise_phoneme
+
+TEXTGRID_SUFFIX = ".TextGrid"
+SILENCES = ("sil", "sp")
+_DIGITS = str.maketrans("", "", "0123456789* ")
+
+
+def read_textgrid(path: str) -> Dict[str, List[str]]:
+    """
+    Reads the interval labels of a Praat TextGrid saved as a long text file, the format
+    of L2-ARCTIC's annotations. UTF-8 and UTF-16 files are accepted.
+
+    Returns:
+        Dict[str, List[str]]: The labels of each interval tier by tier name, in order.
+
+    Raises:
+        ValueError: If the file is not a long text TextGrid.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    text = data.decode("utf-16" if data[:2] in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig")
+    if 'Object class = "TextGrid"' not in text[:200]:
+        raise ValueError(f"{path} is not a long text TextGrid.")
+
+    tiers = {}
+    labels = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("name = "):
+            labels = tiers.setdefault(_unquote(line[7:]), [])
+        elif line.startswith("text = ") and labels is not None:
+            labels.append(_unquote(line[7:]))
+    return tiers
+
+
+def _unquote(value: str) -> str:
+    # Praat escapes a quote inside a string by doubling it.
+    return value.strip()[1:-1].replace('""', '"')
+
+
+def l2arctic_phones(labels: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Converts the phone labels of an L2-ARCTIC annotation to aligned target and perceived
+    phonemes. A label is a correctly pronounced phone, or "target,perceived,type" for a
+    substitution (s), addition (a) or deletion (d). Silences become "sil" in the target
+    and a gap in the perceived phonemes, and stress digits are dropped.
+
+    Raises:
+        ValueError: If a label is malformed.
+    """
+    target = []
+    perceived = []
+    for label in labels:
+        phone = label.translate(_DIGITS).lower()
+        if not phone:
+            continue
+        if phone in SILENCES:
+            target.append("sil")
+            perceived.append(GAP)
+        elif "," not in phone:
+            target.append(phone)
+            perceived.append(phone)
+        else:
+            parts = phone.split(",")
+            if len(parts) != 3 or parts[2] not in ("s", "a", "d"):
+                raise ValueError(f"Malformed phone label {label!r}.")
+            correct, pronounced, error = parts
+            if error == "s":
+                target.append(correct)
+                perceived.append(correct if pronounced == "err" else pronounced)
+            elif error == "a":
+                target.append(GAP)
+                perceived.append(pronounced)
+            else:
+                target.append(correct)
+                perceived.append(GAP)
+    return target, perceived
+
+
+def speaker_from_path(path: str) -> str:
+    """The speaker of an L2-ARCTIC file, e.g. ABA for ABA/annotation/arctic_a0001.TextGrid."""
+    directory = os.path.dirname(os.path.abspath(path))
+    if os.path.basename(directory) == "annotation":
+        directory = os.path.dirname(directory)
+    return os.path.basename(directory)
+
+
+def find_textgrids(paths: Iterable[str]) -> Iterator[str]:
+    """TextGrid files, and the TextGrid files found under directories, in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            pattern = os.path.join(path, "**", "*" + TEXTGRID_SUFFIX)
+            yield from sorted(glob.glob(pattern, recursive=True))
+        else:
+            yield path
+
+
+def _utterance_id(path: str) -> str:
+    return f"{speaker_from_path(path)}/{os.path.basename(path)}"
+
+
+class ParsedUtterance(NamedTuple):
+    """An ingested TextGrid: its encoded phonemes, or the reason it was rejected."""
+    path: str
+    id: str
+    speaker: str
+    words: str
+    target: object
+    annotation: object
+    error: str
+
+
+def _parse_textgrids(paths: List[str]) -> List[ParsedUtterance]:
+    # Runs in the workers. The phones of the whole chunk are validated and encoded with
+    # one call, instead of once per utterance.
+    import numpy as np
+
+    alphabet = arpabet_alphabet()
+    parsed = []
+    for path in paths:
+        speaker = speaker_from_path(path)
+        utterance_id = _utterance_id(path)
+        try:
+            tiers = read_textgrid(path)
+            target, perceived = l2arctic_phones(tiers["phones"])
+            words = " ".join(word for word in tiers.get("words", []) if word)
+        except (OSError, UnicodeDecodeError, KeyError, ValueError) as error:
+            parsed.append(ParsedUtterance(path, utterance_id, speaker, "", None, None, repr(error)))
+            continue
+        parsed.append(ParsedUtterance(path, utterance_id, speaker, words, target, perceived, None))
+
+    phonemes = {p for item in parsed if item.error is None for p in item.target + item.annotation}
+    unknown = {
+        p for p in phonemes if p != GAP and normalise_phoneme(p) not in alphabet.codes
+    }
+    valid = []
+    for i, item in enumerate(parsed):
+        if item.error is not None:
+            continue
+        bad = sorted(unknown.intersection(item.target + item.annotation))
+        if bad:
+            error = f"Phonemes not in the ARPAbet vocabulary: {bad}"
+            parsed[i] = item._replace(target=None, annotation=None, error=error)
+        else:
+            valid.append(i)
+    if not valid:
+        return parsed
+
+    phones = [p for i in valid for p in parsed[i].target + parsed[i].annotation]
+    codes = alphabet.encode(phones)
+    ends = np.cumsum([2 * len(parsed[i].target) for i in valid])
+    for i, utterance_codes in zip(valid, np.split(codes, ends[:-1])):
+        target, annotation = np.split(utterance_codes, 2)
+        parsed[i] = parsed[i]._replace(target=target, annotation=annotation)
+    return parsed
+
+
+class IngestResult(NamedTuple):
+    """The number of utterances written to the corpus, and (path, reason) of rejected files."""
+    ingested: int
+    rejected: List[Tuple[str, str]]
+
+
+def ingest_textgrids(
+        paths: Iterable[str],
+        corpus: str,
+        workers: int = 1,
+        chunksize: int = 64,
+    ) -> IngestResult:
+    """
+    Parses L2-ARCTIC TextGrid annotations on a pool of worker processes and appends their
+    encoded target and perceived phonemes to a corpus, in file order. Only the chunks
+    being parsed are held in memory.
+
+    Each utterance's id is "speaker/file name", and its speaker and words are stored in
+    the corpus index. Files with malformed labels or phonemes outside the ARPAbet
+    vocabulary are rejected, as are files whose id was already written by this run, such
+    as the same file reached through two of the given paths. Files whose id was in the
+    corpus before the run are skipped, so an interrupted ingestion is resumed by running
+    it again.
+
+    Args:
+        paths (Iterable[str]): TextGrid files, or directories searched recursively, such as
+            the root of L2-ARCTIC.
+        corpus (str): The corpus directory, created or appended to. See CorpusWriter.
+        workers (int): Number of worker processes. 1 or fewer parses in this process.
+        chunksize (int): Files sent to a worker at a time.
+
+    Returns:
+        IngestResult: The number of ingested utterances and the rejected files.
+    """
+    from cacoepy.core.batch import imap_chunks
+    from cacoepy.corpus import CorpusWriter, iter_index
+
+    ingested = 0
+    rejected = []
+    with CorpusWriter(corpus, streams=("target", "annotation")) as writer:
+        existing = frozenset(record["id"] for record in iter_index(corpus))
+        written = set()
+        parsed = imap_chunks(
+            _parse_textgrids,
+            (path for path in find_textgrids(paths) if _utterance_id(path) not in existing),
+            workers=workers,
+            chunksize=chunksize,
+        )
+        for item in parsed:
+            if item.error is not None:
+                rejected.append((item.path, item.error))
+                continue
+            if item.id in written:
+                rejected.append((item.path, f"Duplicate utterance id {item.id!r}."))
+                continue
+            written.add(item.id)
+            writer.append(
+                item.id,
+                {"speaker": item.speaker, "words": item.words},
+                target=item.target,
+                annotation=item.annotation,
+            )
+            ingested += 1
+    return IngestResult(ingested, rejected)
@@ -1,33 +1,105 @@
 from cacoepy.core.exceptions import PhonemeSequenceError
-from typing import List, Dict, TypedDict
+from cacoepy.core.phoneme_sequence import PhonemeSequence
+from typing import Iterable, List, Sequence, Tuple
+import numpy as np
+
+COUNT_KEYS = (
+    "true_acceptance",
+    "true_rejection",
+    "false_acceptance",
+    "false_rejection",
+    "correctly_diagnosed",
+    "diagnosis_error",
+)
+RATE_KEYS = {
+    "false_acceptance_rate": "false_acceptance",
+    "false_rejection_rate": "false_rejection",
+    "diagnostic_error_rate": "diagnosis_error",
+}
+_COUNT_INDEX = {key: i for i, key in enumerate(COUNT_KEYS)}
+# Every aligned phoneme falls into exactly one of these outcomes.
+_OUTCOME_INDEX = [
+    _COUNT_INDEX[key]
+    for key in ("true_acceptance", "true_rejection", "false_acceptance", "false_rejection")
+]
 
 
 class MetricReport:
     """
     A datatype for holding MDD metrics from mdd_phoneme_metrics.
+
+    The counts are stored in an integer array and the rates are derived from them, so
+    reports from different utterances or shards can be summed with `+` or `merge` and
+    the rates are always those of the combined phonemes.
+
+    Args:
+        counts (Sequence[int], optional): The counts in the order of COUNT_KEYS.
     """
-    def __init__(self):
-        self.data = {
-            "true_acceptance": 0,
-            "true_rejection": 0,
-            "false_acceptance": 0,
-            "false_rejection": 0,
-            "correctly_diagnosed": 0,
-            "diagnosis_error": 0,
-            "false_acceptance_rate": 0.0,
-            "false_rejection_rate": 0.0,
-            "diagnostic_error_rate": 0.0,
-        }
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: Sequence[int] = None):
+        if counts is None:
+            self.counts = np.zeros(len(COUNT_KEYS), dtype=np.int64)
+        else:
+            self.counts = np.array(counts, dtype=np.int64).reshape(len(COUNT_KEYS))
+
+    @property
+    def total(self) -> int:
+        """The number of aligned phonemes the counts were taken over."""
+        return int(self.counts[_OUTCOME_INDEX].sum())
+
+    @property
+    def data(self) -> dict:
+        data = dict(zip(COUNT_KEYS, self.counts.tolist()))
+        total = self.total
+        for rate_key, count_key in RATE_KEYS.items():
+            data[rate_key] = data[count_key] / total if total > 0 else 0.0
+        return data
+
+    @data.setter
+    def data(self, data: dict):
+        self.counts = np.array([data.get(key, 0) for key in COUNT_KEYS], dtype=np.int64)
 
     def get(self, key):
-        return self.data.get(key, None)
+        if key in _COUNT_INDEX:
+            return int(self.counts[_COUNT_INDEX[key]])
+        if key in RATE_KEYS:
+            total = self.total
+            return self.get(RATE_KEYS[key]) / total if total > 0 else 0.0
+        return None
 
     def set(self, key, value):
-        if key in self.data:
-            self.data[key] = value
+        if key in _COUNT_INDEX:
+            self.counts[_COUNT_INDEX[key]] = value
+        elif key in RATE_KEYS:
+            raise KeyError(f"{key} is derived from the counts and cannot be set")
         else:
             raise KeyError(f"{key} is not a valid metric key")
 
+    def merge(self, other: "MetricReport") -> "MetricReport":
+        """Adds the counts of another report to this one in place, and returns it."""
+        self.counts += other.counts
+        return self
+
+    def copy(self) -> "MetricReport":
+        return MetricReport(self.counts)
+
+    def __add__(self, other):
+        if isinstance(other, MetricReport):
+            return MetricReport(self.counts + other.counts)
+        return NotImplemented
+
+    def __radd__(self, other):
+        # Lets sum() start from its default of 0.
+        if isinstance(other, int) and other == 0:
+            return self.copy()
+        return NotImplemented
+
+    def __iadd__(self, other):
+        if isinstance(other, MetricReport):
+            return self.merge(other)
+        return NotImplemented
+
     def __getitem__(self, key):
         return self.get(key)
 
@@ -36,20 +108,82 @@ class MetricReport:
 
     def __str__(self):
         output = ""
-        max_key_length = max(len(k) for k in self.data.keys())
-        for k, v in self.data.items():
+        data = self.data
+        max_key_length = max(len(k) for k in data.keys())
+        for k, v in data.items():
             if isinstance(v, float):
                 output += f"{k:<{max_key_length}} -> {v:.2f}\n"
             else:
                 output += f"{k:<{max_key_length}} -> {v}\n"
         return output.strip()
 
+    def __repr__(self):
+        counts = ", ".join(f"{k}={v}" for k, v in zip(COUNT_KEYS, self.counts.tolist()))
+        return f"MetricReport({counts})"
+
     def __eq__(self, other):
         if isinstance(other, MetricReport):
             return self.data == other.data
         return False
 
 
+def _outcome_masks(target: np.ndarray, annotation: np.ndarray, prediction: np.ndarray):
+    """Boolean masks of each outcome, in the order of COUNT_KEYS."""
+    mispronounced = target != annotation
+    predicted_annotation = annotation == prediction
+    true_rejection = mispronounced & ~predicted_annotation
+    return (
+        ~mispronounced & predicted_annotation,
+        true_rejection,
+        mispronounced & predicted_annotation,
+        ~mispronounced & ~predicted_annotation,
+        true_rejection & predicted_annotation,
+        true_rejection,
+    )
+
+
+def _count_outcomes(target, annotation, prediction) -> np.ndarray:
+    masks = _outcome_masks(target, annotation, prediction)
+    return np.array([np.count_nonzero(mask) for mask in masks], dtype=np.int64)
+
+
+def _encode_triples(
+        triples: Sequence[Tuple[Sequence[str], Sequence[str], Sequence[str]]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Concatenates each role of the triples into one array, after checking every triple
+    is aligned. PhonemeSequences sharing an alphabet contribute their codes directly.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The target, annotation and
+        prediction arrays, and the offsets where each triple starts followed by the total
+        length.
+    """
+    lengths = []
+    for target, annotation, prediction in triples:
+        if not (len(target) == len(annotation) == len(prediction)):
+            raise PhonemeSequenceError(
+                "The target, annotation and prediction phonemes must be aligned."
+            )
+        lengths.append(len(target))
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    sequences = [seq for triple in triples for seq in triple]
+    alphabets = {getattr(seq, "alphabet", None) for seq in sequences}
+    if len(alphabets) == 1 and all(isinstance(seq, PhonemeSequence) for seq in sequences):
+        arrays = [
+            np.concatenate([triple[role].codes for triple in triples])
+            for role in range(3)
+        ]
+    else:
+        arrays = [
+            np.array([p for triple in triples for p in triple[role]], dtype=str)
+            for role in range(3)
+        ]
+    return arrays[0], arrays[1], arrays[2], offsets
+
+
 def mdd_phoneme_metrics(
     target: List[str],
     annotation: List[str],
@@ -63,52 +197,90 @@ def mdd_phoneme_metrics(
     - target (List[str]): Intended correct pronunciation phonemes.
     - annotation (List[str]): Actually pronounced phonemes.
     - prediction (List[str]): Predicted phonemes by the model.
-    - metric (MetricDict, optional): Dictionary to store metric counts and rates.
+    - metric (MetricReport, optional): A report the counts are added to.
 
     Returns:
-    - MetricDict: Dictionary with counts and rates of MDD metrics.
+    - MetricReport: The counts and rates of MDD metrics. Rates are over every phoneme
+      counted in the report, including those of earlier calls with the same report.
 
     Raises:
     - PhonemeSequenceError: If the lengths of target, annotation, and prediction sequences are not equal.
     """
+    return mdd_corpus_metrics([(target, annotation, prediction)], metric=metric)
+
+
+def mdd_corpus_metrics(
+    triples: Iterable[Tuple[List[str], List[str], List[str]]],
+    metric: MetricReport = None,
+) -> MetricReport:
+    """
+    Calculate MDD metrics at the phoneme level over many utterances at once.
+
+    Parameters:
+    - triples (Iterable[Tuple[List[str], List[str], List[str]]]): Aligned (target,
+      annotation, prediction) phoneme sequences, one triple per utterance.
+    - metric (MetricReport, optional): A report the counts are added to.
+
+    Returns:
+    - MetricReport: The counts and rates of MDD metrics over all utterances.
+
+    Raises:
+    - PhonemeSequenceError: If the sequences of a triple are not the same length.
+    """
+    target, annotation, prediction, _ = _encode_triples(list(triples))
+    report = MetricReport(_count_outcomes(target, annotation, prediction))
+    if metric is not None:
+        return metric.merge(report)
+    return report
+
+
+def mdd_encoded_metrics(
+    target: np.ndarray,
+    annotation: np.ndarray,
+    prediction: np.ndarray,
+    offsets: Sequence[int] = None,
+) -> List[MetricReport]:
+    """
+    Calculate MDD metrics for a corpus already encoded as concatenated code arrays,
+    for example the codes of PhonemeSequences.
+
+    Parameters:
+    - target, annotation, prediction (np.ndarray): Aligned codes of the whole corpus.
+    - offsets (Sequence[int], optional): Where each utterance starts, followed by the
+      corpus length, so utterance i is offsets[i]:offsets[i + 1]. Without offsets the
+      corpus is one utterance.
+
+    Returns:
+    - List[MetricReport]: One report per utterance. Their sum is the corpus report.
+
+    Raises:
+    - PhonemeSequenceError: If the arrays are not the same length.
+    """
+    target, annotation, prediction = (np.asarray(x) for x in (target, annotation, prediction))
     if not (len(target) == len(annotation) == len(prediction)):
         raise PhonemeSequenceError(
             "The target, annotation and prediction phonemes must be aligned."
         )
+    if offsets is None:
+        return [MetricReport(_count_outcomes(target, annotation, prediction))]
 
-    if metric is None:
-        metric = MetricReport()
-
-    iter_phonemes = zip(target, annotation, prediction)
-    for target_phoneme, annotation_phoneme, prediction_phoneme in iter_phonemes:
-
-        if target_phoneme == annotation_phoneme == prediction_phoneme:
-            metric["true_acceptance"] += 1
-        elif (
-            target_phoneme != annotation_phoneme
-            and annotation_phoneme == prediction_phoneme
-        ):
-            metric["false_acceptance"] += 1
-        elif target_phoneme != annotation_phoneme:
-            metric["true_rejection"] += 1
-            if prediction_phoneme == annotation_phoneme:
-                metric["correctly_diagnosed"] += 1
-            else:
-                metric["diagnosis_error"] += 1
-
-        elif (
-            target_phoneme == annotation_phoneme
-            and annotation_phoneme != prediction_phoneme
-        ):
-            metric["false_rejection"] += 1
-
-    total = len(target)
-    if total > 0:
-        metric["false_acceptance_rate"] = metric["false_acceptance"] / total
-        metric["false_rejection_rate"] = metric["false_rejection"] / total
-        metric["diagnostic_error_rate"] = metric["diagnosis_error"] / total
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if (
+        len(offsets) == 0
+        or offsets[0] != 0
+        or offsets[-1] != len(target)
+        or np.any(np.diff(offsets) < 0)
+    ):
+        raise ValueError(
+            "The offsets must start at 0, be non-decreasing and end at the corpus length."
+        )
 
-    return metric
+    masks = np.stack(_outcome_masks(target, annotation, prediction), axis=1)
+    # Running totals make empty utterances safe, unlike np.add.reduceat.
+    running = np.zeros((len(target) + 1, len(COUNT_KEYS)), dtype=np.int64)
+    np.cumsum(masks, axis=0, out=running[1:])
+    counts = running[offsets[1:]] - running[offsets[:-1]]
+    return [MetricReport(row) for row in counts]
 
 
 if __name__ == "__main__":
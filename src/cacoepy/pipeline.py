@@ -0,0 +1,265 @@
+import json
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, TextIO, Tuple, Union
+from cacoepy.aligner import align_prediction_to_annotation_and_target
+from cacoepy.core.exceptions import (
+    AlignSequencePairError,
+    ElementNotInVocabError,
+    PhonemeSequenceError,
+)
+from cacoepy.core.phoneme_sequence import PhonemeSequence
+from cacoepy.metric import MetricReport, mdd_phoneme_metrics
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+_CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+
+class Utterance(NamedTuple):
+    """An encoded utterance. The annotation is aligned with the target."""
+    id: str
+    target: PhonemeSequence
+    annotation: PhonemeSequence
+    prediction: PhonemeSequence
+
+
+class UtteranceResult(NamedTuple):
+    """The alignment of one utterance's prediction and its metrics."""
+    id: str
+    prediction: List[str]
+    annotation: List[str]
+    target: List[str]
+    metric: MetricReport
+
+
+class _JSONObjectReader:
+    """
+    Reads the members of a top level JSON object one at a time, keeping only the
+    member being decoded and one chunk of the file in memory.
+    """
+    def __init__(self, file: TextIO, chunk_size: int = _CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _next_char(self) -> str:
+        """Skips whitespace and returns the next character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._next_char()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self.pos} of the JSON buffer.")
+        self.pos += 1
+        return char
+
+    def _decode(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+            # A number that runs to the end of the buffer, possibly followed by a
+            # partial fraction or exponent, may continue in the next chunk.
+            if (
+                isinstance(value, (int, float))
+                and _NUMBER_TAIL.match(self.buffer, end)
+                and self._read()
+            ):
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self) -> Iterator[Tuple[str, object]]:
+        self._expect("{")
+        if self._next_char() == "}":
+            return
+        while True:
+            key = self._decode()
+            self._expect(":")
+            yield key, self._decode()
+            if self._expect(",}") == "}":
+                return
+
+
+def iter_annotations(
+        path_or_file: Union[str, TextIO],
+        jsonl: bool = None,
+    ) -> Iterator[Tuple[str, dict]]:
+    """
+    Streams annotation records from a JSON file shaped like L2Arctic_annotations.json,
+    an object of {utterance id: record}, or from a JSONL file with one record per line.
+    Only the current record is held in memory.
+
+    Args:
+        path_or_file (Union[str, TextIO]): A path, or an open text file.
+        jsonl (bool, optional): Whether the file is JSONL. Defaults to True for paths
+            ending in .jsonl or .ndjson.
+
+    Returns:
+        Iterator[Tuple[str, dict]]: (utterance id, record) pairs in file order. JSONL
+        records are identified by their "id" field, or their line number.
+    """
+    if isinstance(path_or_file, str):
+        if jsonl is None:
+            jsonl = path_or_file.endswith(JSONL_SUFFIXES)
+        with open(path_or_file, "r") as file:
+            yield from iter_annotations(file, jsonl=jsonl)
+        return
+
+    if not jsonl:
+        yield from _JSONObjectReader(path_or_file)
+        return
+    for line_number, line in enumerate(path_or_file):
+        if line.strip():
+            record = json.loads(line)
+            yield str(record.get("id", line_number)), record
+
+
+def _as_phonemes(value: Union[str, List[str]]) -> PhonemeSequence:
+    if isinstance(value, PhonemeSequence):
+        return value
+    if isinstance(value, str):
+        return PhonemeSequence.from_string(value)
+    return PhonemeSequence.from_phonemes(value)
+
+
+def encode_utterances(
+        records: Iterable[Tuple[str, dict]],
+        predict: Callable[[str, dict], Union[str, List[str]]] = None,
+        target_key: str = "target_phonemes",
+        annotation_key: str = "perceived_phonemes",
+        prediction_key: str = "predicted_phonemes",
+    ) -> Iterator[Utterance]:
+    """
+    Encodes annotation records as Utterances of PhonemeSequences.
+
+    Args:
+        records (Iterable[Tuple[str, dict]]): (utterance id, record) pairs, such as those
+            from iter_annotations. Phonemes may be space separated strings or lists.
+        predict (Callable, optional): Called with (utterance id, record) to get the MDD
+            system's predicted phonemes. Defaults to reading record[prediction_key].
+        target_key (str): Record field of the target phonemes.
+        annotation_key (str): Record field of the annotated phonemes aligned with the target.
+        prediction_key (str): Record field of the predicted phonemes.
+
+    Raises:
+        ElementNotInVocabError: If a phoneme is not in the ARPAbet vocabulary.
+    """
+    for utterance_id, record in records:
+        prediction = (
+            predict(utterance_id, record) if predict is not None else record[prediction_key]
+        )
+        yield Utterance(
+            utterance_id,
+            _as_phonemes(record[target_key]),
+            _as_phonemes(record[annotation_key]),
+            _as_phonemes(prediction),
+        )
+
+
+def align_utterances(
+        utterances: Iterable[Utterance],
+        gap_penalty: float = -5,
+    ) -> Iterator[UtteranceResult]:
+    """
+    Aligns each utterance's prediction to its annotation and target with
+    align_prediction_to_annotation_and_target, and scores it with mdd_phoneme_metrics.
+    """
+    for utterance in utterances:
+        prediction, annotation, target = align_prediction_to_annotation_and_target(
+            prediction=utterance.prediction,
+            annotation_aligned_with_target=utterance.annotation,
+            target_aligned_with_annotation=utterance.target,
+            gap_penalty=gap_penalty,
+        )
+        metric = mdd_phoneme_metrics(target, annotation, prediction)
+        yield UtteranceResult(utterance.id, prediction, annotation, target, metric)
+
+
+def _result_record(result: UtteranceResult) -> dict:
+    return {
+        "id": result.id,
+        "target": " ".join(result.target),
+        "annotation": " ".join(result.annotation),
+        "prediction": " ".join(result.prediction),
+        **result.metric.data,
+    }
+
+
+def evaluate_stream(
+        records: Iterable[Tuple[str, dict]],
+        predict: Callable[[str, dict], Union[str, List[str]]] = None,
+        gap_penalty: float = -5,
+        metric: MetricReport = None,
+        results: Union[str, TextIO] = None,
+        skip_invalid: bool = False,
+        **keys: str,
+    ) -> MetricReport:
+    """
+    Evaluates an MDD system over a stream of annotation records in constant memory.
+    Each utterance is encoded, aligned and scored, then folded into a running report.
+
+    Args:
+        records (Iterable[Tuple[str, dict]]): (utterance id, record) pairs, such as
+            iter_annotations("data/L2Arctic_annotations.json").
+        predict (Callable, optional): Called with (utterance id, record) to get the MDD
+            system's predicted phonemes. Defaults to the record's "predicted_phonemes".
+        gap_penalty (float): Penalty for gaps when aligning the prediction.
+        metric (MetricReport, optional): A report the counts are added to.
+        results (Union[str, TextIO], optional): A path or open file the per-utterance
+            alignments and metrics are written to as JSONL while streaming.
+        skip_invalid (bool): Skip utterances with phonemes outside the vocabulary or
+            unaligned annotations instead of raising. Skipped utterances are written to
+            `results` with an "error" field.
+        **keys (str): target_key, annotation_key or prediction_key for encode_utterances.
+
+    Returns:
+        MetricReport: The metrics over every evaluated utterance.
+    """
+    if metric is None:
+        metric = MetricReport()
+    if isinstance(results, str):
+        with open(results, "w") as file:
+            return evaluate_stream(
+                records, predict, gap_penalty, metric, file, skip_invalid, **keys
+            )
+
+    for utterance_id, record in records:
+        try:
+            (utterance,) = encode_utterances([(utterance_id, record)], predict, **keys)
+            (result,) = align_utterances([utterance], gap_penalty)
+        except (ElementNotInVocabError, PhonemeSequenceError, AlignSequencePairError) as error:
+            if not skip_invalid:
+                raise
+            if results is not None:
+                results.write(json.dumps({"id": utterance_id, "error": str(error)}) + "\n")
+            continue
+        metric.merge(result.metric)
+        if results is not None:
+            results.write(json.dumps(_result_record(result)) + "\n")
+    return metric
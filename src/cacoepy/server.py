@@ -0,0 +1,514 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+from cacoepy.core.constants import DEFAULT_HOST, DEFAULT_PORT
+from cacoepy.core.exceptions import ITEM_ERRORS, InvalidItemError, ServerBusyError
+
+PERCENTILES = (50, 90, 99)
+_MAX_BODY = 1 << 20
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+logger = logging.getLogger(__name__)
+
+
+def _phonemes(payload: dict, key: str) -> List[str]:
+    if key not in payload:
+        raise InvalidItemError(f"Missing field {key!r}.")
+    value = payload[key]
+    if isinstance(value, str):
+        return value.split()
+    if not isinstance(value, list):
+        raise InvalidItemError(f"{key} must be a list or a space separated string.")
+    return value
+
+
+def _gap_penalty(payload: dict, default: float) -> float:
+    gap_penalty = payload.get("gap_penalty", default)
+    if isinstance(gap_penalty, bool) or not isinstance(gap_penalty, (int, float)):
+        raise InvalidItemError("gap_penalty must be a number.")
+    if not math.isfinite(gap_penalty):
+        raise InvalidItemError("gap_penalty must be finite.")
+    return gap_penalty
+
+
+def _arpabet_aligner(gap_penalty):
+    from cacoepy.aligner import _shared_arpabet_aligner
+
+    return _shared_arpabet_aligner(gap_penalty)
+
+
+def _align(payload: dict) -> dict:
+    aligner = _arpabet_aligner(_gap_penalty(payload, -4))
+    aligned_seq1, aligned_seq2, score = aligner.align(
+        _phonemes(payload, "seq1"), _phonemes(payload, "seq2")
+    )
+    return {"seq1": aligned_seq1, "seq2": aligned_seq2, "score": score}
+
+
+def _align_prediction(payload: dict) -> dict:
+    from cacoepy.aligner import align_prediction_to_annotation_and_target
+
+    prediction, annotation, target = align_prediction_to_annotation_and_target(
+        prediction=_phonemes(payload, "prediction"),
+        annotation_aligned_with_target=_phonemes(payload, "annotation"),
+        target_aligned_with_annotation=_phonemes(payload, "target"),
+        gap_penalty=_gap_penalty(payload, -5),
+    )
+    return {"prediction": prediction, "annotation": annotation, "target": target}
+
+
+def _metrics(payload: dict) -> dict:
+    from cacoepy.metric import mdd_phoneme_metrics
+
+    report = mdd_phoneme_metrics(
+        _phonemes(payload, "target"),
+        _phonemes(payload, "annotation"),
+        _phonemes(payload, "prediction"),
+    )
+    return report.data
+
+
+OPERATIONS: Dict[str, Callable[[dict], dict]] = {
+    "align": _align,
+    "align_prediction": _align_prediction,
+    "metrics": _metrics,
+}
+
+
+def run_batch(operation: str, payloads: Sequence[dict]) -> List[Tuple[bool, object]]:
+    """
+    Runs a batch of requests for one operation in a worker.
+
+    Returns:
+        List[Tuple[bool, object]]: (True, result) or (False, error message) per payload.
+    """
+    func = OPERATIONS[operation]
+    results = []
+    for payload in payloads:
+        try:
+            results.append((True, func(payload)))
+        except ITEM_ERRORS as error:
+            results.append((False, f"{type(error).__name__}: {error}"))
+    return results
+
+
+def _init_worker():
+    # Builds the aligners up front, so the first requests do not pay for them.
+    _arpabet_aligner(-4)
+    _arpabet_aligner(-5)
+
+
+def _ready() -> bool:
+    return True
+
+
+class LatencyStats:
+    """
+    Request counters and latency percentiles per operation, over the most recent
+    `window` requests of each.
+    """
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self.started = time.perf_counter()
+        self.latencies = {}
+        self.requests = {}
+        self.errors = {}
+        self.rejected = 0
+        self.batches = 0
+        self.batched_items = 0
+
+    def record(self, operation: str, seconds: float, ok: bool = True) -> None:
+        if operation not in self.latencies:
+            self.latencies[operation] = deque(maxlen=self.window)
+            self.requests[operation] = 0
+            self.errors[operation] = 0
+        self.latencies[operation].append(seconds)
+        self.requests[operation] += 1
+        if not ok:
+            self.errors[operation] += 1
+
+    def record_batch(self, size: int) -> None:
+        self.batches += 1
+        self.batched_items += size
+
+    def percentiles(self, operation: str) -> Dict[str, float]:
+        """Latency percentiles in milliseconds, e.g. {"p50": 1.2, "p90": 3.4, "p99": 8.0}."""
+        ordered = sorted(self.latencies.get(operation, ()))
+        if not ordered:
+            return {f"p{q}": 0.0 for q in PERCENTILES}
+        return {
+            f"p{q}": 1000 * ordered[min(len(ordered) - 1, len(ordered) * q // 100)]
+            for q in PERCENTILES
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "uptime_seconds": time.perf_counter() - self.started,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_items / self.batches if self.batches else 0.0,
+            "operations": {
+                operation: {
+                    "requests": self.requests[operation],
+                    "errors": self.errors[operation],
+                    "latency_ms": self.percentiles(operation),
+                }
+                for operation in self.latencies
+            },
+        }
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches and runs each batch with one executor
+    call, so a worker round trip is paid per batch rather than per request.
+
+    A batch is dispatched once it holds `max_batch` requests or `max_delay` seconds
+    after its first request, and at most `concurrency` batches run at once. Requests
+    wait in a queue of `max_pending`; when it is full, submit raises ServerBusyError
+    instead of queueing without bound.
+
+    Args:
+        executor (Executor): Runs run_batch(operation, payloads).
+        run (Callable): The batch function, run_batch by default.
+        max_batch (int): Most requests in a batch.
+        max_delay (float): Seconds a request may wait for others to join its batch.
+        max_pending (int): Most requests waiting for a batch.
+        concurrency (int): Most batches running at once, typically the worker count.
+        stats (LatencyStats, optional): Receives the size of every batch.
+    """
+    def __init__(
+            self,
+            executor: Executor,
+            run: Callable = run_batch,
+            max_batch: int = 64,
+            max_delay: float = 0.002,
+            max_pending: int = 1024,
+            concurrency: int = 1,
+            stats: LatencyStats = None,
+        ):
+        self.executor = executor
+        self.run = run
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.concurrency = concurrency
+        self.stats = stats
+        self._queue = None
+        self._slots = None
+        self._dispatcher = None
+        self._running = set()
+
+    def start(self) -> None:
+        """Starts dispatching. Must be called from the event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, operation: str, payload: dict) -> Tuple[bool, object]:
+        """
+        Queues one request and waits for its (ok, result) from run_batch.
+
+        Raises:
+            ServerBusyError: If max_pending requests are already waiting.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((operation, payload, future))
+        except asyncio.QueueFull:
+            raise ServerBusyError(
+                message=f"{self.max_pending} requests are already waiting."
+            ) from None
+        return await future
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            if self.stats is not None:
+                self.stats.record_batch(len(batch))
+            by_operation = {}
+            for operation, payload, future in batch:
+                by_operation.setdefault(operation, []).append((payload, future))
+            for operation, items in by_operation.items():
+                payloads = [payload for payload, _ in items]
+                try:
+                    results = await loop.run_in_executor(
+                        self.executor, self.run, operation, payloads
+                    )
+                except Exception as error:
+                    results = [error] * len(items)
+                for (_, future), result in zip(items, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class AlignmentServer:
+    """
+    A local HTTP/1.1 server for the ARPAbet aligner and MDD metrics, listening on
+    localhost TCP or a Unix socket.
+
+    Endpoints take and return JSON. Phonemes may be lists or space separated strings,
+    and a POST body may be a single request object or a list of them.
+
+    - POST /align: {"seq1", "seq2", "gap_penalty"?} aligned with AlignARPAbet2.
+    - POST /align_prediction: {"prediction", "annotation", "target", "gap_penalty"?}
+      aligned with align_prediction_to_annotation_and_target.
+    - POST /metrics: aligned {"target", "annotation", "prediction"} scored with
+      mdd_phoneme_metrics.
+    - GET /stats: request counts, latency percentiles and batch sizes.
+    - GET /health
+
+    Concurrent requests are micro-batched (see MicroBatcher) onto a pool of worker
+    processes that each build their aligners once. When the queue is full requests get
+    503 with a Retry-After header.
+
+    Args:
+        host (str): Address to listen on for TCP.
+        port (int): TCP port. 0 picks a free port, see `address`.
+        unix_socket (str, optional): Listen on this Unix socket path instead of TCP.
+        workers (int, optional): Worker processes. Defaults to the CPU count. 0 runs
+            batches on a single thread of this process instead.
+        max_batch (int): Most requests per batch.
+        max_delay (float): Seconds a request may wait for a batch to fill.
+        max_pending (int): Most requests queued before new ones are refused.
+    """
+    def __init__(
+            self,
+            host: str = DEFAULT_HOST,
+            port: int = DEFAULT_PORT,
+            unix_socket: str = None,
+            workers: int = None,
+            max_batch: int = 64,
+            max_delay: float = 0.002,
+            max_pending: int = 1024,
+        ):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.stats = LatencyStats()
+        self.batcher = None
+        self._executor = None
+        self._server = None
+
+    async def start(self) -> None:
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, initializer=_init_worker)
+        self.batcher = MicroBatcher(
+            self._executor,
+            max_batch=self.max_batch,
+            max_delay=self.max_delay,
+            max_pending=self.max_pending,
+            concurrency=max(1, self.workers),
+            stats=self.stats,
+        )
+        self.batcher.start()
+        # Worker processes forked while a connection is open would inherit its socket
+        # and keep the client from seeing EOF, so they are all started before listening.
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _ready) for _ in range(max(1, self.workers))
+        ))
+        if self.unix_socket is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    @property
+    def address(self) -> str:
+        """The URL of a running server, e.g. http://127.0.0.1:8765 or unix:/tmp/cacoepy.sock."""
+        if self.unix_socket is not None:
+            return f"unix:{self.unix_socket}"
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.batcher is not None:
+            await self.batcher.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self.unix_socket is not None and os.path.exists(self.unix_socket):
+            os.unlink(self.unix_socket)
+
+    async def __aenter__(self) -> "AlignmentServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = await self._respond(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line, reader, writer) -> bool:
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+        try:
+            method, path, _ = request_line.decode("latin-1").split()
+            length = int(headers.get("content-length", 0))
+            if length > _MAX_BODY:
+                keep_alive = False
+                raise _HTTPError(413, f"Request bodies are limited to {_MAX_BODY} bytes.")
+            body = await reader.readexactly(length) if length else b""
+            status, result, extra_headers = 200, await self._route(method, path, body), {}
+        except _HTTPError as error:
+            status, result, extra_headers = error.status, {"error": str(error)}, error.headers
+        except ValueError:
+            status, result, extra_headers = 400, {"error": "Malformed request."}, {}
+            keep_alive = False
+        except Exception:
+            logger.exception("Failed to handle %r", request_line)
+            status, result, extra_headers = 500, {"error": "Internal server error."}, {}
+            keep_alive = False
+        payload = json.dumps(result).encode()
+        head = [
+            f"HTTP/1.1 {status} {_REASONS[status]}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ] + [f"{name}: {value}" for name, value in extra_headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+        return keep_alive
+
+    async def _route(self, method: str, path: str, body: bytes):
+        path = path.split("?", 1)[0].rstrip("/")
+        if path == "/health":
+            return {"status": "ok", "pending": self.batcher.pending}
+        if path == "/stats":
+            return dict(self.stats.as_dict(), pending=self.batcher.pending)
+        operation = path.lstrip("/")
+        if operation not in OPERATIONS:
+            raise _HTTPError(404, f"Unknown endpoint {path!r}.")
+        if method != "POST":
+            raise _HTTPError(405, f"{path} only accepts POST.")
+        try:
+            request = json.loads(body)
+        except ValueError:
+            raise _HTTPError(400, "The body is not valid JSON.") from None
+        if isinstance(request, list):
+            results = await asyncio.gather(
+                *(self._submit(operation, item) for item in request)
+            )
+            return [result if ok else {"error": result} for ok, result in results]
+        ok, result = await self._submit(operation, request)
+        if not ok:
+            raise _HTTPError(422, result)
+        return result
+
+    async def _submit(self, operation: str, payload) -> Tuple[bool, object]:
+        start = time.perf_counter()
+        if not isinstance(payload, dict):
+            return False, "Each request must be a JSON object."
+        try:
+            ok, result = await self.batcher.submit(operation, payload)
+        except ServerBusyError as error:
+            self.stats.rejected += 1
+            raise _HTTPError(503, str(error), {"Retry-After": "1"}) from None
+        self.stats.record(operation, time.perf_counter() - start, ok)
+        return ok, result
+
+
+def serve(**kwargs) -> None:
+    """
+    Runs an AlignmentServer until interrupted, then prints its stats. Takes the
+    arguments of AlignmentServer.
+    """
+    async def main():
+        server = AlignmentServer(**kwargs)
+        await server.start()
+        print(f"cacoepy serving on {server.address} with {server.workers} workers", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            print(json.dumps(server.stats.as_dict(), indent=2), flush=True)
+            await server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
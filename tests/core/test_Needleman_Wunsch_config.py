@@ -24,3 +24,95 @@ def test_incorrect_similarity_function():
         NeedlemanWunschConfig(
             gap_penalty=-4, similarity=incorrect_similarity_function2
         )
+
+
+def test_dict_similarity_is_compiled():
+    similarity = {"a": {"a": 2, "b": -1}, "b": {"a": -3, "b": 2, "c": 1}}
+    config = NeedlemanWunschConfig(gap_penalty=-4, similarity=similarity)
+    score_table = config.score_table(list("abx"))
+    assert score_table is config.score_table()
+    codes = score_table.encode(list("abcx"))
+    for a, code_a in zip("abcx", codes):
+        for b, code_b in zip("abcx", codes):
+            expected = config._apply_scoring(a, b)
+            assert score_table.table[code_a, code_b] == expected
+
+
+def test_callable_similarity_is_tabulated_over_inputs():
+    calls = []
+
+    def similarity_function(a, b):
+        calls.append((a, b))
+        return 1 if a == b else -1
+
+    config = NeedlemanWunschConfig(gap_penalty=-1, similarity=similarity_function)
+    score_table = config.score_table(list("abab"), list("bca"))
+    assert score_table.symbols == ["a", "b", "c"]
+    assert len(calls) == 9
+    codes = score_table.encode(list("cab"))
+    assert score_table.table[codes[0], codes[0]] == 1
+    assert score_table.table[codes[1], codes[2]] == -1
+
+
+def test_pure_callable_is_evaluated_once_per_pair():
+    calls = []
+
+    def similarity_function(a, b):
+        calls.append((a, b))
+        return {("a", "a"): 2, ("c", "a"): 0.5}.get((a, b), 1 if a == b else -1)
+
+    config = NeedlemanWunschConfig(gap_penalty=-1, similarity=similarity_function)
+    first = config.score_table(list("ab"), list("ba"))
+    assert config.score_table(list("a"), list("b")) is first
+    assert len(calls) == 4
+
+    score_table = config.score_table(list("cab"), list("b"))
+    assert len(calls) == 9
+    assert score_table.symbols == ["a", "b", "c"]
+    assert score_table.table.dtype.kind == "f"
+    for a in "abc":
+        for b in "abc":
+            expected = similarity_function(a, b)
+            assert score_table.table[score_table.codes[a], score_table.codes[b]] == expected
+
+    reset = NeedlemanWunschConfig(gap_penalty=-1, similarity=similarity_function, max_symbols=2)
+    reset.score_table(list("ab"))
+    assert reset.score_table(list("c")).symbols == ["c"]
+
+
+def test_impure_callable_is_tabulated_every_call():
+    from cacoepy.core.cache import AlignmentCache
+    from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D
+
+    calls = []
+
+    def similarity_function(a, b):
+        calls.append((a, b))
+        return 1 if a == b else -1
+
+    config = NeedlemanWunschConfig(gap_penalty=-1, similarity=similarity_function, pure=False)
+    cache = AlignmentCache()
+    aligner = NeedlemanWunsch2D(config, cache=cache)
+    assert aligner(list("ab"), list("b")) == aligner(list("ab"), list("b"))
+    assert len(calls) == 8
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("engine", ["python", "vectorized"])
+def test_score_type_does_not_depend_on_earlier_inputs(engine):
+    from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D
+    from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch2DVectorized
+
+    def similarity_function(a, b):
+        if "z" in (a, b):
+            return 1.5
+        return 1 if a == b else -1
+
+    config = NeedlemanWunschConfig(gap_penalty=-1, similarity=similarity_function)
+    aligner = (NeedlemanWunsch2D if engine == "python" else NeedlemanWunsch2DVectorized)(config)
+    first = aligner(list("ab"), list("ab"))
+    assert aligner(list("az"), list("az"))[2] == 2.5
+    again = aligner(list("ab"), list("ab"))
+    assert again == first and type(again[2]) is type(first[2])
+    assert config.score_table(list("ab")).table.dtype.kind == "i"
+    assert config.score_table(list("az")).table.dtype.kind == "f"
@@ -0,0 +1,39 @@
+import random
+import pytest
+from cacoepy.aligner import AlignARPAbet2
+from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D, NeedlemanWunschConfig, _workspace
+from cacoepy.core.Needleman_Wunsch_jit import NeedlemanWunsch2DJit
+
+
+def make_config(gap, match=1, mismatch=-1):
+    def similarity_function(a, b):
+        return match if a == b else mismatch
+
+    return NeedlemanWunschConfig(gap_penalty=gap, similarity=similarity_function)
+
+
+@pytest.mark.parametrize("gap, match, mismatch", [(-1, 1, -1), (0, 2, 0), (-0.5, 0.7, -0.3)])
+def test_matches_python_engine(gap, match, mismatch):
+    """The kernels must reproduce the scalar engine exactly, compiled or not."""
+    rng = random.Random(0)
+    config = make_config(gap=gap, match=match, mismatch=mismatch)
+    for _ in range(100):
+        seq1 = [rng.choice("abcd") for _ in range(rng.randint(0, 12))]
+        seq2 = [rng.choice("abcd") for _ in range(rng.randint(0, 12))]
+        expected = NeedlemanWunsch2D(config)(seq1, seq2)
+        assert NeedlemanWunsch2DJit(config)(seq1, seq2) == expected, f"{seq1=} {seq2=}"
+
+
+def test_path_matches_python_engine():
+    config = make_config(gap=-1)
+    python_engine = _workspace(NeedlemanWunsch2D(config))
+    jit_engine = _workspace(NeedlemanWunsch2DJit(config))
+    python_engine._call(list("abcab"), list("acb"))
+    jit_engine._call(list("abcab"), list("acb"))
+    assert jit_engine._path_idx == python_engine._path_idx
+
+
+def test_jit_engine_option():
+    seq1 = "th er m aa m ah t er".split()
+    seq2 = "th er m aa t ah".split()
+    assert AlignARPAbet2(engine="jit")(seq1, seq2) == AlignARPAbet2()(seq1, seq2)
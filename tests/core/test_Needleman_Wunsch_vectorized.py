@@ -0,0 +1,130 @@
+import random
+import pytest
+from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D, NeedlemanWunschConfig
+from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch2DVectorized
+
+
+def make_config(gap, match=1, mismatch=-1):
+    def similarity_function(a, b):
+        return match if a == b else mismatch
+
+    return NeedlemanWunschConfig(gap_penalty=gap, similarity=similarity_function)
+
+
+def test_matches_python_engine_on_random_sequences():
+    """
+    The vectorized engine must return exactly the same alignments and scores,
+    including tie-breaking.
+    """
+    rng = random.Random(0)
+    for _ in range(200):
+        seq1 = [rng.choice("abcd") for _ in range(rng.randint(0, 15))]
+        seq2 = [rng.choice("abcd") for _ in range(rng.randint(0, 15))]
+        config = make_config(gap=rng.randint(-3, 1), match=rng.randint(0, 3))
+        expected = NeedlemanWunsch2D(config)(seq1, seq2)
+        got = NeedlemanWunsch2DVectorized(config)(seq1, seq2)
+        assert got == expected, f"{seq1=} {seq2=}"
+
+
+def test_float_scores_match_python_engine():
+    config = make_config(gap=-0.1, match=0.7, mismatch=-0.3)
+    seq1 = list("AGCTTGACCA")
+    seq2 = list("AGCTGATCA")
+    expected = NeedlemanWunsch2D(config)(seq1, seq2)
+    got = NeedlemanWunsch2DVectorized(config)(seq1, seq2)
+    assert got == expected
+
+
+@pytest.mark.parametrize("mode", NeedlemanWunsch2D.MODES)
+def test_score_type_is_the_same_for_every_engine(mode):
+    from cacoepy.core.Needleman_Wunsch_jit import NeedlemanWunsch2DJit
+
+    # "c" has a float score, but neither input uses it.
+    similarity = {"a": {"a": 2, "b": -1}, "b": {"a": -1, "b": 2}, "c": {"c": 0.5}}
+    cases = [(similarity, -2, ("a", "b"), int), (similarity, -2.0, ("a", "b"), int),
+             (similarity, -2.5, ("a", "b"), float), (similarity, -2, ("a", "c"), float)]
+    for similarity, gap, alphabet, score_type in cases:
+        config = NeedlemanWunschConfig(gap_penalty=gap, similarity=similarity)
+        seq1 = list(alphabet * 4)
+        seq2 = list(alphabet[::-1] * 3)
+        expected = NeedlemanWunsch2D(config)(seq1, seq2)
+        assert type(expected[2]) is score_type
+        for engine in (NeedlemanWunsch2D, NeedlemanWunsch2DVectorized, NeedlemanWunsch2DJit):
+            aligner = engine(config, mode=mode)
+            got = aligner(seq1, seq2)
+            assert got == expected and type(got[2]) is score_type
+            assert type(aligner.score(seq1, seq2)) is score_type
+            assert type(aligner.align(seq1, seq2).score) is score_type
+
+
+def test_dict_similarity():
+    similarity = {"a": {"a": 2, "b": -1}, "b": {"a": -1, "b": 2}}
+    config = NeedlemanWunschConfig(gap_penalty=-2, similarity=similarity)
+    seq1 = list("abba")
+    seq2 = list("aba")
+    assert NeedlemanWunsch2DVectorized(config)(seq1, seq2) == NeedlemanWunsch2D(
+        config
+    )(seq1, seq2)
+
+
+@pytest.mark.parametrize("seq1, seq2", [([], []), (list("abc"), []), ([], list("abc"))])
+def test_empty_sequences(seq1, seq2):
+    config = make_config(gap=-1)
+    expected = NeedlemanWunsch2D(config)(seq1, seq2)
+    assert NeedlemanWunsch2DVectorized(config)(seq1, seq2) == expected
+
+
+def test_score_only_matches_full_alignment():
+    rng = random.Random(1)
+    for gap, match, mismatch in [(-1, 1, -1), (-2, 3, 0), (-0.5, 0.7, -0.3)]:
+        config = make_config(gap=gap, match=match, mismatch=mismatch)
+        for _ in range(50):
+            seq1 = [rng.choice("abcd") for _ in range(rng.randint(0, 12))]
+            seq2 = [rng.choice("abcd") for _ in range(rng.randint(0, 12))]
+            _, _, expected = NeedlemanWunsch2D(config)(seq1, seq2)
+            assert NeedlemanWunsch2D(config).score(seq1, seq2) == expected
+            assert NeedlemanWunsch2DVectorized(config).score(seq1, seq2) == expected
+
+
+@pytest.mark.parametrize("engine", [NeedlemanWunsch2D, NeedlemanWunsch2DVectorized])
+def test_hirschberg_matches_full_alignment(engine):
+    rng = random.Random(2)
+    for gap, match, mismatch in [(-1, 1, -1), (0, 1, -1), (-2, 3, 0), (-0.5, 0.7, -0.3)]:
+        config = make_config(gap=gap, match=match, mismatch=mismatch)
+        for _ in range(60):
+            seq1 = [rng.choice("abc") for _ in range(rng.randint(0, 14))]
+            seq2 = [rng.choice("abc") for _ in range(rng.randint(0, 14))]
+            expected = NeedlemanWunsch2D(config)(seq1, seq2)
+            got = engine(config, mode="hirschberg")(seq1, seq2)
+            assert got == expected, f"{seq1=} {seq2=} {gap=}"
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        NeedlemanWunsch2D(make_config(gap=-1), mode="quadratic")
+
+
+@pytest.mark.parametrize("engine", [NeedlemanWunsch2D, NeedlemanWunsch2DVectorized])
+def test_banded_matches_full_alignment(engine):
+    rng = random.Random(3)
+    for gap, match, mismatch in [(-1, 1, -1), (1, 1, -1), (-2, 3, 0), (-0.5, 0.7, -0.3)]:
+        config = make_config(gap=gap, match=match, mismatch=mismatch)
+        for band in (0, 1, 3):
+            for _ in range(40):
+                seq1 = [rng.choice("abc") for _ in range(rng.randint(0, 16))]
+                seq2 = [rng.choice("abc") for _ in range(rng.randint(0, 16))]
+                expected = NeedlemanWunsch2D(config)(seq1, seq2)
+                got = engine(config, mode="banded", band=band)(seq1, seq2)
+                assert got == expected, f"{seq1=} {seq2=} {gap=} {band=}"
+
+
+@pytest.mark.parametrize("engine", [NeedlemanWunsch2D, NeedlemanWunsch2DVectorized])
+def test_fixed_band_stays_inside_band(engine):
+    config = make_config(gap=-1)
+    seq1 = list("aaaabbbb")
+    seq2 = list("bbbbcccc")
+    aligner = engine(config, mode="banded", band=0, widen_band=False)
+    aligned_seq1, aligned_seq2, score = aligner(seq1, seq2)
+    assert (aligned_seq1, aligned_seq2) == (seq1, seq2)
+    assert score == -8
+    assert NeedlemanWunsch2D(config)(seq1, seq2)[2] == -4
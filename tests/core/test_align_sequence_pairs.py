@@ -1,5 +1,5 @@
 import pytest
-from cacoepy.core.aligner_tools import align_sequence_pairs
+from cacoepy.core.aligner_tools import align_sequence_pairs, merge_alignments
 from cacoepy.core.exceptions import AlignSequencePairError
 
 
@@ -96,3 +96,36 @@ def test_refb_much_shorter():
     assert exp_c == c, f"Expected: {exp_c}, \n     Got: {c}"
 
 
+
+
+def test_merge_alignments_three_pairs():
+    ref_a = "a - a a".split(" ")
+    partner_a = "x y - x".split(" ")
+    ref_b = "- a a - a".split(" ")
+    partner_b = "w z z - z".split(" ")
+    ref_c = "a a - a -".split(" ")
+    partner_c = "q q q q q".split(" ")
+    merged = merge_alignments([(ref_a, partner_a), (ref_b, partner_b), (ref_c, partner_c)])
+
+    assert merged[0] == "- a - a - a -".split(" ")
+    assert merged[1] == "- x y - - x -".split(" ")
+    assert merged[2] == "w z - z - z -".split(" ")
+    assert merged[3] == "- q - q q q q".split(" ")
+
+
+def test_merge_alignments_matches_align_sequence_pairs():
+    ref_a = "- a - a - a -".split(" ")
+    partner_a = "- x - x - x -".split(" ")
+    ref_b = "- - - a - - - - a - - - - a - - -".split(" ")
+    partner_b = "- - - z - - - - z - - - - z - - -".split(" ")
+    expected = align_sequence_pairs(ref_a, partner_a, ref_b, partner_b)
+    assert tuple(merge_alignments([(ref_a, partner_a), (ref_b, partner_b)])) == expected
+
+
+def test_merge_alignments_reference_mismatch():
+    with pytest.raises(AlignSequencePairError):
+        merge_alignments([("a b".split(" "), "x x".split(" ")), ("a".split(" "), "x".split(" "))])
+
+
+def test_merge_alignments_empty():
+    assert merge_alignments([([], []), ([], [])]) == [[], [], []]
@@ -0,0 +1,77 @@
+import random
+import pytest
+from cacoepy.aligner import AlignARPAbet2, AlignBasic2
+from cacoepy.core.alignment import Alignment
+from cacoepy.core.cache import AlignmentCache
+from cacoepy.core.exceptions import ElementNotInVocabError
+from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D, NeedlemanWunschConfig
+from cacoepy.core.Needleman_Wunsch_jit import NeedlemanWunsch2DJit
+from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch2DVectorized
+from cacoepy.core.phoneme_sequence import PhonemeSequence
+
+
+def make_config(gap=-1):
+    def similarity_function(a, b):
+        return 1 if a == b else -1
+
+    return NeedlemanWunschConfig(gap_penalty=gap, similarity=similarity_function)
+
+
+def test_from_aligned_runs():
+    alignment = Alignment.from_aligned(list("ab-cdd"), list("abxc--"), 3)
+    assert alignment.cigar() == "2=1I1=2D"
+    assert alignment.index1.tolist() == [0, 2, 2, 3]
+    assert alignment.index2.tolist() == [0, 2, 3, 4]
+    assert alignment.counts() == {"match": 3, "substitute": 0, "insert": 1, "delete": 2}
+    assert len(alignment) == 6
+    assert alignment.aligned() == (list("ab-cdd"), list("abxc--"))
+    assert alignment == (list("ab-cdd"), list("abxc--"), 3)
+
+
+def test_unpacks_like_tuple():
+    aligned_seq1, aligned_seq2, score = Alignment.from_aligned(list("ab"), list("ac"), 0)
+    assert aligned_seq1 == ["a", "b"]
+    assert aligned_seq2 == ["a", "c"]
+    assert score == 0
+
+
+def test_invalid_columns():
+    with pytest.raises(ValueError):
+        Alignment.from_aligned(["a", "-"], ["a", "-"], 0)
+    with pytest.raises(ValueError):
+        Alignment.from_aligned(["a"], ["a", "b"], 0)
+    with pytest.raises(ValueError):
+        Alignment.from_moves([3], list("ab"), list("a"), 0)
+
+
+@pytest.mark.parametrize("engine", [NeedlemanWunsch2D, NeedlemanWunsch2DVectorized, NeedlemanWunsch2DJit])
+@pytest.mark.parametrize("mode", ["full", "hirschberg", "banded"])
+def test_align_matches_call(engine, mode):
+    rng = random.Random(1)
+    config = make_config()
+    aligner = engine(config, mode=mode)
+    cached = engine(config, mode=mode, cache=AlignmentCache())
+    for _ in range(50):
+        seq1 = [rng.choice("abc") for _ in range(rng.randint(0, 10))]
+        seq2 = [rng.choice("abc") for _ in range(rng.randint(0, 10))]
+        expected = NeedlemanWunsch2D(config)(seq1, seq2)
+        assert aligner.align(seq1, seq2) == expected, f"{seq1=} {seq2=}"
+        assert cached.align(seq1, seq2) == expected, f"{seq1=} {seq2=}"
+
+
+def test_empty_sequences():
+    alignment = NeedlemanWunsch2D(make_config()).align([], [])
+    assert alignment.cigar() == ""
+    assert tuple(alignment) == ([], [], 0)
+    assert AlignBasic2().align([], list("ab")).cigar() == "2I"
+
+
+def test_arpabet_align():
+    seq1 = "th er m aa m ah t er".split()
+    seq2 = "th er m aa t ah".split()
+    aligner = AlignARPAbet2(engine="numpy")
+    alignment = aligner.align(PhonemeSequence.from_phonemes(seq1), PhonemeSequence.from_phonemes(seq2))
+    assert alignment == AlignARPAbet2()(seq1, seq2)
+    assert aligner.score == alignment.score
+    with pytest.raises(ElementNotInVocabError):
+        aligner.align(["zz"], seq2)
@@ -0,0 +1,46 @@
+from cacoepy.aligner import AlignARPAbet2, AlignBasic2
+from cacoepy.core.cache import AlignmentCache
+from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D, NeedlemanWunschConfig
+
+
+def similarity_function(a, b):
+    return 1 if a == b else -1
+
+
+def test_lru_eviction_and_counters():
+    cache = AlignmentCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.evictions, stats.size) == (2, 1, 1, 2)
+
+
+def test_cached_alignment_is_identical_and_not_shared():
+    cache = AlignmentCache(maxsize=10)
+    config = NeedlemanWunschConfig(gap_penalty=-1, similarity=similarity_function)
+    aligner = NeedlemanWunsch2D(config, cache=cache)
+    seq1, seq2 = list("AGCTTGA"), list("AGCTGA")
+    first = aligner(seq1, seq2)
+    first[0].append("mutated")
+    second = aligner(seq1, seq2)
+    assert second == NeedlemanWunsch2D(config)(seq1, seq2)
+    assert cache.stats.hits == 1 and cache.stats.misses == 1
+
+
+def test_key_includes_config():
+    cache = AlignmentCache()
+    seq1 = "dh ah m".split(" ")
+    seq2 = "d iy ah m".split(" ")
+    strict = AlignARPAbet2(gap_penalty=-1, cache=cache)
+    loose = AlignARPAbet2(gap_penalty=-4, cache=cache)
+    basic = AlignBasic2(cache=cache)
+    assert strict(seq1, seq2) == AlignARPAbet2(gap_penalty=-1)(seq1, seq2)
+    assert loose(seq1, seq2) == AlignARPAbet2(gap_penalty=-4)(seq1, seq2)
+    assert basic(seq1, seq2) == AlignBasic2()(seq1, seq2)
+    assert cache.stats.misses == 3
+    AlignARPAbet2(gap_penalty=-4, cache=cache)(seq1, seq2)
+    assert cache.stats.hits == 1
@@ -0,0 +1,106 @@
+import pickle
+import pytest
+from cacoepy.aligner import AlignARPAbet3, AlignBasic2
+from cacoepy.core.Needleman_Wunsch import NeedlemanWunsch2D, NeedlemanWunschConfig
+from cacoepy.core.Needleman_Wunsch_vectorized import NeedlemanWunsch2DVectorized
+from cacoepy.core.cache import AlignmentCache
+from cacoepy.core.instrumentation import AlignmentStats
+
+
+def similarity_function(a, b):
+    return 1 if a == b else -1
+
+
+def make_config():
+    return NeedlemanWunschConfig(gap_penalty=-1, similarity=similarity_function)
+
+
+@pytest.mark.parametrize("engine", [NeedlemanWunsch2D, NeedlemanWunsch2DVectorized])
+def test_full_mode_event(engine):
+    events = []
+    aligner = engine(make_config(), listeners=[events.append])
+    result = aligner(list("abcab"), list("abc"))
+    assert result == NeedlemanWunsch2D(make_config())(list("abcab"), list("abc"))
+
+    (event,) = events
+    assert event.engine == engine.__name__
+    assert event.mode == "full"
+    assert event.lengths == (5, 3)
+    assert set(event.timings) == {"init", "fill", "traceback"}
+    assert event.cells == 15
+    assert event.similarity_lookups == 15
+    assert event.similarity_calls == 9
+    assert event.matrix_bytes > 0
+    assert event.cache_hit is None
+    assert event.seconds >= sum(event.timings.values())
+
+    # The symbols were tabulated by the first call, and "d" only adds a row and column.
+    aligner(list("cab"), list("ba"))
+    aligner(list("abd"), list("ba"))
+    assert [event.similarity_calls for event in events[1:]] == [0, 7]
+
+
+@pytest.mark.parametrize("mode", ["hirschberg", "banded"])
+def test_other_modes_count_cells(mode):
+    events = []
+    aligner = NeedlemanWunsch2D(make_config(), mode=mode, band=1, listeners=[events.append])
+    aligner(list("abcabcab"), list("abcbca"))
+    assert events[0].mode == mode
+    assert events[0].cells > 0
+    assert "fill" in events[0].timings
+
+
+def test_score_only_event():
+    events = []
+    aligner = NeedlemanWunsch2D(make_config(), listeners=[events.append])
+    aligner.score(list("abcab"), list("abc"))
+    assert events[0].mode == "score"
+    assert events[0].cells == 15
+
+
+def test_cache_hits():
+    aligner = NeedlemanWunsch2D(make_config(), cache=AlignmentCache())
+    stats = aligner.add_listener(AlignmentStats())
+    for _ in range(3):
+        aligner(list("abc"), list("abd"))
+    assert (stats.calls, stats.cache_hits, stats.cache_misses) == (3, 2, 1)
+    assert stats.cells == 9
+
+
+def test_stats_aggregate_and_reset():
+    aligner = AlignBasic2()
+    stats = aligner.add_listener(AlignmentStats())
+    aligner(list("abc"), list("ab"))
+    aligner(list("abcd"), list("abcd"))
+    assert stats.calls == 2
+    assert stats.cells == 6 + 16
+    assert stats.cells_per_second > 0
+    assert stats.as_dict()["calls"] == 2
+    stats.reset()
+    assert stats.calls == 0
+
+
+def test_remove_listener():
+    events = []
+    aligner = NeedlemanWunsch2D(make_config())
+    aligner.add_listener(events.append)
+    aligner(list("ab"), list("ab"))
+    aligner.remove_listener(events.append)
+    aligner(list("ab"), list("ab"))
+    assert len(events) == 1
+
+
+def test_three_way_event():
+    aligner = AlignARPAbet3()
+    stats = aligner.add_listener(AlignmentStats())
+    aligner("th er".split(), "th".split(), "er".split())
+    assert stats.calls == 1
+    assert stats.cells == 3 * 2 * 2 - 1
+
+
+def test_instrumented_aligner_pickles():
+    aligner = AlignBasic2()
+    stats = aligner.add_listener(AlignmentStats())
+    aligner(list("abc"), list("ab"))
+    copy = pickle.loads(pickle.dumps(aligner))
+    assert copy(list("abc"), list("ab")) == aligner(list("abc"), list("ab"))
@@ -0,0 +1,54 @@
+import random
+import numpy as np
+import pytest
+from cacoepy.core.Needleman_Wunsch import (
+    NeedlemanWunsch2D,
+    NeedlemanWunsch3D,
+    NeedlemanWunschConfig,
+    _workspace,
+)
+from cacoepy.core.packed_trace import PackedTrace
+
+
+@pytest.mark.parametrize("shape, bits", [((5, 7), 2), ((4, 3, 11), 3), ((1, 1), 2), ((2, 9), 8)])
+def test_set_and_get(shape, bits):
+    rng = random.Random(0)
+    trace = PackedTrace(shape, bits)
+    expected = np.zeros(shape, dtype=np.uint8)
+    for index in np.ndindex(*shape):
+        code = rng.randrange(1 << bits)
+        trace[index] = code
+        expected[index] = code
+    assert trace.unpack().tolist() == expected.tolist()
+    assert all(trace[index] == expected[index] for index in np.ndindex(*shape))
+    # Overwriting a cell leaves its neighbours alone.
+    trace[(0,) * len(shape)] = 0
+    expected[(0,) * len(shape)] = 0
+    assert (trace.unpack() == expected).all()
+
+
+def test_set_row_and_cells():
+    trace = PackedTrace((3, 10), bits=3)
+    trace.set_row((0,), list(range(8)) + [7, 1])
+    trace.set_cells((np.array([1, 2]), np.array([9, 5])), np.array([6, 3]))
+    assert trace.tolist()[0] == list(range(8)) + [7, 1]
+    assert trace[1, 9] == 6
+    assert trace[2, 5] == 3
+    assert trace.decode("abcdefgh")[2][5] == "d"
+
+
+def test_trace_memory():
+    trace = PackedTrace((1001, 1001), bits=2)
+    assert trace.nbytes < 1001 * 1001 // 3
+    with pytest.raises(ValueError):
+        PackedTrace((2, 2), bits=9)
+
+
+def test_engines_store_packed_traces():
+    config = NeedlemanWunschConfig(gap_penalty=-1, similarity=lambda a, b: 1 if a == b else -1)
+    workspace = NeedlemanWunsch2D(config).align(list("abcab"), list("acb"), keep_matrices=True).workspace
+    assert isinstance(workspace.trace_matrix, PackedTrace)
+    assert workspace.trace_matrix.bits == 2
+    workspace = _workspace(NeedlemanWunsch3D(config))
+    workspace._align(list("abc"), list("ac"), list("bc"))
+    assert workspace.trace_matrix.bits == 3
@@ -0,0 +1,67 @@
+import pytest
+from cacoepy.aligner import AlignARPAbet2, align_prediction_to_annotation_and_target
+from cacoepy.core.exceptions import ElementNotInVocabError
+from cacoepy.core.phoneme_sequence import (
+    PhonemeAlphabet,
+    PhonemeSequence,
+    normalise_phoneme,
+)
+
+
+def test_normalise_phoneme():
+    assert normalise_phoneme("AH0") == "ah"
+    assert normalise_phoneme(" ER1 ") == "er"
+    assert normalise_phoneme("ax") == "ah"
+
+
+def test_from_string_normalises_and_round_trips():
+    seq = PhonemeSequence.from_string("TH ER1 M AX")
+    assert seq.tolist() == ["th", "er", "m", "ah"]
+    assert seq == ["th", "er", "m", "ah"]
+    assert len(seq) == 4
+    assert seq[1] == "er"
+    assert seq[1:3] == ["er", "m"]
+
+
+def test_phoneme_not_in_vocab():
+    with pytest.raises(ElementNotInVocabError):
+        PhonemeSequence.from_phonemes(["th", "zz"])
+
+
+def test_without_gaps():
+    seq = PhonemeSequence.from_phonemes(["th", "-", "er", "-"])
+    assert seq.has_gaps()
+    assert seq.without_gaps() == ["th", "er"]
+    assert not seq.without_gaps().has_gaps()
+
+
+def test_custom_alphabet():
+    alphabet = PhonemeAlphabet(["a", "b"], gap="_")
+    seq = PhonemeSequence.from_phonemes(["a", "_", "b"], alphabet=alphabet, normalise=False)
+    assert seq.codes.tolist() == [0, 2, 1]
+    assert str(seq) == "a _ b"
+
+
+def test_aligner_accepts_phoneme_sequences():
+    aligner = AlignARPAbet2()
+    seq1 = "th er m aa m ah t er".split()
+    seq2 = "th er m aa t ah".split()
+    expected = aligner(seq1, seq2)
+    got = aligner(PhonemeSequence.from_phonemes(seq1), PhonemeSequence.from_phonemes(seq2))
+    assert got == expected
+    assert aligner.score_only(
+        PhonemeSequence.from_phonemes(seq1), PhonemeSequence.from_phonemes(seq2)
+    ) == expected[2]
+
+
+def test_prediction_alignment_accepts_phoneme_sequences():
+    annotation = "th er - m aa m ah t er".split()
+    target = "th er m m aa m ah t er".split()
+    prediction = "th er m aa t ah".split()
+    expected = align_prediction_to_annotation_and_target(prediction, annotation, target)
+    got = align_prediction_to_annotation_and_target(
+        PhonemeSequence.from_phonemes(prediction),
+        PhonemeSequence.from_phonemes(annotation),
+        PhonemeSequence.from_phonemes(target),
+    )
+    assert [list(x) for x in got] == [list(x) for x in expected]
@@ -0,0 +1,61 @@
+import pickle
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from cacoepy.aligner import AlignARPAbet2, AlignARPAbet3
+from cacoepy.core.ARPAbet_similarity_matrix import arpabet_vocab
+from cacoepy.core.cache import AlignmentCache
+
+
+def random_pairs(count, seed=0):
+    rng = random.Random(seed)
+    vocab = list(arpabet_vocab())
+    return [
+        (
+            [rng.choice(vocab) for _ in range(rng.randint(0, 15))],
+            [rng.choice(vocab) for _ in range(rng.randint(0, 15))],
+        )
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy", "jit"])
+@pytest.mark.parametrize("mode", ["full", "hirschberg", "banded"])
+def test_shared_aligner_across_threads(engine, mode):
+    pairs = random_pairs(200)
+    expected = [AlignARPAbet2()(*pair) for pair in pairs]
+    aligner = AlignARPAbet2(engine=engine, mode=mode, cache=AlignmentCache(maxsize=50))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda pair: aligner(*pair), pairs))
+    assert results == expected
+
+
+def test_no_state_kept_between_calls():
+    aligner = AlignARPAbet2()
+    engine = aligner._needleman_wunsch2d
+    attributes = set(engine.__dict__)
+    for pair in random_pairs(20):
+        aligner(*pair)
+        aligner.align(*pair)
+        aligner.score_only(*pair)
+    assert set(engine.__dict__) == attributes
+    assert str(aligner) == "NeedlemanWunsch2D(mode='full', gap_penalty=-4)"
+    aligner3 = AlignARPAbet3()
+    aligner3("th er m".split(), "th er".split(), "er m".split())
+    assert "trace_matrix" not in aligner3._needleman_wunsch3d.__dict__
+
+
+def test_score_is_per_thread():
+    aligner = AlignARPAbet2()
+    _, _, score = aligner("th er m aa".split(), "th er m aa".split())
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(lambda: aligner.score).result() is None
+    assert aligner.score == score
+    assert pickle.loads(pickle.dumps(aligner)).score is None
+
+
+def test_keep_matrices():
+    alignment = AlignARPAbet2().align("th er m".split(), "th m".split(), keep_matrices=True)
+    assert "↖" in str(alignment)
+    alignment.workspace = None
+    assert str(alignment) == "th  er  m\nth  -   m"
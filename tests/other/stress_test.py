@@ -20,7 +20,8 @@ def generate_random_aligner():
         return random.randint(-10, 10)
 
     gap = random.randint(-10, 10)
-    config = NeedlemanWunschConfig(gap_penalty=gap, similarity=similarity_function)
+    # The scores are random, so the config must not keep them between alignments.
+    config = NeedlemanWunschConfig(gap_penalty=gap, similarity=similarity_function, pure=False)
     return NeedlemanWunsch2D(config)
 
 
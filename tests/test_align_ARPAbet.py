@@ -38,3 +38,34 @@ def test_correct_output():
         assert (
             out_seq2 == exp_seq2
         ), f"CASE {i}:\nExpected: {exp_seq2}, \n     Got: {out_seq2}"
+
+
+def test_score_only():
+    aligner = AlignARPAbet2()
+    seq1 = "th er m aa m ah t er".split(" ")
+    seq2 = "uw ao m eh d er".split(" ")
+    _, _, score = aligner(seq1, seq2)
+    assert aligner.score_only(seq1, seq2) == score
+
+    with pytest.raises(ElementNotInVocabError):
+        aligner.score_only(seq1, ["x"])
+
+
+def test_shipped_similarity_table_is_up_to_date():
+    from cacoepy.core.ARPAbet_similarity_matrix import (
+        arpabet_similarity_table,
+        build_arpabet_similarity_table,
+    )
+
+    phonemes, table = arpabet_similarity_table()
+    expected_phonemes, expected_table = build_arpabet_similarity_table()
+    assert phonemes == expected_phonemes
+    assert (table == expected_table).all()
+
+
+def test_aligners_share_similarity_data(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    a, b = AlignARPAbet2(gap_penalty=-4), AlignARPAbet2(gap_penalty=-2)
+    assert a.similarity_matrix == b.similarity_matrix
+    assert a.similarity_matrix is not b.similarity_matrix
+    assert a._config.score_table() is b._config.score_table()
@@ -0,0 +1,36 @@
+import random
+import pytest
+from cacoepy.aligner import AlignARPAbet2, AlignARPAbet3
+from cacoepy.core.exceptions import ElementNotInVocabError
+
+
+def test_identical_sequences():
+    seq = "th er m aa m ah t er".split(" ")
+    for engine in ("python", "numpy"):
+        a, b, c, score = AlignARPAbet3(engine=engine)(seq, seq, seq)
+        assert a == b == c == seq
+        assert score > 0
+
+
+def test_deleted_phoneme():
+    target = "th er m aa m ah t er".split(" ")
+    annotation = "th er m aa m ah er".split(" ")
+    prediction = "th er m aa m ah t er".split(" ")
+    a, b, c, _ = AlignARPAbet3()(target, annotation, prediction)
+    assert a == target
+    assert b == "th er m aa m ah - er".split(" ")
+    assert c == prediction
+
+
+def test_engines_agree():
+    vocab = AlignARPAbet2().ARPABet_vocab
+    rng = random.Random(0)
+    python, numpy = AlignARPAbet3(), AlignARPAbet3(engine="numpy")
+    for _ in range(20):
+        seqs = [[rng.choice(vocab) for _ in range(rng.randint(0, 6))] for _ in range(3)]
+        assert python(*seqs) == numpy(*seqs)
+
+
+def test_phoneme_not_in_vocab():
+    with pytest.raises(ElementNotInVocabError):
+        AlignARPAbet3()(["y"], ["x"], ["y"])
@@ -0,0 +1,44 @@
+from cacoepy.aligner import AlignARPAbet2, AlignBasic2
+from cacoepy.core.exceptions import ElementNotInVocabError
+
+
+PAIRS = [
+    ("dh ah m".split(" "), "d iy ah m".split(" ")),
+    ("d ay n ah s ao r".split(" "), "d ih k ow".split(" ")),
+    ("y ow y x".split(" "), "y ow".split(" ")),
+    ("th er m aa m ah t er".split(" "), "uw ao m eh d er".split(" ")),
+]
+
+
+def test_align_many_matches_serial_calls():
+    aligner = AlignARPAbet2()
+    results = aligner.align_many(PAIRS, workers=2, chunksize=1)
+
+    assert [r.index for r in results] == list(range(len(PAIRS)))
+    for result, (seq1, seq2) in zip(results, PAIRS):
+        if "x" in seq1:
+            assert not result.ok
+            assert isinstance(result.error, ElementNotInVocabError)
+        else:
+            assert result.ok
+            assert result.result == AlignARPAbet2()(seq1, seq2)
+
+
+def test_align_many_serial_equals_parallel():
+    pairs = [(list(a), list(b)) for a, b in [("abc", "abd"), ("", "xy"), ("aaaa", "a")]]
+    aligner = AlignBasic2()
+    assert aligner.align_many(pairs) == aligner.align_many(pairs, workers=2)
+
+
+def test_imap_chunks_streams_in_order():
+    from cacoepy.core.batch import imap_chunks
+
+    def numbers():
+        yield from range(1000)
+
+    assert list(imap_chunks(map_square, numbers(), workers=2, chunksize=7)) == [i * i for i in range(1000)]
+    assert list(imap_chunks(map_square, [], workers=2)) == []
+
+
+def map_square(chunk):
+    return [i * i for i in chunk]
@@ -0,0 +1,129 @@
+import json
+import pytest
+from cacoepy.aligner import AlignARPAbet2, AlignARPAbet3
+from cacoepy.cli import main
+from cacoepy.pipeline import evaluate_stream, iter_annotations
+
+PAIRS = [
+    ("dh ah m", "d iy ah m"),
+    ("d ay n ah s ao r", "d ih k ow"),
+    ("th er m aa m ah t er", "uw ao m eh d er"),
+] * 5
+RECORDS = [
+    {
+        "id": "utt1",
+        "target_phonemes": "th er m aa m ah t er",
+        "perceived_phonemes": "- uw - ao m eh d er",
+        "predicted_phonemes": "uw aa ao m eh d uh er",
+    },
+    {
+        "id": "utt2",
+        "target_phonemes": "sil k ae t sil",
+        "perceived_phonemes": "- k ah t -",
+        "predicted_phonemes": "k ae t",
+    },
+] * 4
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_align_jsonl_pairs_and_triples(tmp_path, capsys, workers):
+    records = [{"id": i, "seq1": a, "seq2": b} for i, (a, b) in enumerate(PAIRS)]
+    records.append(["k ae t", "k ah t", "k t"])
+    source = write_jsonl(tmp_path / "pairs.jsonl", records)
+    output = tmp_path / "aligned.jsonl"
+    main(["align", source, "-o", str(output), "--workers", str(workers), "--chunk-size", "2"])
+
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    for i, ((a, b), line) in enumerate(zip(PAIRS, lines)):
+        seq1, seq2, score = AlignARPAbet2()(a.split(), b.split())
+        assert line == {"id": i, "seq1": " ".join(seq1), "seq2": " ".join(seq2), "score": score}
+    *aligned, score = AlignARPAbet3()("k ae t".split(), "k ah t".split(), "k t".split())
+    assert lines[-1] == dict(zip(("seq1", "seq2", "seq3"), map(" ".join, aligned)), score=score)
+    assert f"{len(records)} items" in capsys.readouterr().err
+
+
+def test_align_tsv(tmp_path):
+    source = tmp_path / "pairs.tsv"
+    source.write_text("".join(f"{a}\t{b}\n" for a, b in PAIRS))
+    output = tmp_path / "aligned.tsv"
+    main(["align", str(source), "-o", str(output)])
+    seq1, seq2, score = AlignARPAbet2()(PAIRS[0][0].split(), PAIRS[0][1].split())
+    first = output.read_text().splitlines()[0]
+    assert first == f"{' '.join(seq1)}\t{' '.join(seq2)}\t{score}"
+
+
+def test_align_does_not_load_the_server(tmp_path):
+    import subprocess
+    import sys
+
+    source = tmp_path / "pairs.tsv"
+    source.write_text("".join(f"{a}\t{b}\n" for a, b in PAIRS))
+    code = (
+        "import sys; from cacoepy.cli import main; "
+        f"main(['align', {str(source)!r}, '-o', {str(tmp_path / 'out.tsv')!r}]); "
+        "print('cacoepy.server' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
+
+
+def test_invalid_items(tmp_path):
+    source = write_jsonl(tmp_path / "pairs.jsonl", [["k ae t", "zz"], ["k", "k"]])
+    output = tmp_path / "aligned.jsonl"
+    with pytest.raises(SystemExit, match="item 1: ElementNotInVocabError"):
+        main(["align", source, "-o", str(output)])
+    main(["align", source, "-o", str(output), "--skip-invalid"])
+    error, aligned = [json.loads(line) for line in output.read_text().splitlines()]
+    assert error["item"] == 1 and "ElementNotInVocabError" in error["error"]
+    assert aligned["seq1"] == "k"
+
+
+def test_malformed_items_are_invalid_and_bugs_are_raised(tmp_path, monkeypatch):
+    pairs = tmp_path / "pairs.jsonl"
+    pairs.write_text('{"seq1": "k"\n5\n["k"]\n["k", 1]\n')
+    output = tmp_path / "aligned.jsonl"
+    main(["align", str(pairs), "-o", str(output), "--skip-invalid"])
+    errors = [json.loads(line)["error"] for line in output.read_text().splitlines()]
+    assert [error.split(":")[0] for error in errors] == ["InvalidItemError"] * 4
+
+    records = write_jsonl(tmp_path / "utterances.jsonl", [{"id": "utt1", "target_phonemes": "k"}, 5])
+    main(["score", records, "-o", str(output), "--skip-invalid"])
+    errors = [json.loads(line)["error"] for line in output.read_text().splitlines()]
+    assert [error.split(":")[0] for error in errors] == ["InvalidItemError"] * 2
+
+    def broken(*sequences):
+        raise TypeError("broken")
+
+    monkeypatch.setattr("cacoepy.aligner.AlignARPAbet2.__call__", broken)
+    with pytest.raises(TypeError, match="broken"):
+        main(["align", write_jsonl(tmp_path / "ok.jsonl", [PAIRS[0]]), "-o", str(output), "--skip-invalid"])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_score_matches_evaluate_stream(tmp_path, capsys, workers):
+    source = write_jsonl(tmp_path / "utterances.jsonl", RECORDS)
+    output = tmp_path / "results.jsonl"
+    main(["score", source, "-o", str(output), "--workers", str(workers), "--chunk-size", "3"])
+
+    expected = tmp_path / "expected.jsonl"
+    report = evaluate_stream(iter_annotations(source), results=str(expected))
+    assert output.read_text() == expected.read_text()
+    assert str(report) in capsys.readouterr().err
+
+
+def test_score_tsv_and_json(tmp_path):
+    tsv = tmp_path / "utterances.tsv"
+    tsv.write_text("".join(
+        f"{r['id']}\t{r['target_phonemes']}\t{r['perceived_phonemes']}\t{r['predicted_phonemes']}\n"
+        for r in RECORDS[:2]
+    ))
+    from_json = tmp_path / "utterances.json"
+    from_json.write_text(json.dumps({r["id"]: r for r in RECORDS[:2]}))
+    main(["score", str(tsv), "-o", str(tmp_path / "tsv.jsonl")])
+    main(["score", str(from_json), "-o", str(tmp_path / "json.jsonl")])
+    assert (tmp_path / "tsv.jsonl").read_text() == (tmp_path / "json.jsonl").read_text()
@@ -0,0 +1,102 @@
+import json
+import pathlib
+import pickle
+import numpy as np
+import pytest
+from cacoepy.aligner import AlignARPAbet2, align_prediction_to_annotation_and_target
+from cacoepy.cli import main
+from cacoepy.corpus import CorpusWriter, PhonemeCorpus, write_corpus
+from cacoepy.evaluation import evaluate_sharded
+from cacoepy.metric import mdd_phoneme_metrics
+from cacoepy.pipeline import encode_utterances, evaluate_stream, iter_annotations
+
+ANNOTATIONS = str(pathlib.Path(__file__).parents[1] / "data" / "L2Arctic_annotations.json")
+
+
+def records_with_predictions():
+    for index, (utterance_id, record) in enumerate(iter_annotations(ANNOTATIONS)):
+        perceived = [p for p in record["perceived_phonemes"].split() if p != "-"]
+        prediction = perceived[1:] if index % 3 else perceived
+        yield utterance_id, dict(record, predicted_phonemes=" ".join(prediction))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / "corpus")
+    assert write_corpus(path, encode_utterances(records_with_predictions())) == 150
+    return PhonemeCorpus(path)
+
+
+def test_utterances_are_zero_copy_views(corpus):
+    codes, offsets = corpus.stream("annotation")
+    assert len(corpus) == 150 and len(offsets) == 151
+    (utterance_id, record), utterance = next(records_with_predictions()), corpus[0]
+    assert utterance.id == utterance_id
+    assert utterance.target == record["target_phonemes"].split()
+    assert utterance.prediction == record["predicted_phonemes"].split()
+    assert np.shares_memory(utterance.annotation.codes, codes)
+    assert not utterance.annotation.codes.flags.writeable
+    assert corpus[utterance_id].annotation == corpus[0].annotation
+    assert corpus[-1].id == corpus[149].id
+    with pytest.raises(IndexError):
+        corpus[150]
+
+
+def test_views_work_with_aligners_and_metrics(corpus):
+    for utterance in list(corpus)[:10]:
+        target = utterance.target.tolist()
+        annotation = utterance.annotation.tolist()
+        prediction = utterance.prediction.tolist()
+        aligner = AlignARPAbet2()
+        assert aligner(utterance.target.without_gaps(), utterance.prediction) == aligner(
+            [p for p in target if p != "-"], prediction
+        )
+        aligned = align_prediction_to_annotation_and_target(
+            utterance.prediction, utterance.annotation, utterance.target
+        )
+        assert aligned == align_prediction_to_annotation_and_target(prediction, annotation, target)
+        assert mdd_phoneme_metrics(utterance.target, utterance.annotation, utterance.annotation) == (
+            mdd_phoneme_metrics(target, annotation, annotation)
+        )
+
+
+def test_index_lines_are_decoded_lazily(corpus, monkeypatch):
+    import cacoepy.corpus
+
+    lines = (pathlib.Path(corpus.path) / "index.jsonl").read_text().splitlines()
+    monkeypatch.setattr(cacoepy.corpus, "iter_index", None)
+    assert corpus.index_record(7) == json.loads(lines[7])
+    assert corpus[-1].id == json.loads(lines[-1])["id"]
+
+
+def test_records_and_workers(corpus, tmp_path):
+    assert evaluate_stream(corpus.records()) == evaluate_stream(records_with_predictions())
+    copy = pickle.loads(pickle.dumps(corpus))
+    assert copy.path == corpus.path and copy[3].target == corpus[3].target
+    result = evaluate_sharded(
+        corpus.records(), {"arpabet": AlignARPAbet2()}, workers=2, checkpoint=str(tmp_path / "shards")
+    )
+    assert result.metric == evaluate_stream(records_with_predictions())
+
+
+def test_missing_stream_and_empty_corpus(tmp_path):
+    path = str(tmp_path / "corpus")
+    with CorpusWriter(path) as writer:
+        pass
+    assert len(PhonemeCorpus(path)) == 0
+    with CorpusWriter(path) as writer:
+        writer.append("a", {"speaker": "ABA"}, target=["k", "ae", "t"], annotation=["k", "-", "t"])
+    corpus = PhonemeCorpus(path)
+    assert corpus[0].prediction is None
+    assert corpus[0].metadata == {"speaker": "ABA"}
+    assert corpus.record(0)[1]["perceived_phonemes"] == ["k", "-", "t"]
+
+
+def test_cli_scores_corpus(corpus, tmp_path):
+    source = tmp_path / "utterances.jsonl"
+    main(["score", corpus.path, "-o", str(tmp_path / "from_corpus.jsonl"), "--workers", "2"])
+    with open(source, "w") as file:
+        for utterance_id, record in records_with_predictions():
+            file.write(json.dumps(dict(record, id=utterance_id)) + "\n")
+    main(["score", str(source), "-o", str(tmp_path / "from_jsonl.jsonl")])
+    assert (tmp_path / "from_corpus.jsonl").read_text() == (tmp_path / "from_jsonl.jsonl").read_text()
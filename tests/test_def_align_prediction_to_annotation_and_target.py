@@ -1,4 +1,7 @@
-from cacoepy.aligner import align_prediction_to_annotation_and_target
+from cacoepy.aligner import (
+    align_prediction_to_annotation_and_target,
+    align_predictions_to_annotation_and_target,
+)
 from cacoepy.core.utils import pretty_sequences
 
 target = "g r ae s hh aa p er".split(" ")
@@ -9,3 +12,21 @@ pred = "ah b ae".split(" ")
 a,b, c = align_prediction_to_annotation_and_target(pred, ann, target)
 
 pretty_sequences(c, b, a)
+
+
+def test_several_predictions_match_single_prediction():
+    target = "th er m aa m ah t er".split(" ")
+    annotation = "- uw - ao m eh d er".split(" ")
+    prediction = "uw aa ao m eh d uh er".split(" ")
+    single = align_prediction_to_annotation_and_target(
+        prediction=prediction,
+        annotation_aligned_with_target=annotation,
+        target_aligned_with_annotation=target,
+    )
+    predictions, aligned_annotation, aligned_target = align_predictions_to_annotation_and_target(
+        predictions=[prediction, "th er m aa m ah t er".split(" ")],
+        annotation_aligned_with_target=annotation,
+        target_aligned_with_annotation=target,
+    )
+    assert (predictions[0], aligned_annotation, aligned_target) == single
+    assert len(predictions[1]) == len(aligned_target)
@@ -0,0 +1,96 @@
+import json
+import pathlib
+import pytest
+from cacoepy import evaluation
+from cacoepy.aligner import AlignARPAbet2, AlignBasic2
+from cacoepy.core.phoneme_sequence import PhonemeSequence
+from cacoepy.evaluation import (
+    alignment_agreement,
+    evaluate_sharded,
+    shard_records,
+)
+from cacoepy.pipeline import evaluate_stream, iter_annotations
+
+ANNOTATIONS = str(pathlib.Path(__file__).parents[1] / "data" / "L2Arctic_annotations.json")
+
+
+def records_with_predictions():
+    # Speakers and predictions are made up from the annotations, which have neither.
+    for index, (utterance_id, record) in enumerate(iter_annotations(ANNOTATIONS)):
+        perceived = [p for p in record["perceived_phonemes"].split() if p != "-"]
+        prediction = perceived[1:] if index % 3 else perceived
+        yield f"S{index % 4}/{utterance_id}", dict(record, predicted_phonemes=" ".join(prediction))
+
+
+ALIGNERS = {"arpabet": AlignARPAbet2(), "basic": AlignBasic2()}
+
+
+def test_shard_records():
+    records = list(records_with_predictions())
+    by_utterance = shard_records(records, shard_size=64)
+    assert list(by_utterance) == ["000000", "000001", "000002"]
+    assert sum(by_utterance.values(), []) == records
+    by_speaker = shard_records(records, "speaker")
+    assert sorted(by_speaker) == ["S0", "S1", "S2", "S3"]
+    with pytest.raises(ValueError):
+        shard_records(records, "words")
+
+
+@pytest.mark.parametrize("shard_by", ["utterance", "speaker"])
+def test_parallel_matches_serial(shard_by):
+    serial = evaluate_sharded(records_with_predictions(), ALIGNERS, shard_by=shard_by, shard_size=16)
+    parallel = evaluate_sharded(
+        records_with_predictions(), ALIGNERS, shard_by=shard_by, shard_size=16, workers=2
+    )
+    assert serial == parallel
+    assert serial.utterances == 150 and serial.skipped == 0
+    assert serial.metric == evaluate_stream(records_with_predictions())
+
+
+def test_agreement_and_skipped():
+    target = PhonemeSequence.from_string("sil k ae t sil")
+    annotation = PhonemeSequence.from_string("- k ah t -")
+    # Reproducing the annotated alignment scores a match for every column of both.
+    assert alignment_agreement(target, annotation, AlignARPAbet2()) == 10.0
+    records = [
+        ("a", {"target_phonemes": "k ae t", "perceived_phonemes": "k ah t"}),
+        ("b", {"target_phonemes": "k zz t", "perceived_phonemes": "k ah t"}),
+    ]
+    result = evaluate_sharded(records + [("c", {"target_phonemes": "k ae t"})], ALIGNERS)
+    assert (result.utterances, result.skipped) == (1, 2)
+    assert result.metric.total == 0
+
+
+def test_errors_in_predict_are_not_skipped():
+    records = [("a", {"target_phonemes": "k ae t", "perceived_phonemes": "k ah t"})]
+
+    def predict(utterance_id, record):
+        return record["predicted_phonemes"]
+
+    with pytest.raises(KeyError):
+        evaluate_sharded(records, ALIGNERS, predict=predict)
+
+
+def test_checkpoint_resume(tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "shards")
+    first = evaluate_sharded(records_with_predictions(), ALIGNERS, shard_size=32, checkpoint=checkpoint)
+    assert len(list((tmp_path / "shards").glob("shard-*.json"))) == 5
+
+    evaluated = []
+    evaluate_shard = evaluation.evaluate_shard
+    monkeypatch.setattr(
+        evaluation, "evaluate_shard",
+        lambda key, *args, **kwargs: evaluated.append(key) or evaluate_shard(key, *args, **kwargs),
+    )
+    (tmp_path / "shards" / "shard-000002.json").unlink()
+    assert evaluate_sharded(records_with_predictions(), ALIGNERS, shard_size=32, checkpoint=checkpoint) == first
+    assert evaluated == ["000002"]
+
+    # A different configuration does not reuse the shards.
+    evaluate_sharded(
+        records_with_predictions(), {"arpabet": AlignARPAbet2(gap_penalty=-2)},
+        shard_size=32, checkpoint=checkpoint,
+    )
+    assert len(evaluated) == 6
+    data = json.loads((tmp_path / "shards" / "shard-000000.json").read_text())
+    assert list(data["result"]["scores"]) == ["arpabet"]
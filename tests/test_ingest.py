@@ -0,0 +1,144 @@
+import json
+import numpy as np
+import pytest
+from cacoepy.cli import main
+from cacoepy.core.phoneme_sequence import arpabet_alphabet
+from cacoepy.corpus import CorpusWriter, iter_index
+from cacoepy.l2arctic import ingest_textgrids, l2arctic_phones, read_textgrid
+
+
+def textgrid(words, phones):
+    def tier(name, labels):
+        intervals = "".join(
+            f"""            intervals [{i}]:
+                xmin = {i - 1}
+                xmax = {i}
+                text = "{label}"
+"""
+            for i, label in enumerate(labels, start=1)
+        )
+        return f"""        class = "IntervalTier"
+        name = "{name}"
+        xmin = 0
+        xmax = {len(labels)}
+        intervals: size = {len(labels)}
+{intervals}"""
+
+    return f"""File type = "ooTextFile"
+Object class = "TextGrid"
+
+xmin = 0
+xmax = {len(phones)}
+tiers? <exists>
+size = 2
+item []:
+    item [1]:
+{tier("words", words)}    item [2]:
+{tier("phones", phones)}"""
+
+
+UTTERANCES = {
+    "ABA/annotation/arctic_a0001.TextGrid": (
+        ["", "the", "cat", ""],
+        ["sil", "DH", "AH0", "K,K,s", "AE1,EH,s", "T,sil,d", "sp", "", "sil,AX,a"],
+    ),
+    "ABA/annotation/arctic_a0002.TextGrid": (["cat"], ["K", "AE,err,s", "T"]),
+    "BWC/annotation/arctic_a0001.TextGrid": (["bad"], ["B", "QQ", "D"]),
+    "BWC/annotation/arctic_a0002.TextGrid": (["bad"], ["B", "AE,D,X"]),
+    "BWC/annotation/arctic_a0003.TextGrid": (["at"], ["AE", "T,,d"]),
+}
+
+
+@pytest.fixture
+def l2arctic(tmp_path):
+    root = tmp_path / "L2Arctic"
+    for name, (words, phones) in UTTERANCES.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(textgrid(words, phones))
+    return root
+
+
+def read_stream(corpus, stream):
+    codes = np.fromfile(corpus / f"{stream}.codes", dtype=np.uint8)
+    offsets = np.fromfile(corpus / f"{stream}.offsets", dtype="<i8")
+    return [arpabet_alphabet().decode(codes[a:b]) for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def test_l2arctic_phones(l2arctic):
+    tiers = read_textgrid(str(l2arctic / "ABA/annotation/arctic_a0001.TextGrid"))
+    assert tiers["words"] == ["", "the", "cat", ""]
+    target, perceived = l2arctic_phones(tiers["phones"])
+    assert target == ["sil", "dh", "ah", "k", "ae", "t", "sil", "-"]
+    assert perceived == ["-", "dh", "ah", "k", "eh", "-", "-", "ax"]
+    assert l2arctic_phones(["AE,err,s"]) == (["ae"], ["ae"])
+    with pytest.raises(ValueError):
+        l2arctic_phones(["AE,D,X"])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ingest(l2arctic, tmp_path, workers):
+    corpus = tmp_path / "corpus"
+    result = ingest_textgrids([str(l2arctic)], str(corpus), workers=workers, chunksize=2)
+    assert result.ingested == 3
+    assert [path.split("L2Arctic/")[1] for path, _ in result.rejected] == [
+        "BWC/annotation/arctic_a0001.TextGrid",
+        "BWC/annotation/arctic_a0002.TextGrid",
+    ]
+    assert "qq" in result.rejected[0][1]
+
+    index = list(iter_index(str(corpus)))
+    assert [record["id"] for record in index] == [
+        "ABA/arctic_a0001.TextGrid", "ABA/arctic_a0002.TextGrid", "BWC/arctic_a0003.TextGrid",
+    ]
+    assert index[0] == {"id": "ABA/arctic_a0001.TextGrid", "speaker": "ABA", "words": "the cat"}
+    targets = read_stream(corpus, "target")
+    annotations = read_stream(corpus, "annotation")
+    assert targets[0] == ["sil", "dh", "ah", "k", "ae", "t", "sil", "-"]
+    assert annotations[0] == ["-", "dh", "ah", "k", "eh", "-", "-", "ah"]
+    assert (targets[2], annotations[2]) == (["ae", "t"], ["ae", "-"])
+
+    # Ingesting again skips what is already in the corpus.
+    assert ingest_textgrids([str(l2arctic)], str(corpus)).ingested == 0
+    assert len(list(iter_index(str(corpus)))) == 3
+
+
+def test_duplicate_ids_are_rejected(l2arctic, tmp_path):
+    corpus = tmp_path / "corpus"
+    path = str(l2arctic / "ABA/annotation/arctic_a0002.TextGrid")
+    result = ingest_textgrids([path, str(l2arctic / "ABA"), path], str(corpus))
+    assert result.ingested == 2
+    assert [reason for _, reason in result.rejected] == [
+        "Duplicate utterance id 'ABA/arctic_a0002.TextGrid'.",
+    ] * 2
+    ids = [record["id"] for record in iter_index(str(corpus))]
+    assert ids == ["ABA/arctic_a0002.TextGrid", "ABA/arctic_a0001.TextGrid"]
+
+
+def test_interrupted_writer_recovers(tmp_path):
+    corpus = tmp_path / "corpus"
+    with CorpusWriter(str(corpus)) as writer:
+        writer.append("a", target=["k", "ae", "t"], annotation=["k", "eh", "t"])
+        writer.append("b", target=["ae", "t"], annotation=["ae", "-"])
+    # A crash after the codes of a third utterance were written, but not its index line.
+    with open(corpus / "target.codes", "ab") as file:
+        file.write(bytes([1, 2]))
+    with open(corpus / "target.offsets", "ab") as file:
+        file.write((7).to_bytes(8, "little"))
+    with open(corpus / "index.jsonl", "a") as file:
+        file.write('{"id": "c"')
+
+    with CorpusWriter(str(corpus)) as writer:
+        assert len(writer) == 2
+        writer.append("c", target=["t"], annotation=["t"])
+    assert [record["id"] for record in iter_index(str(corpus))] == ["a", "b", "c"]
+    assert read_stream(corpus, "target") == [["k", "ae", "t"], ["ae", "t"], ["t"]]
+    assert json.loads((corpus / "meta.json").read_text())["streams"] == ["target", "annotation"]
+    with pytest.raises(ValueError):
+        CorpusWriter(str(corpus), streams=("target",))
+
+
+def test_cli_ingest(l2arctic, tmp_path, capsys):
+    main(["ingest", str(l2arctic / "ABA"), "-o", str(tmp_path / "corpus")])
+    assert "2 items" in capsys.readouterr().err
+    assert len(list(iter_index(str(tmp_path / "corpus")))) == 2
@@ -0,0 +1,92 @@
+import random
+import pytest
+from cacoepy.core.exceptions import PhonemeSequenceError
+from cacoepy.core.phoneme_sequence import PhonemeSequence
+from cacoepy.metric import (
+    MetricReport,
+    mdd_corpus_metrics,
+    mdd_encoded_metrics,
+    mdd_phoneme_metrics,
+)
+
+
+def random_triples(seed, count=200):
+    rng = random.Random(seed)
+    triples = []
+    for _ in range(count):
+        length = rng.randint(0, 12)
+        triples.append(
+            tuple([rng.choice(["aa", "b", "k", "-"]) for _ in range(length)] for _ in range(3))
+        )
+    return triples
+
+
+def test_corpus_metrics_equal_sum_of_utterance_metrics():
+    triples = random_triples(0)
+    expected = MetricReport()
+    for triple in triples:
+        expected = mdd_phoneme_metrics(*triple, metric=expected)
+    assert mdd_corpus_metrics(triples) == expected
+    assert sum(mdd_phoneme_metrics(*triple) for triple in triples) == expected
+
+
+def test_counts():
+    report = mdd_phoneme_metrics(
+        target="A B C D".split(), annotation="A B X Y".split(), prediction="A Z X Q".split()
+    )
+    assert report["true_acceptance"] == 1
+    assert report["false_rejection"] == 1
+    assert report["false_acceptance"] == 1
+    assert report["true_rejection"] == 1
+    assert report["diagnosis_error"] == 1
+    assert report.total == 4
+    assert report["false_acceptance_rate"] == 0.25
+
+
+def test_merge_recomputes_rates():
+    first = mdd_phoneme_metrics(["a", "b"], ["a", "b"], ["a", "x"])
+    second = mdd_phoneme_metrics(["a", "b"], ["a", "b"], ["a", "b"])
+    merged = first + second
+    assert merged["false_rejection"] == 1
+    assert merged["false_rejection_rate"] == 0.25
+    assert first["false_rejection_rate"] == 0.5
+    first.merge(second)
+    assert first == merged
+
+
+def test_phoneme_sequences_use_codes():
+    triples = [
+        ("th er m aa".split(), "th - m ao".split(), "th er m aa".split()),
+        ("m ah".split(), "m ah".split(), "m eh".split()),
+    ]
+    encoded = [tuple(PhonemeSequence.from_phonemes(seq) for seq in triple) for triple in triples]
+    assert mdd_corpus_metrics(encoded) == mdd_corpus_metrics(triples)
+
+
+def test_encoded_metrics_with_offsets():
+    triples = random_triples(1, count=20) + [([], [], [])]
+    target, annotation, prediction = (
+        [p for triple in triples for p in triple[role]] for role in range(3)
+    )
+    lengths = [len(triple[0]) for triple in triples]
+    offsets = [sum(lengths[:i]) for i in range(len(lengths) + 1)]
+    reports = mdd_encoded_metrics(target, annotation, prediction, offsets)
+    assert reports == [mdd_phoneme_metrics(*triple) for triple in triples]
+    assert mdd_encoded_metrics(target, annotation, prediction) == [mdd_corpus_metrics(triples)]
+
+
+def test_unaligned_triple():
+    with pytest.raises(PhonemeSequenceError):
+        mdd_corpus_metrics([(["a"], ["a"], ["a"]), (["a"], ["a", "b"], ["a"])])
+
+
+def test_rates_cannot_be_set():
+    with pytest.raises(KeyError):
+        MetricReport()["false_acceptance_rate"] = 0.5
+    with pytest.raises(KeyError):
+        MetricReport()["accuracy"] = 0.5
+
+
+def test_invalid_offsets():
+    with pytest.raises(ValueError):
+        mdd_encoded_metrics(["a", "b"], ["a", "b"], ["a", "b"], [0, 1])
@@ -0,0 +1,82 @@
+import io
+import json
+import pytest
+from cacoepy.aligner import align_prediction_to_annotation_and_target
+from cacoepy.core.exceptions import ElementNotInVocabError
+from cacoepy.metric import MetricReport, mdd_phoneme_metrics
+from cacoepy.pipeline import _JSONObjectReader, evaluate_stream, iter_annotations
+
+RECORDS = {
+    "utt1": {
+        "target_phonemes": "th er m aa m ah t er",
+        "perceived_phonemes": "- uw - ao m eh d er",
+        "predicted_phonemes": "uw aa ao m eh d uh er",
+    },
+    "utt2": {
+        "target_phonemes": "sil k ae t sil",
+        "perceived_phonemes": "- k ah t -",
+        "predicted_phonemes": "k ae t",
+    },
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 16])
+def test_json_object_reader_matches_json_load(chunk_size):
+    text = json.dumps({"a": RECORDS["utt1"], "b": 12345, "c": [1.5, "x"], "d": {}}, indent=2)
+    reader = _JSONObjectReader(io.StringIO(text), chunk_size=chunk_size)
+    assert list(reader) == list(json.loads(text).items())
+
+
+@pytest.mark.parametrize("text", ['{"a": 1.5}', '{"a": -2.5e10}', '{"a": 12E+3, "b": 0.25}'])
+def test_json_object_reader_numbers_split_across_chunks(text):
+    for chunk_size in range(1, len(text) + 1):
+        reader = _JSONObjectReader(io.StringIO(text), chunk_size=chunk_size)
+        assert list(reader) == list(json.loads(text).items())
+
+
+def test_iter_annotations_json_and_jsonl(tmp_path):
+    json_path = tmp_path / "annotations.json"
+    json_path.write_text(json.dumps(RECORDS))
+    jsonl_path = tmp_path / "annotations.jsonl"
+    jsonl_path.write_text(
+        "\n".join(json.dumps({"id": key, **record}) for key, record in RECORDS.items())
+    )
+    assert list(iter_annotations(str(json_path))) == list(RECORDS.items())
+    assert [
+        (key, record["target_phonemes"]) for key, record in iter_annotations(str(jsonl_path))
+    ] == [(key, record["target_phonemes"]) for key, record in RECORDS.items()]
+
+
+def test_evaluate_stream_matches_manual_loop(tmp_path):
+    expected = MetricReport()
+    for record in RECORDS.values():
+        prediction, annotation, target = align_prediction_to_annotation_and_target(
+            prediction=record["predicted_phonemes"].split(),
+            annotation_aligned_with_target=record["perceived_phonemes"].split(),
+            target_aligned_with_annotation=record["target_phonemes"].split(),
+        )
+        expected.merge(mdd_phoneme_metrics(target, annotation, prediction))
+
+    results = tmp_path / "results.jsonl"
+    report = evaluate_stream(iter(RECORDS.items()), results=str(results))
+    assert report == expected
+    lines = [json.loads(line) for line in results.read_text().splitlines()]
+    assert [line["id"] for line in lines] == ["utt1", "utt2"]
+    assert lines[0]["prediction"] == "- uw aa ao m eh d uh er"
+
+
+def test_evaluate_stream_with_predict_callable():
+    report = evaluate_stream(
+        RECORDS.items(), predict=lambda _, record: record["target_phonemes"].split()
+    )
+    assert report.total > 0
+
+
+def test_evaluate_stream_invalid_utterance():
+    records = {**RECORDS, "bad": {**RECORDS["utt1"], "predicted_phonemes": "zz"}}
+    with pytest.raises(ElementNotInVocabError):
+        evaluate_stream(records.items())
+    results = io.StringIO()
+    report = evaluate_stream(records.items(), results=results, skip_invalid=True)
+    assert report == evaluate_stream(RECORDS.items())
+    assert json.loads(results.getvalue().splitlines()[-1])["id"] == "bad"
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+import pytest
+from cacoepy.aligner import AlignARPAbet2, align_prediction_to_annotation_and_target
+from cacoepy.cli import build_parser
+from cacoepy.core.exceptions import ServerBusyError
+from cacoepy.metric import mdd_phoneme_metrics
+from cacoepy.server import OPERATIONS, AlignmentServer, MicroBatcher, run_batch
+
+TARGET = "th er m aa m ah t er".split()
+ANNOTATION = "- uw - ao m eh d er".split()
+PREDICTION = "uw aa ao m eh d uh er".split()
+
+
+async def request(server, method, path, body=None):
+    if server.unix_socket is not None:
+        reader, writer = await asyncio.open_unix_connection(server.unix_socket)
+    else:
+        host, port = server._server.sockets[0].getsockname()[:2]
+        reader, writer = await asyncio.open_connection(host, port)
+    payload = b"" if body is None else json.dumps(body).encode()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n"
+        f"Connection: close\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers["content-length"]))
+    writer.close()
+    return int(status_line.split()[1]), headers, json.loads(body)
+
+
+def test_run_batch_reports_item_errors():
+    results = run_batch("align", [{"seq1": "k ae t", "seq2": "k ah t"}, {"seq1": "zz", "seq2": "k"}])
+    assert results[0] == (True, {"seq1": ["k", "ae", "t"], "seq2": ["k", "ah", "t"], "score": results[0][1]["score"]})
+    assert results[1][0] is False
+    assert "ElementNotInVocabError" in results[1][1]
+
+
+def test_client_gap_penalties_are_bounded():
+    from cacoepy.aligner import _shared_arpabet_aligner
+
+    payloads = [{"seq1": "k ae t", "seq2": "k t", "gap_penalty": -i} for i in range(100)]
+    assert all(ok for ok, _ in run_batch("align", payloads))
+    assert _shared_arpabet_aligner.cache_info().currsize <= 16
+    bad = run_batch("align", [{"seq1": "k", "seq2": "k", "gap_penalty": value} for value in ([1], "x", float("nan"))])
+    assert [ok for ok, _ in bad] == [False, False, False]
+    assert all(error.startswith("InvalidItemError") for _, error in bad)
+
+
+@pytest.mark.parametrize("transport", ["tcp", "unix"])
+def test_concurrent_requests_are_batched(transport, tmp_path):
+    async def main():
+        unix_socket = str(tmp_path / "cacoepy.sock") if transport == "unix" else None
+        server = AlignmentServer(port=0, unix_socket=unix_socket, workers=0, max_delay=0.05)
+        async with server:
+            aligned = await asyncio.gather(*(
+                request(server, "POST", "/align", {"seq1": TARGET, "seq2": " ".join(PREDICTION)})
+                for _ in range(8)
+            ))
+            status, _, prediction = await request(server, "POST", "/align_prediction", {
+                "prediction": PREDICTION, "annotation": ANNOTATION, "target": TARGET,
+            })
+            assert status == 200
+            status, _, metrics = await request(server, "POST", "/metrics", [
+                {"target": TARGET, "annotation": ANNOTATION, "prediction": prediction["prediction"][:8]},
+            ] * 3)
+            assert status == 200
+            _, _, stats = await request(server, "GET", "/stats")
+        return aligned, prediction, metrics, stats
+
+    aligned, prediction, metrics, stats = asyncio.run(main())
+    seq1, seq2, score = AlignARPAbet2()(TARGET, PREDICTION)
+    assert all(status == 200 for status, _, _ in aligned)
+    assert all(body == {"seq1": seq1, "seq2": seq2, "score": score} for _, _, body in aligned)
+    expected = align_prediction_to_annotation_and_target(PREDICTION, ANNOTATION, TARGET)
+    assert prediction == dict(zip(("prediction", "annotation", "target"), expected))
+    assert metrics == [mdd_phoneme_metrics(TARGET, ANNOTATION, expected[0][:8]).data] * 3
+    assert stats["operations"]["align"]["requests"] == 8
+    assert set(stats["operations"]["align"]["latency_ms"]) == {"p50", "p90", "p99"}
+    assert stats["mean_batch_size"] > 1
+
+
+def test_error_statuses():
+    async def main():
+        async with AlignmentServer(port=0, workers=0) as server:
+            return [
+                (await request(server, "POST", "/nothing", {}))[0],
+                (await request(server, "GET", "/align"))[0],
+                (await request(server, "POST", "/align", {"seq1": ["zz"], "seq2": ["k"]}))[0],
+                (await request(server, "POST", "/align", {"seq1": ["k"]}))[0],
+                (await request(server, "GET", "/health"))[0],
+            ]
+
+    assert asyncio.run(main()) == [404, 405, 422, 422, 200]
+
+
+def test_unexpected_errors_return_500(monkeypatch, caplog):
+    def broken(payload):
+        raise RuntimeError("broken")
+
+    monkeypatch.setitem(OPERATIONS, "align", broken)
+
+    async def main():
+        async with AlignmentServer(port=0, workers=0) as server:
+            failed = await request(server, "POST", "/align", {"seq1": "k", "seq2": "k"})
+            return failed, (await request(server, "GET", "/health"))[0]
+
+    (status, _, body), health = asyncio.run(main())
+    assert (status, body, health) == (500, {"error": "Internal server error."}, 200)
+    assert "RuntimeError: broken" in caplog.text
+
+
+def test_closed_connections_reach_eof_with_worker_processes():
+    async def read_until_eof(server):
+        host, port = server._server.sockets[0].getsockname()[:2]
+        reader, writer = await asyncio.open_connection(host, port)
+        payload = json.dumps({"seq1": "k ae t", "seq2": "k ah t"}).encode()
+        writer.write(
+            f"POST /align HTTP/1.1\r\nContent-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout=10)
+        writer.close()
+        return int(response.split()[1])
+
+    async def main():
+        async with AlignmentServer(port=0, workers=2) as server:
+            return [await read_until_eof(server) for _ in range(4)]
+
+    assert asyncio.run(main()) == [200] * 4
+
+
+def test_backpressure():
+    release = threading.Event()
+
+    def blocking_run(operation, payloads):
+        release.wait(5)
+        return run_batch(operation, payloads)
+
+    async def main():
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batcher = MicroBatcher(executor, run=blocking_run, max_batch=1, max_delay=0, max_pending=2)
+            batcher.start()
+            payload = {"seq1": "k ae t", "seq2": "k ae t"}
+            waiting = [asyncio.ensure_future(batcher.submit("align", payload)) for _ in range(6)]
+            await asyncio.sleep(0.05)
+            release.set()
+            results = await asyncio.gather(*waiting, return_exceptions=True)
+            await batcher.close()
+        return results
+
+    results = asyncio.run(main())
+    busy = [result for result in results if isinstance(result, ServerBusyError)]
+    assert len(busy) == 4
+    assert all(ok for ok, _ in results[:2])
+
+
+def test_cli_serve_arguments():
+    args = build_parser().parse_args(["serve", "--port", "0", "--workers", "2", "--max-delay", "5"])
+    assert (args.port, args.workers, args.max_delay) == (0, 2, 5.0)